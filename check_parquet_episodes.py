@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 
-import pandas as pd
 import os
+import sys
+import argparse
 
-def check_parquet_episodes():
+# 与 parse_lerobot.py 共用 parquet footer 读取：只读取 footer，不探测视频，也不写入清单缓存
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server'))
+from lerobot_manifest import read_footer_entry
+from lerobot_video import VIDEO_UPLOADS_DIR
+
+def check_parquet_episodes(uploads_dir: str = VIDEO_UPLOADS_DIR):
     """检查parquet文件中的episode_index"""
     
-    uploads_dir = "/home/sen/gitee/datemanager/Uploads"
     parquet_files = [f for f in os.listdir(uploads_dir) if f.endswith('.parquet')]
     parquet_files.sort()
     
@@ -17,15 +22,15 @@ def check_parquet_episodes():
         file_path = os.path.join(uploads_dir, filename)
         
         try:
-            df = pd.read_parquet(file_path)
-            episode_index = df['episode_index'].iloc[0] if 'episode_index' in df.columns else 'N/A'
-            frame_count = len(df)
+            entry = read_footer_entry(file_path, filename)
+            episode_index = entry['episode_index'] if entry['episode_index'] is not None else 'N/A'
+            frame_count = entry['num_rows']
             
             print(f"文件 {i}: {filename}")
             print(f"  Episode Index: {episode_index}")
             print(f"  Frame Count: {frame_count}")
             print(f"  Generated Key: episode_{int(episode_index):06d}" if episode_index != 'N/A' else "  Generated Key: N/A")
-            print(f"  Columns: {list(df.columns)}")
+            print(f"  Columns: {entry['columns']}")
             print()
             
         except Exception as e:
@@ -33,4 +38,7 @@ def check_parquet_episodes():
             print()
 
 if __name__ == "__main__":
-    check_parquet_episodes()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='List episode_index, frame count and columns of the parquet files in an uploads directory.')
+    parser.add_argument('uploads_dir', nargs='?', default=VIDEO_UPLOADS_DIR,
+                        help='Uploads directory (default: $VIDEO_UPLOADS_DIR, $UPLOADS_PATH or <project>/Uploads)')
+    check_parquet_episodes(parser.parse_args().uploads_dir)
\ No newline at end of file
@@ -1,26 +1,16 @@
 #!/usr/bin/env python3
 
 import os
-import ffmpeg
-import logging
+import sys
+import argparse
 
-def get_video_duration(file_path: str) -> float:
-    """获取视频文件的时长（秒）"""
-    try:
-        probe = ffmpeg.probe(file_path)
-        duration = float(probe['format']['duration'])
-        return duration
-    except ffmpeg.Error as e:
-        logging.error(f"Error probing video {file_path}: {e.stderr.decode()}")
-        return 0.0
-    except FileNotFoundError:
-        logging.error(f"Video file not found: {file_path}")
-        return 0.0
+# 与 parse_lerobot.py 共用视频探测缓存
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server'))
+from lerobot_video import VIDEO_UPLOADS_DIR, probe_videos
 
-def check_video_durations():
+def check_video_durations(uploads_dir: str = VIDEO_UPLOADS_DIR):
     """检查所有视频文件的时长"""
     
-    uploads_dir = "/home/sen/gitee/datemanager/Uploads"
     video_files = [f for f in os.listdir(uploads_dir) if f.endswith(('.mp4', '.mov'))]
     video_files.sort()
     
@@ -29,12 +19,18 @@ def check_video_durations():
     
     durations = {}
     
-    for filename in video_files[:15]:  # 只检查前15个文件
-        file_path = os.path.join(uploads_dir, filename)
-        duration = get_video_duration(file_path)
+    checked_files = video_files[:15]  # 只检查前15个文件
+    # 未缓存的文件并发探测，已缓存且未变化的文件直接读取
+    infos = probe_videos([os.path.join(uploads_dir, filename) for filename in checked_files])
+    for filename in checked_files:
+        info = infos[os.path.join(uploads_dir, filename)]
+        duration = info['duration'] if info else 0.0
         durations[filename] = duration
         
-        print(f"{filename}: {duration:.3f}s")
+        if info:
+            print(f"{filename}: {duration:.3f}s, {info['fps']:.2f} fps, {info['frame_count']} 帧, {info['codec']}")
+        else:
+            print(f"{filename}: {duration:.3f}s")
     
     # 统计时长分布
     unique_durations = list(set(durations.values()))
@@ -52,4 +48,7 @@ def check_video_durations():
         print(f"  {duration:.3f}s: {count} 个文件")
 
 if __name__ == "__main__":
-    check_video_durations()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Print the durations of the first 15 videos in an uploads directory.')
+    parser.add_argument('uploads_dir', nargs='?', default=VIDEO_UPLOADS_DIR,
+                        help='Uploads directory (default: $VIDEO_UPLOADS_DIR, $UPLOADS_PATH or <project>/Uploads)')
+    check_video_durations(parser.parse_args().uploads_dir)
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""parse_lerobot 解析路径的基准测试
+
+在合成数据集（lerobot_synth.py）上按质量预设逐个解析 episode，分别统计 video_probe / read / decimate / sample /
+normalize / serialize 各阶段的墙钟时间和阶段内峰值 RSS（见 lerobot_profile），结果写成 JSON，便于比较不同版本。
+
+    python3 bench_lerobot.py --dataset /tmp/lerobot_bench --frames 1000 --points 4000 --output before.json
+    python3 bench_lerobot.py --dataset /tmp/lerobot_bench --frames 1000 --points 4000 --compare before.json
+
+每个质量级别先预热 --warmup 次，再重复 --repeat 次，阶段耗时取中位数、峰值内存取最大值。
+指定 --compare 时与基准结果逐项比较，任意阶段变慢超过 --threshold（相对值）且超过 --min-delta 秒时以退出码 1 结束。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from lerobot_synth import add_dataset_arguments, dataset_params, generate_dataset
+
+BENCH_VERSION = 1
+# 表格中固定输出的阶段（lod 另有 envelope），解析时出现的其他阶段同样汇总
+STAGES = ('video_probe', 'read', 'decimate', 'sample', 'normalize', 'envelope', 'serialize')
+LOD_QUALITY = 'lod'
+
+
+def run_quality(info: Dict[str, Any], quality: str) -> Dict[str, Any]:
+    """按一个质量级别解析数据集中的所有 episode，返回汇总后的阶段统计"""
+    from lerobot_profile import StageProfiler
+    from parse_lerobot import parse_episode_file, resolve_quality_params, serialize_episodes
+
+    lod = quality == LOD_QUALITY
+    max_frames, max_points = (None, None) if lod else resolve_quality_params(quality)
+    stages = {stage: {'seconds': 0.0, 'peak_rss_mb': 0.0} for stage in STAGES}
+    frames = points = output_bytes = 0
+
+    start = time.perf_counter()
+    for file_path, _ in info['files']:
+        profiler = StageProfiler()
+        episode = parse_episode_file(file_path, 'synthetic', max_frames, max_points, 'full' if lod else quality,
+                                     lod=lod, profiler=profiler)
+        with profiler.stage('serialize'):
+            payload = serialize_episodes([episode])
+        output_bytes += len(payload)
+        frames += episode['frame_count']
+        points += sum(len(frame) for cam_frames in episode['pointcloud_data'].values() for frame in cam_frames)
+        for stage, entry in profiler.to_dict()['stages'].items():
+            stages.setdefault(stage, {'seconds': 0.0, 'peak_rss_mb': 0.0})
+            stages[stage]['seconds'] += entry['seconds']
+            stages[stage]['peak_rss_mb'] = max(stages[stage]['peak_rss_mb'], entry['peak_rss_mb'])
+
+    return {
+        'wall_seconds': time.perf_counter() - start,
+        'stages': stages,
+        'frames': frames,
+        'points': points,
+        'output_bytes': output_bytes,
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """多次运行取中位数耗时与最大峰值内存"""
+    stage_names = list(dict.fromkeys(stage for run in runs for stage in run['stages']))
+    return {
+        'wall_seconds': statistics.median(run['wall_seconds'] for run in runs),
+        'stages': {
+            stage: {
+                'seconds': statistics.median(run['stages'].get(stage, {}).get('seconds', 0.0) for run in runs),
+                'peak_rss_mb': max(run['stages'].get(stage, {}).get('peak_rss_mb', 0.0) for run in runs),
+            }
+            for stage in stage_names
+        },
+        'frames': runs[-1]['frames'],
+        'points': runs[-1]['points'],
+        'output_bytes': runs[-1]['output_bytes'],
+        'runs': [run['wall_seconds'] for run in runs],
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta: float = 0.0) -> List[str]:
+    """返回变慢超过 threshold 且绝对差值超过 min_delta 秒的项（质量级别的总耗时与各阶段耗时）"""
+    regressions = []
+    for quality, result in current['results'].items():
+        base = baseline.get('results', {}).get(quality)
+        if base is None:
+            continue
+        items = [('wall', result['wall_seconds'], base['wall_seconds'])]
+        items += [(stage, entry['seconds'], base['stages'].get(stage, {}).get('seconds'))
+                  for stage, entry in result['stages'].items()]
+        for name, value, base_value in items:
+            if base_value and value > base_value * (1 + threshold) and value - base_value > min_delta:
+                regressions.append(f"{quality}.{name}: {base_value:.3f}s -> {value:.3f}s (+{(value / base_value - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, Any]]):
+    header = f"{'quality':<8} {'wall s':>8} " + ' '.join(f"{stage + ' s':>12} {'MB':>7}" for stage in STAGES) + f" {'out MB':>8}"
+    print(header, file=sys.stderr)
+    for quality, result in results.items():
+        row = f"{quality:<8} {result['wall_seconds']:>8.3f} "
+        row += ' '.join(f"{result['stages'][stage]['seconds']:>12.3f} {result['stages'][stage]['peak_rss_mb']:>7.0f}" for stage in STAGES)
+        row += f" {result['output_bytes'] / 1024 / 1024:>8.2f}"
+        print(row, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the LeRobot parse path on a synthetic dataset.')
+    parser.add_argument('--dataset', default='/tmp/lerobot_bench', help='Synthetic dataset directory (generated if missing)')
+    add_dataset_arguments(parser)
+    parser.add_argument('--qualities', nargs='+', default=['low', 'medium', 'high', 'full', LOD_QUALITY],
+                        help='Quality presets to measure (lod = one progressive LOD parse)')
+    parser.add_argument('--repeat', type=int, default=3, help='Measured runs per quality')
+    parser.add_argument('--warmup', type=int, default=1, help='Unmeasured runs per quality')
+    parser.add_argument('--output', default=None, help='Result JSON path (default: lerobot_bench_<time>.json)')
+    parser.add_argument('--compare', default=None, help='Baseline result JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative slowdown reported as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.01, help='Ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+
+    params = dataset_params(args)
+    info = generate_dataset(args.dataset, params)
+
+    # 解析模块在导入时读取视频目录与缓存目录，需要先指向合成数据集
+    os.environ['VIDEO_UPLOADS_DIR'] = info['video_dir']
+    os.environ['CACHE_DIR'] = os.path.join(info['folder'], 'cache')
+    import numpy as np
+    import pyarrow as pa
+    import parse_lerobot  # noqa: F401
+    # 解析过程中的日志（如找不到视频）不计入测量，也不输出
+    logging.getLogger().setLevel(logging.ERROR)
+
+    results = {}
+    for quality in args.qualities:
+        for _ in range(args.warmup):
+            run_quality(info, quality)
+        results[quality] = summarize([run_quality(info, quality) for _ in range(max(1, args.repeat))])
+
+    report = {
+        'version': BENCH_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pyarrow': pa.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'dataset': {**params, 'videos': info['videos']},
+        'settings': {'repeat': args.repeat, 'warmup': args.warmup},
+        'results': results,
+    }
+    output = args.output or f"lerobot_bench_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print_table(results)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold, args.min_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (threshold {args.threshold:.0%})", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@
 const isProduction = process.env.NODE_ENV === 'production';
 const isDevelopment = process.env.NODE_ENV === 'development';
 const isDocker = process.env.DOCKER_ENV === 'true' || process.env.IS_DOCKER === 'true';
+const path = require('path');
 
 // 获取本机IP地址
 function getLocalIP() {
@@ -86,6 +87,23 @@ const config = {
         return './Uploads';
     },
 
+    // LeRobot 解析配置（parse_lerobot.py 常驻进程的 worker 数，episode 在各 worker 间并行解析，不超过 CPU 核数）
+    LEROBOT_WORKERS: parseInt(process.env.LEROBOT_WORKERS) || 2,
+    // 每个解析 worker 的内存预算（MB），可用内存不足时自动减少 worker 数；不设置则不限制
+    LEROBOT_WORKER_MEMORY_MB: parseInt(process.env.LEROBOT_WORKER_MEMORY_MB) || null,
+    // 为每个解析请求收集分阶段耗时（parse_lerobot.py --profile），汇总结果见 GET /api/lerobot/metrics
+    LEROBOT_PROFILE: process.env.LEROBOT_PROFILE === 'true',
+    // 单个解析请求等待 parse_lerobot.py 响应的超时（毫秒，流式请求为两条记录之间的间隔）；设为 0 不限制
+    LEROBOT_REQUEST_TIMEOUT_MS: process.env.LEROBOT_REQUEST_TIMEOUT_MS !== undefined ? parseInt(process.env.LEROBOT_REQUEST_TIMEOUT_MS) || 0 : 10 * 60 * 1000,
+    // 派生数组存储（lerobot_store.py）的磁盘预算（MB），超出时淘汰最久未使用的条目；设为 0 关闭
+    LEROBOT_STORE_MAX_MB: process.env.LEROBOT_STORE_MAX_MB !== undefined ? parseInt(process.env.LEROBOT_STORE_MAX_MB) || 0 : 2048,
+    // 相机视频预览 sprite sheet（lerobot_preview.py）：同时运行的 ffmpeg 进程数与缓存目录
+    LEROBOT_PREVIEW_WORKERS: parseInt(process.env.LEROBOT_PREVIEW_WORKERS) || 2,
+    get LEROBOT_PREVIEW_DIR() {
+        if (process.env.LEROBOT_PREVIEW_DIR) return process.env.LEROBOT_PREVIEW_DIR;
+        return path.join(this.CACHE_DIR, 'lerobot_previews');
+    },
+
     // 认证配置
     SIMPLE_AUTH_ENABLED: process.env.SIMPLE_AUTH_ENABLED !== 'false', // 默认启用
     UPLOAD_USER: process.env.UPLOAD_USER || 'upload',
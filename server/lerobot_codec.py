@@ -0,0 +1,280 @@
+"""LeRobot episode 二进制格式（派生数组存储 lerobot_store 的条目格式）
+
+布局（全部为小端序）:
+
+    magic        4 字节  b'LRB1'
+    header_len   uint32  JSON 头长度（含补齐空格）
+    header       JSON    utf-8，补齐到 8 字节对齐
+    data         连续的数组缓冲区，每个缓冲区起始位置 8 字节对齐
+
+JSON 头结构::
+
+    {
+      "version": 1,
+      "episodes": [{
+        "key": ..., "index": ..., "folderPath": ..., "frame_count": ...,
+        "original_frame_count": ..., "video_paths": {...}, "lod": {...} 或 null,
+        "arrays": {
+          "motor_data.time":   {"dtype": "float32", "shape": [n], "offset": ..., "byte_length": ...},
+          "motor_data.motors": {"dtype": "float32", "shape": [n, d], ...},
+          "pointcloud_data.<cam>.points":        {"dtype": "float32", "shape": [total, 3], ...},
+          "pointcloud_data.<cam>.frame_offsets": {"dtype": "uint32", "shape": [n + 1], ...}
+        }
+      }]
+    }
+
+offset 相对 data 段起始位置。点云是变长的，第 i 帧的点为
+points[frame_offsets[i]:frame_offsets[i + 1]]。
+
+带电机包络（见 lerobot_envelope）的 episode 另有 "motor_envelope": {"source_frames": ..., "bucket_frames": [...]}，
+第 j 级的数组为 "motor_envelope.<j>.time" / ".min" / ".max"。
+带视频同步索引（见 lerobot_sync）的 episode 另有 "video_sync": {"<cam_key>": {"fps": ..., "frame_count": ..., "duration": ...}}，
+数组为 "video_sync.<cam_key>.frame"（int32）/ ".pts"。
+
+另外提供 JSON 内的紧凑编码（encode_episode_compact / decode_episode_compact，JS 解码见 utils/lerobotCompact.js），
+用于缓存和远程传输，episode 的其他字段不变，增加 "encoding" 字段::
+
+    "encoding": {"version": 1, "bbox": "frame" | "episode", "motor_step": 1e-4, "time_step": 1e-6}
+    "motor_data": {
+      "time":   [d0, d1, ...],              # 整数，time[i] = (d0 + ... + di) * time_step
+      "motors": [[d0_0, d0_1, ...], ...]    # 整数，每个电机分别对前一帧差分，步长 motor_step
+    }
+    "pointcloud_data": {
+      "<cam>": {
+        "offset": [[x, y, z], ...],         # bbox=frame 时每帧一个，bbox=episode 时为单个 [x, y, z]
+        "scale":  [[sx, sy, sz], ...],
+        "points": [[qx, qy, qz, qx, ...], ...]   # 每帧展平的 int16，点 = (q + 32768) * scale + offset
+      }
+    }
+
+精度保证:
+- 点云: 每个坐标的误差不超过 scale / 2，scale = 包围盒边长 / 65535（边长 1 m 时约 7.6 µm）；
+- 电机与时间: 先按步长量化再差分，整数前缀和是精确的，误差不会随帧数累积，
+  每个值的误差不超过 step / 2（另加浮点运算的舍入误差）。含 NaN / inf 的序列不编码，step 为 null，保留原始数值。
+"""
+import json
+import struct
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import numpy as np
+
+BINARY_MAGIC = b'LRB1'
+BINARY_VERSION = 1
+ALIGNMENT = 8
+
+# 非数组字段，原样写入 JSON 头
+EPISODE_META_FIELDS = ('key', 'index', 'folderPath', 'frame_count', 'original_frame_count', 'video_paths', 'lod')
+
+COMPACT_VERSION = 1
+COMPACT_BBOX_MODES = ('frame', 'episode')
+# 电机（弧度 / 米）与归一化时间（秒）的量化步长
+DEFAULT_MOTOR_STEP = 1e-4
+DEFAULT_TIME_STEP = 1e-6
+
+
+def _pad_length(length: int) -> int:
+    return (-length) % ALIGNMENT
+
+
+def _little_endian(values, float_dtype: Optional[str]) -> np.ndarray:
+    array = np.asarray(values, dtype=float_dtype)
+    if float_dtype is None and array.dtype.kind not in 'fiu':
+        array = array.astype('<f8')
+    return array.astype(array.dtype.newbyteorder('<'), copy=False)
+
+
+def _episode_arrays(episode: Dict[str, Any], float_dtype: Optional[str] = '<f4') -> Dict[str, np.ndarray]:
+    """把一个 episode 中需要输出的数组整理为 name -> 连续小端数组
+
+    float_dtype 为 None 时保留数组原本的数值类型（用于 lerobot_store，读回的数据与解析结果完全相同）。
+    """
+    arrays = {}
+    motor_data = episode.get('motor_data', {})
+    arrays['motor_data.time'] = _little_endian(motor_data.get('time', []), float_dtype)
+    motors = _little_endian(motor_data.get('motors', []), float_dtype)
+    arrays['motor_data.motors'] = motors.reshape(len(motors), -1) if motors.size else motors.reshape(0, 0)
+
+    for cam, frames in episode.get('pointcloud_data', {}).items():
+        counts = np.fromiter((len(frame) for frame in frames), dtype=np.int64, count=len(frames))
+        frame_offsets = np.zeros(len(frames) + 1, dtype='<u4')
+        np.cumsum(counts, out=frame_offsets[1:])
+        non_empty = [_little_endian(frame, float_dtype).reshape(-1, 3) for frame in frames if len(frame) > 0]
+        points = np.concatenate(non_empty) if non_empty else np.empty((0, 3), dtype=float_dtype or '<f4')
+        arrays[f'pointcloud_data.{cam}.points'] = points
+        arrays[f'pointcloud_data.{cam}.frame_offsets'] = frame_offsets
+
+    for index, level in enumerate(episode.get('motor_envelope', {}).get('levels', [])):
+        for name in ('time', 'min', 'max'):
+            arrays[f'motor_envelope.{index}.{name}'] = _little_endian(level[name], float_dtype)
+
+    for cam_key, sync in episode.get('video_sync', {}).items():
+        arrays[f'video_sync.{cam_key}.frame'] = _little_endian(sync['frame'], '<i4')
+        arrays[f'video_sync.{cam_key}.pts'] = _little_endian(sync['pts'], float_dtype)
+
+    return {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+
+def write_episodes_binary(episodes: List[Dict[str, Any]], stream: BinaryIO, float_dtype: Optional[str] = '<f4') -> int:
+    """将 episodes 以二进制格式写入 stream，返回写入的字节数（float_dtype 见 _episode_arrays）"""
+    episode_arrays = [_episode_arrays(episode, float_dtype) for episode in episodes]
+
+    header_episodes = []
+    offset = 0
+    for episode, arrays in zip(episodes, episode_arrays):
+        entry = {field: episode.get(field) for field in EPISODE_META_FIELDS}
+        if 'motor_envelope' in episode:
+            envelope = episode['motor_envelope']
+            entry['motor_envelope'] = {
+                'source_frames': envelope['source_frames'],
+                'bucket_frames': [level['bucket_frames'] for level in envelope['levels']],
+            }
+        if 'video_sync' in episode:
+            entry['video_sync'] = {
+                cam_key: {name: sync[name] for name in ('fps', 'frame_count', 'duration')}
+                for cam_key, sync in episode['video_sync'].items()
+            }
+        entry['arrays'] = {}
+        for name, array in arrays.items():
+            entry['arrays'][name] = {
+                'dtype': array.dtype.name,
+                'shape': list(array.shape),
+                'offset': offset,
+                'byte_length': array.nbytes,
+            }
+            offset += array.nbytes + _pad_length(array.nbytes)
+        header_episodes.append(entry)
+
+    header = json.dumps({'version': BINARY_VERSION, 'episodes': header_episodes}).encode('utf-8')
+    # magic(4) + header_len(4) 之后的 data 段需要 8 字节对齐
+    header += b' ' * _pad_length(len(BINARY_MAGIC) + 4 + len(header))
+
+    written = 0
+    stream.write(BINARY_MAGIC)
+    stream.write(struct.pack('<I', len(header)))
+    stream.write(header)
+    written += len(BINARY_MAGIC) + 4 + len(header)
+
+    for arrays in episode_arrays:
+        for array in arrays.values():
+            stream.write(array.tobytes())
+            padding = _pad_length(array.nbytes)
+            if padding:
+                stream.write(b'\0' * padding)
+            written += array.nbytes + padding
+
+    return written
+
+
+def read_episodes_binary(buffer: bytes) -> List[Dict[str, Any]]:
+    """解析二进制格式，数组以零拷贝的 NumPy 视图返回（buffer 可以是 mmap，只有实际访问的部分会被读入内存）"""
+    if buffer[:4] != BINARY_MAGIC:
+        raise ValueError('Not a LeRobot binary payload')
+    header_len = struct.unpack_from('<I', buffer, 4)[0]
+    header = json.loads(bytes(buffer[8:8 + header_len]).decode('utf-8'))
+    data_start = 8 + header_len
+
+    episodes = []
+    for entry in header['episodes']:
+        arrays = {}
+        for name, spec in entry.pop('arrays').items():
+            dtype = np.dtype(spec['dtype']).newbyteorder('<')
+            count = spec['byte_length'] // dtype.itemsize
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset'])
+            arrays[name] = array.reshape(spec['shape'])
+        entry['arrays'] = arrays
+        episodes.append(entry)
+    return episodes
+
+
+def _delta_encode(values: np.ndarray, step: float) -> Optional[np.ndarray]:
+    """按 step 量化后沿第 0 维差分（第一帧为绝对值），含非有限值时返回 None"""
+    if not np.all(np.isfinite(values)):
+        return None
+    quantized = np.rint(values / step).astype(np.int64)
+    return np.diff(quantized, axis=0, prepend=np.zeros_like(quantized[:1])) if len(quantized) else quantized
+
+
+def _quantize_points(frames: List[np.ndarray], bbox: str) -> Dict[str, Any]:
+    """把一个相机的逐帧点量化为 int16，包围盒按帧或按整个 episode 计算"""
+    frames = [np.asarray(frame, dtype=np.float64).reshape(-1, 3) for frame in frames]
+    counts = np.fromiter((len(frame) for frame in frames), dtype=np.int64, count=len(frames))
+    points = np.concatenate(frames) if frames else np.empty((0, 3))
+    if bbox == 'episode':
+        lower = points.min(axis=0, initial=np.inf) if len(points) else np.zeros(3)
+        upper = points.max(axis=0, initial=-np.inf) if len(points) else np.zeros(3)
+        scale = np.where(upper > lower, (upper - lower) / 65535, 1.0)
+        point_lower, point_scale = lower, scale
+    else:
+        lower = np.zeros((len(frames), 3))
+        upper = np.zeros((len(frames), 3))
+        non_empty = counts > 0
+        starts = (np.cumsum(counts) - counts)[non_empty]
+        if len(starts) > 0:
+            lower[non_empty] = np.minimum.reduceat(points, starts, axis=0)
+            upper[non_empty] = np.maximum.reduceat(points, starts, axis=0)
+        scale = np.where(upper > lower, (upper - lower) / 65535, 1.0)
+        point_frame = np.repeat(np.arange(len(frames)), counts)
+        point_lower, point_scale = lower[point_frame], scale[point_frame]
+
+    quantized = (np.clip(np.rint((points - point_lower) / point_scale), 0, 65535) - 32768).astype(np.int16)
+    return {
+        'offset': lower,
+        'scale': scale,
+        'points': [frame.reshape(-1) for frame in np.split(quantized, np.cumsum(counts)[:-1])] if len(frames) else [],
+    }
+
+
+def encode_episode_compact(episode: Dict[str, Any], bbox: str = 'frame', motor_step: float = DEFAULT_MOTOR_STEP,
+                           time_step: float = DEFAULT_TIME_STEP) -> Dict[str, Any]:
+    """把 episode（或含 motor_data / pointcloud_data 的分块记录）转换为紧凑编码，格式与精度见模块说明"""
+    if bbox not in COMPACT_BBOX_MODES:
+        raise ValueError(f"Unknown bbox mode: {bbox}")
+    encoded = {field: value for field, value in episode.items() if field not in ('motor_data', 'pointcloud_data')}
+    encoding = {'version': COMPACT_VERSION, 'bbox': bbox, 'motor_step': motor_step, 'time_step': time_step}
+
+    motor_data = episode.get('motor_data', {})
+    time = _delta_encode(np.asarray(motor_data.get('time', []), dtype=np.float64), time_step)
+    motors = np.asarray(motor_data.get('motors', []), dtype=np.float64)
+    motors = _delta_encode(motors.reshape(len(motors), -1) if motors.size else motors.reshape(len(motors), 0), motor_step)
+    if time is None:
+        encoding['time_step'] = None
+        time = motor_data.get('time', [])
+    if motors is None:
+        encoding['motor_step'] = None
+        motors = motor_data.get('motors', [])
+    encoded['motor_data'] = {'time': time, 'motors': motors}
+
+    encoded['pointcloud_data'] = {
+        cam: _quantize_points(frames, bbox) for cam, frames in episode.get('pointcloud_data', {}).items()
+    }
+    encoded['encoding'] = encoding
+    return encoded
+
+
+def decode_episode_compact(episode: Dict[str, Any]) -> Dict[str, Any]:
+    """encode_episode_compact 的参考解码，返回与原始 episode 相同结构的数据（数组为 NumPy）"""
+    encoding = episode['encoding']
+    decoded = {field: value for field, value in episode.items() if field not in ('encoding', 'motor_data', 'pointcloud_data')}
+
+    motor_data = episode.get('motor_data', {})
+    time = np.asarray(motor_data.get('time', []), dtype=np.float64)
+    motors = np.asarray(motor_data.get('motors', []), dtype=np.float64)
+    if encoding.get('time_step') is not None:
+        time = np.cumsum(np.asarray(motor_data.get('time', []), dtype=np.int64)) * encoding['time_step']
+    if encoding.get('motor_step') is not None:
+        motors = np.cumsum(np.asarray(motor_data.get('motors', []), dtype=np.int64), axis=0) * encoding['motor_step']
+    decoded['motor_data'] = {'time': time, 'motors': motors}
+
+    decoded['pointcloud_data'] = {}
+    for cam, data in episode.get('pointcloud_data', {}).items():
+        offset = np.asarray(data['offset'], dtype=np.float64)
+        scale = np.asarray(data['scale'], dtype=np.float64)
+        frames = []
+        for index, frame in enumerate(data['points']):
+            quantized = np.asarray(frame, dtype=np.float64).reshape(-1, 3) + 32768
+            if encoding['bbox'] == 'episode':
+                frames.append(quantized * scale + offset)
+            else:
+                frames.append(quantized * scale[index] + offset[index])
+        decoded['pointcloud_data'][cam] = frames
+    return decoded
@@ -0,0 +1,66 @@
+"""电机曲线的多级 min/max 包络
+
+按帧降采样（frame_step 抽帧、compression_factor）会丢掉尖峰和夹爪开合这类短暂变化。
+包络把所有原始行按固定帧数分桶，记录每个桶内每个电机通道的最小值和最大值，画成带状曲线时
+任何尖峰都不会丢失。多个缩放级别在一次遍历中得到：先在原始行上计算最细的级别，
+更粗的级别由相邻 ENVELOPE_FACTOR 个桶再次归约。
+
+结构（levels 按从粗到细排列，最粗的级别不超过 ENVELOPE_BASE_BUCKETS 个桶）::
+
+    "motor_envelope": {
+      "source_frames": 原始行数,
+      "levels": [{
+        "bucket_frames": 每个桶的原始行数（最后一个桶可能不满）,
+        "time": [...],                      # 每个桶第一行的时间，与 motor_data.time 使用同样的归一化
+        "min":  [[m0, m1, ...], ...],       # 桶数 × 电机数，忽略 NaN
+        "max":  [[m0, m1, ...], ...]
+      }, ...]
+    }
+
+episode 响应中只保留最粗的级别（envelope_overview），更细的级别由 Node 端按时间窗口返回
+（GET /api/lerobot/motors，见 utils/lerobotEnvelope.js envelopeWindow）。
+"""
+import math
+from typing import Any, Dict
+
+import numpy as np
+
+ENVELOPE_BASE_BUCKETS = 256
+ENVELOPE_MAX_BUCKETS = 4096
+ENVELOPE_FACTOR = 4
+
+
+def motor_envelope(times: np.ndarray, motors: np.ndarray, base_buckets: int = ENVELOPE_BASE_BUCKETS,
+                   max_buckets: int = ENVELOPE_MAX_BUCKETS, factor: int = ENVELOPE_FACTOR) -> Dict[str, Any]:
+    """计算 (rows, motors) 矩阵的多级 min/max 包络，times 为每行的时间"""
+    motors = np.asarray(motors, dtype=np.float64)
+    rows = len(motors)
+    if rows == 0:
+        return {'source_frames': 0, 'levels': []}
+    motors = motors.reshape(rows, -1)
+    times = np.asarray(times, dtype=np.float64)
+
+    bucket_frames = max(1, math.ceil(rows / max_buckets))
+    starts = np.arange(0, rows, bucket_frames)
+    mins = np.fmin.reduceat(motors, starts, axis=0)
+    maxs = np.fmax.reduceat(motors, starts, axis=0)
+    levels = [{'bucket_frames': bucket_frames, 'time': times[starts], 'min': mins, 'max': maxs}]
+    while len(starts) > base_buckets:
+        groups = np.arange(0, len(starts), factor)
+        starts = starts[groups]
+        mins = np.fmin.reduceat(mins, groups, axis=0)
+        maxs = np.fmax.reduceat(maxs, groups, axis=0)
+        bucket_frames *= factor
+        levels.append({'bucket_frames': bucket_frames, 'time': times[starts], 'min': mins, 'max': maxs})
+    levels.reverse()
+    return {'source_frames': rows, 'levels': levels}
+
+
+def envelope_overview(envelope: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留最粗的级别，level_count 为完整包络的级别数"""
+    return {
+        'source_frames': envelope['source_frames'],
+        'level_count': len(envelope['levels']),
+        'levels': envelope['levels'][:1],
+    }
+
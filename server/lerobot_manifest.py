@@ -0,0 +1,155 @@
+"""LeRobot 数据集清单（manifest）
+
+只读取每个 parquet 的 footer（行数、row group 数、schema 与列统计信息）得到 episode_index、帧数、列名和 timestamp 范围，
+相机视频通过一次目录列表解析，视频时长来自 lerobot_video 的探测缓存。结果按数据集目录持久化，
+文件大小和修改时间都没有变化的条目直接复用，不再打开 parquet。
+
+清单文件位置: $CACHE_DIR/lerobot_manifest_<md5(folderPath)>.json（CACHE_DIR 默认 ./cache）。
+
+清单结构::
+
+    {
+      "version": 1,
+      "folderPath": ...,
+      "episodes": {
+        "<parquet 绝对路径>": {
+          "file": ..., "original_name": ..., "size": ..., "mtime_ns": ...,
+          "num_rows": ..., "num_row_groups": ..., "columns": [...],
+          "episode_index": ..., "key": "episode_000001",
+          "timestamp_min": ..., "timestamp_max": ..., "has_pointcloud": true,
+          "video_paths": {...}, "video_duration": ...
+        }
+      }
+    }
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow.parquet as pq
+
+from lerobot_reader import POINTCLOUD_COLUMNS, column_statistics, read_episode_index
+from lerobot_video import VIDEO_UPLOADS_DIR, probe_videos, resolve_episode_videos
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(folder_path: str) -> str:
+    digest = hashlib.md5(folder_path.strip('/').encode('utf-8')).hexdigest()
+    return os.path.join(os.environ.get('CACHE_DIR', 'cache'), f'lerobot_manifest_{digest}.json')
+
+
+def load_manifest(folder_path: str) -> Dict[str, Any]:
+    """读取持久化的清单，不存在或版本不符时返回空清单"""
+    try:
+        with open(manifest_path(folder_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'folderPath': folder_path, 'episodes': {}}
+
+
+def save_manifest(manifest: Dict[str, Any]):
+    path = manifest_path(manifest['folderPath'])
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Failed to write manifest {path}: {e}")
+
+
+def _stat_range(stats: List[Optional[Tuple[Any, Any]]]) -> Tuple[Any, Any]:
+    if not stats or any(s is None for s in stats):
+        return None, None
+    return min(s[0] for s in stats), max(s[1] for s in stats)
+
+
+def read_footer_entry(file_path: str, original_name: str) -> Dict[str, Any]:
+    """只根据 parquet footer 生成清单条目（统计信息缺失时才读取第一行的 episode_index）"""
+    stat = os.stat(file_path)
+    parquet_file = pq.ParquetFile(file_path)
+    metadata = parquet_file.metadata
+    columns = parquet_file.schema_arrow.names
+
+    episode_index = None
+    if 'episode_index' in columns and metadata.num_rows > 0:
+        episode_index, _ = _stat_range(column_statistics(parquet_file, 'episode_index'))
+        if episode_index is None:
+            episode_index = read_episode_index(parquet_file)
+    timestamp_min, timestamp_max = _stat_range(column_statistics(parquet_file, 'timestamp')) if 'timestamp' in columns else (None, None)
+
+    return {
+        'file': file_path,
+        'original_name': original_name,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'num_rows': metadata.num_rows,
+        'num_row_groups': metadata.num_row_groups,
+        'columns': columns,
+        'episode_index': int(episode_index) if episode_index is not None else None,
+        'key': f"episode_{int(episode_index):06d}" if episode_index is not None else None,
+        'timestamp_min': float(timestamp_min) if timestamp_min is not None else None,
+        'timestamp_max': float(timestamp_max) if timestamp_max is not None else None,
+        'has_pointcloud': all(column in columns for column in POINTCLOUD_COLUMNS.values()),
+    }
+
+
+def _list_video_dir() -> set:
+    try:
+        return {f"{VIDEO_UPLOADS_DIR}/{name}" for name in os.listdir(VIDEO_UPLOADS_DIR)}
+    except OSError as e:
+        logging.warning(f"Cannot list video directory {VIDEO_UPLOADS_DIR}: {e}")
+        return set()
+
+
+def build_manifest(folder_path: str, files: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """为数据集目录下的 files（(path, original_name) 列表）建立或更新清单，返回 绝对路径 -> 条目
+
+    未变化的文件只做一次 stat；无法读取的文件不写入清单（解析时会单独报错）。
+    """
+    base_folder = folder_path.replace('\\', '/')
+    manifest = load_manifest(base_folder)
+    previous = manifest['episodes']
+    entries: Dict[str, Dict[str, Any]] = {}
+    changed = False
+
+    for file_path, original_name in files:
+        abs_path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(abs_path)
+            entry = previous.get(abs_path)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                entry = read_footer_entry(abs_path, original_name)
+                changed = True
+            entries[abs_path] = entry
+        except Exception as e:
+            logging.error(f"Cannot index {file_path}: {e}")
+
+    # 一次目录列表解析所有 episode 的视频，未缓存的视频时长并发探测
+    existing_videos = _list_video_dir()
+    for entry in entries.values():
+        if entry['key'] is not None:
+            video_paths = resolve_episode_videos(base_folder, entry['key'], existing_videos.__contains__)
+            changed = changed or video_paths != entry.get('video_paths')
+            entry['video_paths'] = video_paths
+    probe_results = probe_videos({path for entry in entries.values() for path in (entry.get('video_paths') or {}).values() if path})
+    for entry in entries.values():
+        durations = [probe_results[path]['duration'] for path in (entry.get('video_paths') or {}).values()
+                     if path and probe_results.get(path)]
+        video_duration = max(durations, default=0.0)
+        changed = changed or video_duration != entry.get('video_duration')
+        entry['video_duration'] = video_duration
+
+    if changed:
+        manifest['episodes'] = {**previous, **entries}
+        save_manifest(manifest)
+    logging.info(f"Manifest for {base_folder}: {len(entries)} episodes")
+    return entries
@@ -0,0 +1,208 @@
+"""相机视频的预览图（关键帧缩略图拼成的 sprite sheet）与时间戳映射
+
+浏览器拖动时间轴时不需要加载完整的 mp4：每个相机视频按固定间隔（interval）或只取关键帧（keyframe）
+截取低分辨率缩略图，按 columns × rows 拼成 JPEG sheet，并记录每张缩略图的显示时间。
+
+每个视频一个 ffmpeg 进程完成解码、抽帧、缩放和拼图（showinfo 滤镜输出每张缩略图的 pts_time），
+一批视频由有界线程池并发执行，同时运行的 ffmpeg 进程数不超过 max_workers（每个进程单线程）。
+
+结果按视频内容寻址缓存：键为视频哈希（文件大小 + 开头和结尾各 PREVIEW_HASH_BYTES 字节的 SHA-1）与预览参数的 SHA-1，
+同一视频重复上传或改名后仍然命中。目录结构::
+
+    $LEROBOT_PREVIEW_DIR/<key[:2]>/<key>/     （默认 $CACHE_DIR/lerobot_previews）
+      preview.json
+      sheet_000.jpg, sheet_001.jpg, ...
+
+preview.json::
+
+    {
+      "version": 1, "key": ..., "video_hash": ..., "mode": "interval" | "keyframe", "interval": 1.0 或 null,
+      "tile_width": 160, "tile_height": 120, "columns": 10, "rows": 10,
+      "sheets": ["sheet_000.jpg", ...],
+      "times": [...]      # 第 i 张缩略图的显示时间（秒），位于 sheets[i // (columns * rows)] 的
+                          # 第 (i % (columns * rows)) // columns 行、第 i % columns 列
+    }
+
+times 单调递增，视频时间 -> 缩略图同样是一次二分查找。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import ffmpeg
+
+from lerobot_video import probe_videos
+
+PREVIEW_VERSION = 1
+PREVIEW_MODES = ('interval', 'keyframe')
+DEFAULT_PREVIEW_INTERVAL = 1.0
+PREVIEW_TILE_WIDTH = 160
+PREVIEW_COLUMNS = 10
+PREVIEW_ROWS = 10
+# JPEG 质量（ffmpeg -q:v，2~31，越小越好）
+PREVIEW_JPEG_QUALITY = 5
+PREVIEW_HASH_BYTES = 1024 * 1024
+# 同时运行的 ffmpeg 进程数上限（可用环境变量 LEROBOT_PREVIEW_WORKERS 覆盖）
+DEFAULT_PREVIEW_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+PREVIEW_FILE = 'preview.json'
+SHEET_PATTERN = 'sheet_%03d.jpg'
+_PTS_TIME = re.compile(r'pts_time:\s*([-\d.]+)')
+
+_hash_cache: Dict[tuple, str] = {}
+_hash_lock = threading.Lock()
+
+
+def default_preview_dir() -> str:
+    if os.environ.get('LEROBOT_PREVIEW_DIR'):
+        return os.environ['LEROBOT_PREVIEW_DIR']
+    return os.path.join(os.environ.get('CACHE_DIR', 'cache'), 'lerobot_previews')
+
+
+def default_preview_workers() -> int:
+    try:
+        return max(1, int(os.environ.get('LEROBOT_PREVIEW_WORKERS') or DEFAULT_PREVIEW_WORKERS))
+    except ValueError:
+        return DEFAULT_PREVIEW_WORKERS
+
+
+def video_hash(file_path: str) -> str:
+    """视频文件的内容哈希（大小 + 首尾各 PREVIEW_HASH_BYTES 字节），同一文件按大小和修改时间在进程内复用"""
+    stat = os.stat(file_path)
+    signature = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if signature in _hash_cache:
+            return _hash_cache[signature]
+    digest = hashlib.sha1(str(stat.st_size).encode('ascii'))
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(PREVIEW_HASH_BYTES))
+        if stat.st_size > PREVIEW_HASH_BYTES:
+            f.seek(max(PREVIEW_HASH_BYTES, stat.st_size - PREVIEW_HASH_BYTES))
+            digest.update(f.read(PREVIEW_HASH_BYTES))
+    value = digest.hexdigest()
+    with _hash_lock:
+        _hash_cache[signature] = value
+    return value
+
+
+def preview_params(mode: str = 'interval', interval: float = None, tile_width: int = PREVIEW_TILE_WIDTH,
+                   columns: int = PREVIEW_COLUMNS, rows: int = PREVIEW_ROWS) -> Dict[str, Any]:
+    """规范化预览参数（keyframe 模式没有 interval），未知模式抛出 ValueError"""
+    if mode not in PREVIEW_MODES:
+        raise ValueError(f"Unknown preview mode: {mode}")
+    if mode == 'interval':
+        interval = float(interval or DEFAULT_PREVIEW_INTERVAL)
+        if interval <= 0:
+            raise ValueError(f"Preview interval must be positive: {interval}")
+    else:
+        interval = None
+    return {'mode': mode, 'interval': interval, 'tile_width': int(tile_width), 'columns': int(columns), 'rows': int(rows)}
+
+
+def preview_key(hash_value: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps({'version': PREVIEW_VERSION, 'video_hash': hash_value, 'params': params}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def preview_path(key: str, root: str = None) -> str:
+    return os.path.join(root or default_preview_dir(), key[:2], key)
+
+
+def load_preview(key: str, root: str = None) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(preview_path(key, root), PREVIEW_FILE), 'r', encoding='utf-8') as f:
+            preview = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return preview if preview.get('version') == PREVIEW_VERSION else None
+
+
+def _tile_height(tile_width: int, info: Optional[Dict[str, Any]]) -> int:
+    """按视频宽高比计算缩略图高度（偶数），没有分辨率信息时按 4:3"""
+    width, height = (info or {}).get('width') or 4, (info or {}).get('height') or 3
+    return max(2, int(round(tile_width * height / width / 2)) * 2)
+
+
+def _render_sheets(file_path: str, output_dir: str, params: Dict[str, Any], tile_height: int) -> list:
+    """运行一个 ffmpeg 进程生成所有 sheet，返回每张缩略图的显示时间"""
+    if params['mode'] == 'keyframe':
+        # 只解码关键帧，速度与视频长度中的关键帧数成正比
+        stream = ffmpeg.input(file_path, skip_frame='nokey', threads=1)
+    else:
+        stream = ffmpeg.input(file_path, threads=1).filter('fps', fps=f"1/{params['interval']}")
+    stream = (stream
+              .filter('showinfo')
+              .filter('scale', params['tile_width'], tile_height)
+              .filter('tile', f"{params['columns']}x{params['rows']}"))
+    _, stderr = (stream
+                 .output(os.path.join(output_dir, SHEET_PATTERN), vsync='vfr', threads=1,
+                         **{'q:v': PREVIEW_JPEG_QUALITY}, loglevel='info', nostats=None)
+                 .overwrite_output()
+                 .run(capture_stdout=True, capture_stderr=True))
+    return [float(value) for value in _PTS_TIME.findall(stderr.decode('utf-8', errors='replace'))]
+
+
+def generate_preview(file_path: str, params: Dict[str, Any], info: Optional[Dict[str, Any]] = None,
+                     root: str = None) -> Optional[Dict[str, Any]]:
+    """生成（或从缓存读取）一个视频的预览，失败时返回 None"""
+    root = root or default_preview_dir()
+    try:
+        hash_value = video_hash(file_path)
+    except OSError as e:
+        logging.error(f"Cannot read video {file_path}: {e}")
+        return None
+    key = preview_key(hash_value, params)
+    cached = load_preview(key, root)
+    if cached is not None:
+        return cached
+
+    final_dir = preview_path(key, root)
+    tmp_dir = f"{final_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+    tile_height = _tile_height(params['tile_width'], info)
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        times = _render_sheets(file_path, tmp_dir, params, tile_height)
+        preview = {
+            'version': PREVIEW_VERSION,
+            'key': key,
+            'video_hash': hash_value,
+            **params,
+            'tile_height': tile_height,
+            'sheets': sorted(name for name in os.listdir(tmp_dir) if name.endswith('.jpg')),
+            'times': times,
+        }
+        with open(os.path.join(tmp_dir, PREVIEW_FILE), 'w', encoding='utf-8') as f:
+            json.dump(preview, f)
+        try:
+            os.replace(tmp_dir, final_dir)
+        except OSError:
+            # 其他进程已经生成了同一个预览
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logging.info(f"Generated {len(times)} preview tiles in {len(preview['sheets'])} sheets for {file_path}")
+        return preview
+    except ffmpeg.Error as e:
+        logging.error(f"Failed to generate preview for {file_path}: {e.stderr.decode(errors='replace')[-500:] if e.stderr else e}")
+    except OSError as e:
+        logging.error(f"Failed to generate preview for {file_path}: {e}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return None
+
+
+def generate_previews(file_paths: Iterable[str], params: Dict[str, Any], max_workers: int = None,
+                      root: str = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """批量生成预览，返回 file_path -> 预览（失败为 None）；同时运行的 ffmpeg 进程不超过 max_workers"""
+    file_paths = list(dict.fromkeys(file_paths))
+    if not file_paths:
+        return {}
+    infos = probe_videos(file_paths)
+    workers = min(max_workers or default_preview_workers(), len(file_paths))
+    logging.info(f"Generating previews for {len(file_paths)} videos with {workers} ffmpeg processes")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {path: pool.submit(generate_preview, path, params, infos.get(path), root) for path in file_paths}
+        return {path: future.result() for path, future in futures.items()}
@@ -0,0 +1,158 @@
+"""解析阶段的耗时与内存统计
+
+StageProfiler 按阶段名累计墙钟时间、调用次数和阶段内的峰值 RSS。阶段可以交替进入
+（流式读取时 read / sample 按 batch 交替执行），同名阶段的时间累加、峰值取最大。
+
+每次进入阶段前通过 /proc/self/clear_refs 重置进程的峰值 RSS（Linux 4.0+），阶段结束时读取 VmHWM，
+得到的是该阶段内的峰值；不支持重置时退化为进程启动以来的峰值，此时 peak_rss_reset 为 False。
+
+不需要统计时使用 NULL_PROFILER，各个钩子都是空操作，不影响解析性能。
+frame_stats=True 时解析器额外计算逐帧的点云统计（开销较大，只在明确要求时开启）。
+
+parse_lerobot.py --profile 为每个 episode 向 stderr 写一行 JSON 记录（write_profile_record）::
+
+    {"type": "profile", "file": ..., "key": ..., "pid": ...,
+     "stages": {"video_probe": {"seconds": ..., "calls": ..., "peak_rss_mb": ...}, "read": ..., "decimate": ...,
+                "sample": ..., "normalize": ..., "serialize": ...},
+     "counters": {"rows": ..., "rows_read": ..., "frames": ..., "points_in": ..., "points_out": ..., "bytes": ...},
+     "peak_rss_mb": ..., "peak_rss_reset": true, "frame_stats": {...}}
+"""
+import contextlib
+import json
+import resource
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+PROFILE_RECORD_TYPE = 'profile'
+
+_write_lock = threading.Lock()
+
+
+def _read_status_kb(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    """进程的峰值 RSS（上次重置以来）"""
+    peak_kb = _read_status_kb('VmHWM')
+    if peak_kb is None:
+        # Linux 上 ru_maxrss 的单位为 KB
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_kb / 1024
+
+
+def reset_peak_rss() -> bool:
+    """把峰值 RSS 重置为当前 RSS，成功返回 True"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class StageProfiler:
+    """按阶段累计耗时、峰值内存和计数"""
+
+    enabled = True
+
+    def __init__(self, track_memory: bool = True, frame_stats: bool = False):
+        self.track_memory = track_memory
+        self.frame_stats = frame_stats
+        self.frame_summary: Dict[str, Any] = {}
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.peak_rss_reset = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        if self.track_memory:
+            self.peak_rss_reset = reset_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def _record(self, name: str, elapsed: float):
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_rss_mb': 0.0})
+        entry['seconds'] += elapsed
+        entry['calls'] += 1
+        if self.track_memory:
+            entry['peak_rss_mb'] = max(entry['peak_rss_mb'], peak_rss_mb())
+
+    def iter_stage(self, name: str, iterable: Iterable) -> Iterator:
+        """迭代 iterable，把每次取下一个元素的时间计入 name 阶段（用于流式读取）"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            'stages': {name: dict(entry) for name, entry in self.stages.items()},
+            'counters': dict(self.counters),
+            'peak_rss_mb': max((entry['peak_rss_mb'] for entry in self.stages.values()), default=0.0),
+            'peak_rss_reset': self.peak_rss_reset,
+        }
+        if self.frame_stats:
+            result['frame_stats'] = self.frame_summary
+        return result
+
+
+def merge_profiles(record: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """把另一个 to_dict() 结果（如主进程的序列化阶段）合并进 record：同名阶段时间相加，峰值取最大"""
+    for name, entry in other.get('stages', {}).items():
+        target = record['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_rss_mb': 0.0})
+        target['seconds'] += entry['seconds']
+        target['calls'] += entry['calls']
+        target['peak_rss_mb'] = max(target['peak_rss_mb'], entry['peak_rss_mb'])
+    for name, value in other.get('counters', {}).items():
+        record['counters'][name] = record['counters'].get(name, 0) + value
+    record['peak_rss_mb'] = max(record.get('peak_rss_mb', 0.0), other.get('peak_rss_mb', 0.0))
+    return record
+
+
+def write_profile_record(record: Dict[str, Any], stream=None):
+    """向 stderr 写一行 profile 记录（与日志共用 stderr，按行区分）"""
+    line = json.dumps({'type': PROFILE_RECORD_TYPE, **record})
+    stream = stream or sys.stderr
+    with _write_lock:
+        stream.write(line + '\n')
+        stream.flush()
+
+
+class _NullProfiler:
+    enabled = False
+    frame_stats = False
+
+    def stage(self, name: str):
+        return contextlib.nullcontext()
+
+    def iter_stage(self, name: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'stages': {}, 'counters': {}, 'peak_rss_mb': 0.0, 'peak_rss_reset': False}
+
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,228 @@
+"""LeRobot parquet 流式读取
+
+只读取解析需要的列，并按 record batch 顺序边读边抽帧，避免把整张表（尤其是点云列）一次性加载到内存。
+"""
+import math
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lerobot_profile import NULL_PROFILER
+
+# 相机名称 -> 点云列名
+POINTCLOUD_COLUMNS = {
+    'cam_top': 'observation.pointcloud.cam_top',
+    'cam_right_wrist': 'observation.pointcloud.cam_right_wrist',
+}
+
+# 除点云外需要读取的列
+FRAME_COLUMNS = ('episode_index', 'timestamp', 'action')
+
+# 每个 batch 的行数；点云列单行可达数 MB，batch 不宜过大
+DEFAULT_BATCH_SIZE = 64
+
+
+def plan_frame_step(total_rows: int, max_frames: int) -> Tuple[int, int]:
+    """计算抽帧步长与保留的帧数，与 df.iloc[::frame_step][:max_frames] 的结果一致"""
+    if total_rows == 0:
+        return 1, 0
+    if max_frames >= total_rows:
+        return 1, total_rows
+    frame_step = max(1, total_rows // max_frames)
+    return frame_step, min(max_frames, math.ceil(total_rows / frame_step))
+
+
+def list_column_to_ragged(array) -> Tuple[np.ndarray, np.ndarray]:
+    """把（可嵌套的）list 列展平为 (flat, offsets)，第 i 行的标量为 flat[offsets[i]:offsets[i + 1]]
+
+    同时兼容 list<float>（展平的 x,y,z 序列）与 list<list<float>>（N×3）两种点云存储方式。
+    """
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    offsets = np.arange(len(array) + 1, dtype=np.int64)
+    values = array
+    while pa.types.is_list(values.type) or pa.types.is_large_list(values.type) or pa.types.is_fixed_size_list(values.type):
+        # 直接按 offsets 切片子数组（而不是 flatten），null 行占用的子元素也能保持对齐
+        if pa.types.is_fixed_size_list(values.type):
+            size = values.type.list_size
+            inner_offsets = np.arange(len(values) + 1, dtype=np.int64) * size
+            child = values.values.slice(values.offset * size, len(values) * size)
+        else:
+            raw_offsets = np.asarray(values.offsets, dtype=np.int64)
+            inner_offsets = raw_offsets - raw_offsets[0]
+            child = values.values.slice(raw_offsets[0], raw_offsets[-1] - raw_offsets[0])
+        offsets = inner_offsets[offsets]
+        values = child
+
+    flat = values.to_numpy(zero_copy_only=False)
+    return flat, offsets
+
+
+def read_episode_index(parquet_file: pq.ParquetFile) -> Optional[int]:
+    """读取第一行的 episode_index（只解码第一个 row group 的该列）"""
+    if parquet_file.metadata.num_rows == 0:
+        return None
+    column = parquet_file.read_row_group(0, columns=['episode_index']).column(0)
+    return int(column[0].as_py())
+
+
+def iter_decimated_batches(parquet_file: pq.ParquetFile, columns: List[str], frame_step: int = 1,
+                           max_rows: int = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                           profiler=NULL_PROFILER) -> Iterator[Tuple[np.ndarray, pa.RecordBatch]]:
+    """按行顺序流式读取 columns，只保留全局行号能被 frame_step 整除的行，最多 max_rows 行
+
+    每次产出 (row_indices, batch)，row_indices 为保留行在文件中的全局行号。
+    读取计入 profiler 的 read 阶段，抽帧（batch.take）计入 decimate 阶段。
+    """
+    row_start = 0
+    kept = 0
+    for batch in profiler.iter_stage('read', parquet_file.iter_batches(batch_size=batch_size, columns=columns)):
+        num_rows = batch.num_rows
+        profiler.count('rows_read', num_rows)
+        first = (-row_start) % frame_step
+        indices = np.arange(first, num_rows, frame_step)
+        if max_rows is not None:
+            indices = indices[:max_rows - kept]
+        row_start += num_rows
+
+        if len(indices) > 0:
+            kept += len(indices)
+            if len(indices) < num_rows:
+                with profiler.stage('decimate'):
+                    batch = batch.take(pa.array(indices))
+            yield indices + (row_start - num_rows), batch
+
+        if max_rows is not None and kept >= max_rows:
+            break
+
+
+def batch_to_matrix(batch: pa.RecordBatch, column: str) -> np.ndarray:
+    """把定长 list 列（如 action）转换为 (rows, width) 矩阵"""
+    flat, offsets = list_column_to_ragged(batch.column(column))
+    lengths = np.diff(offsets)
+    if len(lengths) and np.any(lengths != lengths[0]):
+        raise ValueError(f"Column '{column}' has rows of different lengths")
+    width = int(lengths[0]) if len(lengths) else 0
+    return flat.astype(np.float64, copy=False).reshape(batch.num_rows, width)
+
+
+def read_motor_series(parquet_file: pq.ParquetFile, with_timestamp: bool = True,
+                      batch_size: int = 4096) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """读取所有行（不抽帧）的 timestamp 与 action 矩阵，只投影这两列；没有 timestamp 列时第一项为 None"""
+    columns = (['timestamp'] if with_timestamp else []) + ['action']
+    timestamp_chunks = []
+    action_chunks = []
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        if with_timestamp:
+            timestamp_chunks.append(batch.column('timestamp').to_numpy(zero_copy_only=False))
+        action_chunks.append(batch_to_matrix(batch, 'action'))
+    timestamps = (np.concatenate(timestamp_chunks) if timestamp_chunks else np.empty(0)) if with_timestamp else None
+    actions = np.concatenate(action_chunks) if action_chunks else np.empty((0, 0))
+    return timestamps, actions
+
+
+def row_group_starts(parquet_file: pq.ParquetFile) -> np.ndarray:
+    """每个 row group 第一行的全局行号，末尾追加总行数（只读 footer）"""
+    metadata = parquet_file.metadata
+    counts = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    starts = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=starts[1:])
+    return starts
+
+
+def column_statistics(parquet_file: pq.ParquetFile, column: str) -> List[Optional[Tuple[float, float]]]:
+    """每个 row group 中 column 的 (min, max) 统计值，缺失时为 None"""
+    metadata = parquet_file.metadata
+    bounds = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        stats = None
+        for j in range(row_group.num_columns):
+            chunk = row_group.column(j)
+            if chunk.path_in_schema == column:
+                if chunk.statistics is not None and chunk.statistics.has_min_max:
+                    stats = (chunk.statistics.min, chunk.statistics.max)
+                break
+        bounds.append(stats)
+    return bounds
+
+
+def column_bounds(parquet_file: pq.ParquetFile, column: str) -> Optional[Tuple[float, float]]:
+    """整个文件中 column 的最小、最大值：优先使用 row group 统计信息，缺失时才读取该列"""
+    stats = column_statistics(parquet_file, column)
+    if stats and all(s is not None for s in stats):
+        return min(s[0] for s in stats), max(s[1] for s in stats)
+    values = parquet_file.read(columns=[column]).column(0).to_numpy(zero_copy_only=False)
+    if len(values) == 0:
+        return None
+    return values.min(), values.max()
+
+
+def rows_for_value_range(parquet_file: pq.ParquetFile, column: str, low: float = None,
+                         high: float = None) -> Tuple[int, int]:
+    """返回 column 取值落在 [low, high] 内的行所在的全局行号区间 [start, end)
+
+    先用 row group 统计信息排除不可能命中的 row group，只读取候选 row group 的这一列。
+    """
+    starts = row_group_starts(parquet_file)
+    stats = column_statistics(parquet_file, column)
+    candidates = [
+        i for i, bounds in enumerate(stats)
+        if bounds is None or ((low is None or bounds[1] >= low) and (high is None or bounds[0] <= high))
+    ]
+
+    first, last = None, None
+    for i in candidates:
+        values = parquet_file.read_row_group(i, columns=[column]).column(0).to_numpy(zero_copy_only=False)
+        mask = np.ones(len(values), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        hits = np.flatnonzero(mask)
+        if len(hits) > 0:
+            first = starts[i] + hits[0] if first is None else first
+            last = starts[i] + hits[-1]
+    if first is None:
+        return 0, 0
+    return int(first), int(last) + 1
+
+
+def iter_row_range_batches(parquet_file: pq.ParquetFile, columns: List[str], start: int, end: int, frame_step: int = 1,
+                           max_rows: int = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                           profiler=NULL_PROFILER) -> Iterator[Tuple[np.ndarray, pa.RecordBatch]]:
+    """只读取与行区间 [start, end) 重叠的 row group，保留 start, start + frame_step, ... 这些行，最多 max_rows 行
+
+    与 iter_decimated_batches 一样产出 (row_indices, batch)，row_indices 为全局行号。
+    """
+    starts = row_group_starts(parquet_file)
+    end = min(end, int(starts[-1]))
+    if start >= end:
+        return
+    first_group = int(np.searchsorted(starts, start, side='right')) - 1
+    last_group = int(np.searchsorted(starts, end, side='left')) - 1
+    row_groups = list(range(first_group, last_group + 1))
+
+    row_start = int(starts[first_group])
+    kept = 0
+    for batch in profiler.iter_stage('read', parquet_file.iter_batches(batch_size=batch_size, columns=columns, row_groups=row_groups)):
+        num_rows = batch.num_rows
+        profiler.count('rows_read', num_rows)
+        rows = np.arange(row_start, row_start + num_rows)
+        row_start += num_rows
+        rows = rows[(rows >= start) & (rows < end) & ((rows - start) % frame_step == 0)]
+        if max_rows is not None:
+            rows = rows[:max_rows - kept]
+
+        if len(rows) > 0:
+            kept += len(rows)
+            if len(rows) < num_rows:
+                with profiler.stage('decimate'):
+                    batch = batch.take(pa.array(rows - (row_start - num_rows)))
+            yield rows, batch
+
+        if row_start >= end or (max_rows is not None and kept >= max_rows):
+            break
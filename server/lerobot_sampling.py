@@ -0,0 +1,300 @@
+"""点云批量降采样
+
+以 (flat, offsets) 形式的变长缓冲区一次处理一整块帧：过滤非有限值的点，并对每帧无放回地随机保留最多 max_points 个点。
+
+随机性来自 (seed, 源帧号, 帧内点序号) 的整数哈希，而不是全局随机状态，因此：
+- 相同输入和 seed 总是得到相同的采样结果，缓存和 diff 保持稳定；
+- 结果与分块方式无关。
+
+整块帧在进程内一次向量化处理；多个 episode 之间的并行由 parse_lerobot 的 episode 级进程池负责。
+
+progressive=True 时，每帧保留的点会重排为"渐进顺序"：先按 Morton（Z 序）码排序，再按排名的位反转序排列，
+使得任意前 N 个点都是在空间上均匀分布的子样本，不同质量级别只需取前缀即可。
+
+reduction 选择降采样方式（输出格式相同）：
+- random: 均匀随机保留（默认）；
+- voxel: 体素网格降采样，每个体素输出其中点的质心。指定 voxel_size 时使用固定体素边长，
+  否则在每帧包围盒上自动选择体素层级，使体素数不少于 max_points 后再随机保留 max_points 个体素；
+- fps: 近似最远点采样，先随机保留 FPS_CANDIDATE_FACTOR * max_points 个候选点，再在候选点上做最远点采样，
+  输出顺序即为采样顺序。迭代次数等于 max_points，适合几百个点的目标，目标点数越大越慢。
+
+只有 random 支持 progressive（LOD）输出按前缀切出各质量级别：voxel 的前缀不是更粗体素网格的结果，
+fps 按 LOD 最大点数采样既慢、前缀也不是该点数下的最远点采样，因此这两种方式按各质量级别的点数分别采样（见 parse_lerobot）。
+"""
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+REDUCTION_MODES = ('random', 'voxel', 'fps')
+
+# 近似最远点采样的候选点数为目标点数的倍数
+FPS_CANDIDATE_FACTOR = 4
+
+# Morton 码每个轴的位数（自动体素层级的最细一级为 2^10 个体素）
+_MORTON_BITS = 10
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def stable_seed(*parts) -> int:
+    """由 episode key、相机名等生成稳定的 32 位 seed（不受 PYTHONHASHSEED 影响）"""
+    return zlib.crc32(':'.join(str(p) for p in parts).encode('utf-8'))
+
+
+def _hash_keys(seed: int, frame_ids: np.ndarray, point_ids: np.ndarray) -> np.ndarray:
+    """splitmix64 风格的向量化整数哈希，返回每个点的排序键"""
+    with np.errstate(over='ignore'):
+        x = frame_ids.astype(np.uint64) * _GOLDEN + point_ids.astype(np.uint64) + np.uint64(seed)
+        x ^= x >> np.uint64(30)
+        x *= _MIX1
+        x ^= x >> np.uint64(27)
+        x *= _MIX2
+        x ^= x >> np.uint64(31)
+    return x
+
+
+def _ragged_positions(counts: np.ndarray) -> np.ndarray:
+    """对每段长度为 counts[i] 的区间生成 0..counts[i]-1 的位置序号"""
+    total = int(counts.sum())
+    starts = np.cumsum(counts) - counts
+    return np.arange(total, dtype=np.int64) - np.repeat(starts, counts)
+
+
+def _frame_bounds(points: np.ndarray, frame_counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """每帧的包围盒下界与上界（points 须按帧连续存放，空帧为 0）"""
+    non_empty = frame_counts > 0
+    starts = (np.cumsum(frame_counts) - frame_counts)[non_empty]
+    lower = np.zeros((len(frame_counts), 3), dtype=np.float64)
+    upper = np.zeros((len(frame_counts), 3), dtype=np.float64)
+    if len(starts) > 0:
+        lower[non_empty] = np.minimum.reduceat(points, starts, axis=0)
+        upper[non_empty] = np.maximum.reduceat(points, starts, axis=0)
+    return lower, upper
+
+
+def _morton_codes(points: np.ndarray, point_frame: np.ndarray, frame_counts: np.ndarray) -> np.ndarray:
+    """把每帧的点量化到该帧包围盒内的 1024³ 网格，返回 30 位 Morton 码（points 须按帧连续存放）"""
+    lower, upper = _frame_bounds(points, frame_counts)
+    extent = np.maximum(upper - lower, 1e-12)
+    cells = ((points - lower[point_frame]) / extent[point_frame] * ((1 << _MORTON_BITS) - 1)).astype(np.uint64)
+
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for axis in range(3):
+        x = cells[:, axis]
+        x = (x | (x << np.uint64(16))) & np.uint64(0x030000FF)
+        x = (x | (x << np.uint64(8))) & np.uint64(0x0300F00F)
+        x = (x | (x << np.uint64(4))) & np.uint64(0x030C30C3)
+        x = (x | (x << np.uint64(2))) & np.uint64(0x09249249)
+        codes |= x << np.uint64(axis)
+    return codes
+
+
+def _bit_reverse(values: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """把 values 的低 bits 位反转（每个元素的位数可以不同）"""
+    x = values.astype(np.uint32)
+    x = ((x >> 1) & 0x55555555) | ((x & 0x55555555) << 1)
+    x = ((x >> 2) & 0x33333333) | ((x & 0x33333333) << 2)
+    x = ((x >> 4) & 0x0F0F0F0F) | ((x & 0x0F0F0F0F) << 4)
+    x = ((x >> 8) & 0x00FF00FF) | ((x & 0x00FF00FF) << 8)
+    x = (x >> 16) | (x << 16)
+    return (x >> (32 - bits).astype(np.uint32)).astype(np.int64)
+
+
+def _progressive_order(points: np.ndarray, point_frame: np.ndarray, frame_counts: np.ndarray) -> np.ndarray:
+    """返回每帧内的渐进排列下标：任意前缀都在空间上均匀覆盖整帧"""
+    if len(points) == 0:
+        return np.arange(0)
+    by_morton = np.lexsort((_morton_codes(points, point_frame, frame_counts), point_frame))
+    frame_starts = np.cumsum(frame_counts) - frame_counts
+    rank = np.arange(len(points)) - frame_starts[point_frame[by_morton]]
+    bits = np.ceil(np.log2(np.maximum(frame_counts, 1))).astype(np.int64)[point_frame[by_morton]]
+    progressive = np.lexsort((_bit_reverse(rank, bits), point_frame[by_morton]))
+    return by_morton[progressive]
+
+
+def _keep_by_rank(keys: np.ndarray, item_frame: np.ndarray, frame_counts: np.ndarray, max_items: int) -> np.ndarray:
+    """每帧按 keys 排序保留排名前 max_items 的元素，返回布尔掩码（元素须按帧连续存放）"""
+    order = np.lexsort((keys, item_frame))
+    frame_starts = np.cumsum(frame_counts) - frame_counts
+    rank = np.arange(len(order)) - frame_starts[item_frame[order]]
+    selected = np.zeros(len(keys), dtype=bool)
+    selected[order[rank < max_items]] = True
+    return selected
+
+
+def _voxel_reduce(points: np.ndarray, point_frame: np.ndarray, frame_counts: np.ndarray, frame_ids: np.ndarray,
+                  max_points: int, seed: int, voxel_size: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """体素网格降采样，返回 (体素质心, 每个质心所属的帧)，按帧连续存放"""
+    num_frames = len(frame_counts)
+    if len(points) == 0:
+        return points, point_frame
+
+    if voxel_size:
+        lower, _ = _frame_bounds(points, frame_counts)
+        cells = np.minimum(np.floor((points - lower[point_frame]) / voxel_size), (1 << 21) - 1).astype(np.uint64)
+        cell_keys = (cells[:, 0] << np.uint64(42)) | (cells[:, 1] << np.uint64(21)) | cells[:, 2]
+        order = np.lexsort((cell_keys, point_frame))
+        cell_keys = cell_keys[order]
+    else:
+        # 自动选择层级：每帧取体素数不少于 max_points 的最粗层级（Morton 码右移 3 位即为粗一级的体素）
+        codes = _morton_codes(points, point_frame, frame_counts)
+        order = np.lexsort((codes, point_frame))
+        codes = codes[order]
+        frame_start = np.ones(len(codes), dtype=bool)
+        frame_start[1:] = point_frame[order][1:] != point_frame[order][:-1]
+        level_shift = np.zeros(num_frames, dtype=np.uint64)
+        chosen = np.zeros(num_frames, dtype=bool)
+        for level in range(1, _MORTON_BITS + 1):
+            shift = np.uint64(3 * (_MORTON_BITS - level))
+            shifted = codes >> shift
+            new_cell = frame_start.copy()
+            new_cell[1:] |= shifted[1:] != shifted[:-1]
+            occupied = np.bincount(point_frame[order][new_cell], minlength=num_frames)
+            newly = ~chosen & (occupied >= (max_points or 0))
+            level_shift[newly] = shift
+            chosen |= newly
+            if chosen.all():
+                break
+        cell_keys = codes >> level_shift[point_frame[order]]
+
+    # 同一帧同一体素的点（排序后相邻）合并为质心
+    points, point_frame = points[order], point_frame[order]
+    new_voxel = np.ones(len(points), dtype=bool)
+    new_voxel[1:] = (point_frame[1:] != point_frame[:-1]) | (cell_keys[1:] != cell_keys[:-1])
+    voxel_of_point = np.cumsum(new_voxel) - 1
+    counts = np.bincount(voxel_of_point)
+    centroids = np.stack([np.bincount(voxel_of_point, weights=points[:, axis]) for axis in range(3)], axis=1) / counts[:, None]
+    voxel_frame = point_frame[new_voxel]
+
+    if max_points is not None:
+        voxel_counts = np.bincount(voxel_frame, minlength=num_frames)
+        if np.any(voxel_counts > max_points):
+            keys = _hash_keys(seed, frame_ids[voxel_frame], cell_keys[new_voxel])
+            selected = _keep_by_rank(keys, voxel_frame, voxel_counts, max_points)
+            centroids, voxel_frame = centroids[selected], voxel_frame[selected]
+    return centroids.astype(points.dtype, copy=False), voxel_frame
+
+
+def _farthest_point_reduce(points: np.ndarray, point_frame: np.ndarray, frame_counts: np.ndarray, frame_ids: np.ndarray,
+                           max_points: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """近似最远点采样，所有帧补齐成 (帧数, 候选数) 的矩阵后同步迭代，返回 (点, 所属帧)"""
+    num_frames = len(frame_counts)
+    if len(points) == 0 or max_points is None:
+        return points, point_frame
+
+    # 候选点：按哈希键随机保留，哈希排名第一的点作为起点
+    keys = _hash_keys(seed, frame_ids[point_frame], _ragged_positions(frame_counts))
+    candidates = _keep_by_rank(keys, point_frame, frame_counts, FPS_CANDIDATE_FACTOR * max_points)
+    points, point_frame, keys = points[candidates], point_frame[candidates], keys[candidates]
+    frame_counts = np.bincount(point_frame, minlength=num_frames)
+
+    order = np.lexsort((keys, point_frame))
+    points, point_frame = points[order], point_frame[order]
+    width = int(frame_counts.max())
+    column = _ragged_positions(frame_counts)
+    padded = np.zeros((num_frames, width, 3), dtype=np.float64)
+    padded[point_frame, column] = points
+    distance = np.full((num_frames, width), -np.inf)
+    distance[point_frame, column] = np.inf
+
+    steps = min(max_points, width)
+    picks = np.zeros((num_frames, steps), dtype=np.int64)
+    frame_range = np.arange(num_frames)
+    for step in range(steps):
+        current = np.argmax(distance, axis=1) if step > 0 else np.zeros(num_frames, dtype=np.int64)
+        picks[:, step] = current
+        delta = padded - padded[frame_range, current][:, None, :]
+        distance = np.minimum(distance, np.einsum('fcd,fcd->fc', delta, delta))
+
+    # 点数不足 max_points 的帧只保留前 frame_counts 个选择（之后的选择是重复点）
+    keep = np.arange(steps)[None, :] < np.minimum(frame_counts, steps)[:, None]
+    selected_frame = np.repeat(frame_range, steps).reshape(num_frames, steps)[keep]
+    selected = padded[selected_frame, picks[keep]]
+    return selected.astype(points.dtype, copy=False), selected_frame
+
+
+def _sample_chunk(flat: np.ndarray, offsets: np.ndarray, frame_ids: np.ndarray, max_points: int, seed: int,
+                  progressive: bool = False, reduction: str = 'random', voxel_size: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    num_frames = len(offsets) - 1
+    scalar_counts = np.diff(offsets)
+
+    # 标量个数不是 3 的倍数的帧视为无效帧（与逐帧实现一致）
+    valid_frame = scalar_counts % 3 == 0
+    point_counts = np.where(valid_frame, scalar_counts // 3, 0)
+
+    if np.all(valid_frame) and offsets[0] == 0 and offsets[-1] == len(flat):
+        points = flat.reshape(-1, 3)
+    else:
+        scalar_index = np.repeat(offsets[:-1], point_counts * 3) + _ragged_positions(point_counts * 3)
+        points = flat[scalar_index].reshape(-1, 3)
+
+    point_frame = np.repeat(np.arange(num_frames), point_counts)
+    point_index = _ragged_positions(point_counts)
+
+    # 过滤非有限值的点
+    finite = np.all(np.isfinite(points), axis=1)
+    if not np.all(finite):
+        points = points[finite]
+        point_frame = point_frame[finite]
+        point_index = point_index[finite]
+
+    frame_counts = np.bincount(point_frame, minlength=num_frames)
+    if reduction == 'voxel':
+        points, point_frame = _voxel_reduce(points, point_frame, frame_counts, frame_ids, max_points, seed, voxel_size)
+        frame_counts = np.bincount(point_frame, minlength=num_frames)
+    elif reduction == 'fps':
+        if max_points is not None and np.any(frame_counts > max_points):
+            points, point_frame = _farthest_point_reduce(points, point_frame, frame_counts, frame_ids, max_points, seed)
+            frame_counts = np.bincount(point_frame, minlength=num_frames)
+    elif max_points is not None and np.any(frame_counts > max_points):
+        # 每帧按哈希键排序，保留排名前 max_points 的点，输出保持原始点序
+        keys = _hash_keys(seed, frame_ids[point_frame], point_index)
+        selected = _keep_by_rank(keys, point_frame, frame_counts, max_points)
+        points = points[selected]
+        point_frame = point_frame[selected]
+        frame_counts = np.minimum(frame_counts, max_points)
+
+    if progressive:
+        points = points[_progressive_order(points, point_frame, frame_counts)]
+
+    out_offsets = np.zeros(num_frames + 1, dtype=np.int64)
+    np.cumsum(frame_counts, out=out_offsets[1:])
+    return points, out_offsets
+
+
+def sample_pointcloud_frames(flat: np.ndarray, offsets: np.ndarray, max_points: int = None, seed: int = 0,
+                             frame_ids: np.ndarray = None, progressive: bool = False,
+                             reduction: str = 'random', voxel_size: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """对一块帧进行降采样
+
+    Args:
+        flat: 所有帧的 x,y,z 标量拼接成的一维数组
+        offsets: 长度为帧数 + 1，第 i 帧的标量为 flat[offsets[i]:offsets[i + 1]]
+        max_points: 每帧最多保留的点数，None 表示不降采样
+        seed: 随机种子
+        frame_ids: 每帧在源文件中的行号（决定随机键），默认 0..n-1
+        progressive: 是否把每帧的点重排为渐进顺序（前缀即为均匀子样本），只支持 random
+        reduction: 降采样方式 random / voxel / fps（见模块说明）
+        voxel_size: voxel 模式下的固定体素边长，None 表示按 max_points 自动选择
+
+    Returns:
+        (points, point_offsets)：points 为 (M, 3)，第 i 帧为 points[point_offsets[i]:point_offsets[i + 1]]
+    """
+    if reduction not in REDUCTION_MODES:
+        raise ValueError(f"Unknown reduction mode: {reduction}")
+    if progressive and reduction != 'random':
+        raise ValueError(f"Progressive (LOD) order is only supported with random reduction, not {reduction}")
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_frames = len(offsets) - 1
+    if frame_ids is None:
+        frame_ids = np.arange(num_frames, dtype=np.int64)
+
+    return _sample_chunk(flat, offsets, frame_ids, max_points, seed, progressive, reduction, voxel_size)
+
+
+def split_frames(points: np.ndarray, point_offsets: np.ndarray) -> List[np.ndarray]:
+    """把 (points, point_offsets) 拆成每帧一个 (N, 3) 视图"""
+    return [points[point_offsets[i]:point_offsets[i + 1]] for i in range(len(point_offsets) - 1)]
@@ -0,0 +1,199 @@
+"""解析结果的磁盘存储（派生数组按内容寻址，内存映射读取，按磁盘预算 LRU 淘汰）
+
+每个条目是一个 LRB1 二进制文件（格式见 lerobot_codec，数组保留原本的数值类型，不压缩），
+保存一个 episode 解析后的派生数组：归一化时间、action 矩阵、每个相机降采样后的点云、视频同步索引以及电机包络（LOD 解析）。
+
+条目的键是以下内容的 SHA-1，源文件或任何解析参数变化都会得到新的条目，旧条目随后被淘汰::
+
+    {"version": 3, "source": {"path", "size", "mtime_ns"}, "params": {quality, max_frames, max_points, lod, sampling,
+     folderPath, video_paths, video_duration}}
+
+LOD 解析的结果与质量级别无关，quality 为 null，各质量级别共用同一个条目。
+
+文件位置: $LEROBOT_STORE_DIR/<key[:2]>/<key>.lrb（默认 $CACHE_DIR/lerobot_store）。
+读取时用 mmap 打开，episode 中的数组是文件的零拷贝视图，只有实际访问的部分（例如某一段帧的点云）会从磁盘读入。
+
+设置 LEROBOT_STORE_MAX_MB（> 0）时启用，写入新条目后按最后使用时间（命中时更新文件 mtime）删除最久未用的条目，
+直到总大小不超过预算的 STORE_EVICT_RATIO。
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lerobot_codec import EPISODE_META_FIELDS, read_episodes_binary, write_episodes_binary
+from lerobot_reader import POINTCLOUD_COLUMNS
+
+STORE_VERSION = 4
+STORE_SUFFIX = '.lrb'
+# 超出预算时淘汰到预算的 90%，避免每次写入都触发淘汰
+STORE_EVICT_RATIO = 0.9
+
+
+def default_store_dir() -> str:
+    if os.environ.get('LEROBOT_STORE_DIR'):
+        return os.environ['LEROBOT_STORE_DIR']
+    return os.path.join(os.environ.get('CACHE_DIR', 'cache'), 'lerobot_store')
+
+
+def source_signature(file_path: str) -> Dict[str, Any]:
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def entry_key(file_path: str, params: Dict[str, Any]) -> str:
+    """源文件签名与解析参数共同决定的条目键"""
+    payload = json.dumps({'version': STORE_VERSION, 'source': source_signature(file_path), 'params': params},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _split_points(points: np.ndarray, frame_offsets: np.ndarray) -> List[np.ndarray]:
+    """按 frame_offsets 把 (total, 3) 的点切成每帧的视图"""
+    return [points[start:end] for start, end in zip(frame_offsets[:-1].tolist(), frame_offsets[1:].tolist())]
+
+
+def episode_from_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """把 read_episodes_binary 返回的条目还原为 parse_episode_file 的 episode 结构（数组为零拷贝视图）
+
+    字段顺序与 parse_episode_file 相同，序列化结果与直接解析完全一致。
+    """
+    arrays = entry['arrays']
+    episode = {field: entry[field] for field in EPISODE_META_FIELDS if field != 'lod'}
+    episode['motor_data'] = {'time': arrays['motor_data.time'], 'motors': arrays['motor_data.motors']}
+    episode['pointcloud_data'] = {
+        cam: _split_points(arrays[f'pointcloud_data.{cam}.points'], arrays[f'pointcloud_data.{cam}.frame_offsets'])
+        for cam in POINTCLOUD_COLUMNS
+    }
+    if 'video_sync' in entry:
+        episode['video_sync'] = {
+            cam_key: {**sync, 'frame': arrays[f'video_sync.{cam_key}.frame'], 'pts': arrays[f'video_sync.{cam_key}.pts']}
+            for cam_key, sync in entry['video_sync'].items()
+        }
+    if entry.get('lod') is not None:
+        episode['lod'] = entry['lod']
+    if 'motor_envelope' in entry:
+        envelope = entry['motor_envelope']
+        episode['motor_envelope'] = {
+            'source_frames': envelope['source_frames'],
+            'levels': [
+                {'bucket_frames': bucket_frames, **{name: arrays[f'motor_envelope.{index}.{name}'] for name in ('time', 'min', 'max')}}
+                for index, bucket_frames in enumerate(envelope['bucket_frames'])
+            ],
+        }
+    return episode
+
+
+class DerivedArrayStore:
+    """派生数组存储，多个进程可以同时读写（写入先写临时文件再替换，淘汰时正在读取的映射不受影响）"""
+
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = root or default_store_dir()
+        self.max_bytes = max_bytes
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + STORE_SUFFIX)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取条目，不存在或已损坏时返回 None；命中时更新最后使用时间"""
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        try:
+            return episode_from_entry(read_episodes_binary(buffer)[0])
+        except (ValueError, KeyError, IndexError) as e:
+            logging.warning(f"Corrupted store entry {path}, removing: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, episode: Dict[str, Any]) -> Optional[str]:
+        """写入条目并按预算淘汰，写入失败只记录日志"""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                write_episodes_binary([episode], f, float_dtype=None)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write store entry {path}: {e}")
+            self._remove(tmp_path)
+            return None
+        if self.max_bytes:
+            self.evict(self.max_bytes)
+        return path
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """所有条目的 (最后使用时间, 字节数, 路径)"""
+        result = []
+        try:
+            shards = os.listdir(self.root)
+        except OSError:
+            return result
+        for shard in shards:
+            try:
+                with os.scandir(os.path.join(self.root, shard)) as it:
+                    for item in it:
+                        if item.name.endswith(STORE_SUFFIX):
+                            stat = item.stat()
+                            result.append((stat.st_mtime, stat.st_size, item.path))
+            except OSError:
+                continue
+        return result
+
+    def evict(self, max_bytes: int) -> int:
+        """总大小超过 max_bytes 时按最后使用时间删除条目，直到不超过 max_bytes * STORE_EVICT_RATIO，返回删除的条目数"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= max_bytes:
+            return 0
+        target = max_bytes * STORE_EVICT_RATIO
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                removed += 1
+        logging.info(f"Evicted {removed} store entries, {total / 1024 / 1024:.1f} MB left in {self.root}")
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+_store: Optional[DerivedArrayStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[DerivedArrayStore]:
+    """进程内共享的存储实例，未设置 LEROBOT_STORE_MAX_MB 时返回 None（不使用存储）"""
+    global _store
+    try:
+        max_mb = float(os.environ.get('LEROBOT_STORE_MAX_MB') or 0)
+    except ValueError:
+        max_mb = 0
+    if max_mb <= 0:
+        return None
+    with _store_lock:
+        max_bytes = int(max_mb * 1024 * 1024)
+        if _store is None or _store.root != default_store_dir():
+            _store = DerivedArrayStore(max_bytes=max_bytes)
+        elif _store.max_bytes != max_bytes:
+            # 预算变化时沿用同一个实例，下次写入按新的预算淘汰
+            _store.max_bytes = max_bytes
+        return _store
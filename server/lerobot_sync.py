@@ -0,0 +1,66 @@
+"""数据帧与相机视频帧的同步索引
+
+motor_data.time 是把 parquet timestamp 线性映射到最长相机视频时长上的时间（见 parse_episode_file），
+前端只能按比例估算当前视频时间对应的数据帧，视频帧率与数据帧率不同时会错位。同步索引在解析时给出
+每个保留的数据帧在每个相机视频中对应的帧号和显示时间::
+
+    "video_sync": {
+      "<cam_key>": {
+        "fps": 30.0, "frame_count": 900, "duration": 30.0,   # 来自 lerobot_video 的探测缓存
+        "frame": [...],    # 每个数据帧对应的视频帧号（int32，单调不减）
+        "pts":   [...]     # 该视频帧的显示时间（秒）= frame / fps，保留到微秒
+      }
+    }
+
+各相机视频的时长可能不同，数据时间按 该相机时长 / 最长时长 缩放到该相机的时间轴上，首尾与数据对齐；
+视频帧的显示时间按探测到的帧率（恒定帧率）计算，帧号限制在 [0, frame_count - 1]。没有探测结果的相机不出现在索引中。
+
+frame / pts 与数据帧一一对应并且单调不减，正向查找（数据帧 -> 视频帧）直接取下标，
+反向查找（视频时间 -> 数据帧）是一次二分查找（前端 src/utils/lerobotSync.js 的 rowForVideoTime）。
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from lerobot_video import probe_videos
+
+# 数据时间与帧边界之间的浮点误差容限（秒），避免恰好落在帧边界上的时间被分到前一帧
+SYNC_TOLERANCE = 1e-6
+PTS_DECIMALS = 6
+
+
+def video_sync_index(times: np.ndarray, video_duration: float,
+                     video_infos: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """计算每个相机的同步索引，times 为归一化后的数据时间，video_infos 为 cam_key -> 探测结果"""
+    times = np.asarray(times, dtype=np.float64)
+    index = {}
+    for cam_key, info in video_infos.items():
+        if not info or not info.get('fps') or not info.get('frame_count'):
+            continue
+        fps, frame_count, duration = float(info['fps']), int(info['frame_count']), float(info.get('duration') or 0.0)
+        scale = duration / video_duration if video_duration > 0 and duration > 0 else 1.0
+        frame_times = np.arange(frame_count) / fps
+        frames = np.searchsorted(frame_times, times * scale + SYNC_TOLERANCE, side='right') - 1
+        frames = np.clip(frames, 0, frame_count - 1).astype(np.int32)
+        index[cam_key] = {
+            'fps': fps,
+            'frame_count': frame_count,
+            'duration': duration,
+            'frame': frames,
+            'pts': np.round(frames / fps, PTS_DECIMALS),
+        }
+    return index
+
+
+def episode_video_sync(video_paths: Dict[str, Optional[str]], times: np.ndarray,
+                       video_duration: float) -> Dict[str, Dict[str, Any]]:
+    """按 episode 的视频路径计算同步索引（视频元数据来自探测缓存，解析时已经探测过）"""
+    paths = {cam_key: path for cam_key, path in video_paths.items() if path}
+    infos = probe_videos(paths.values())
+    return video_sync_index(times, video_duration, {cam_key: infos.get(path) for cam_key, path in paths.items()})
+
+
+def slice_video_sync(video_sync: Dict[str, Dict[str, Any]], frames: slice) -> Dict[str, Dict[str, Any]]:
+    """按数据帧切片（如 LOD 的帧步长），返回新的索引，数组为视图"""
+    return {cam_key: {**entry, 'frame': entry['frame'][frames], 'pts': entry['pts'][frames]}
+            for cam_key, entry in video_sync.items()}
@@ -0,0 +1,191 @@
+"""合成 LeRobot 数据集，用于基准测试（bench_lerobot.py）
+
+生成的目录结构与 parse_lerobot_data 的输入一致::
+
+    <output>/
+      data/episode_000000.parquet ...   episode_index / frame_index / timestamp / action / observation.pointcloud.<cam>
+      videos/episode_000000.mp4 ...     每个 episode 一个占位视频（需要 ffmpeg），解析时把 VIDEO_UPLOADS_DIR 指向该目录
+      synthetic.json                    生成参数与文件列表，参数相同时直接复用
+
+点云为随时间移动的几个高斯团加一个平面，每帧点数在 points 的 80%~100% 之间浮动；
+点云列默认为 list<list<float>>（N×3），flat=True 时为展平的 list<float>。
+cameras 为写入点云列的相机数：前两个是解析器读取的 cam_top / cam_right_wrist，
+少于 2 个时解析器按无点云处理，多出的相机列不会被读取（用于测量列投影的效果）。
+
+用法: python3 lerobot_synth.py <output> --episodes 3 --frames 500 --points 3000
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lerobot_reader import POINTCLOUD_COLUMNS
+
+SYNTH_VERSION = 1
+ACTION_DIM = 14
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--episodes', type=int, default=3, help='Number of episodes')
+    parser.add_argument('--frames', type=int, default=500, help='Frames per episode')
+    parser.add_argument('--points', type=int, default=3000, help='Maximum points per frame and camera')
+    parser.add_argument('--cameras', type=int, default=len(POINTCLOUD_COLUMNS), help='Number of point-cloud cameras')
+    parser.add_argument('--fps', type=float, default=30.0, help='Frame rate of timestamps and videos')
+    parser.add_argument('--row-group-size', type=int, default=128, help='Parquet row group size')
+    parser.add_argument('--flat', action='store_true', help='Store point clouds as flat list<float> instead of N x 3')
+    parser.add_argument('--no-video', action='store_true', help='Do not generate placeholder mp4 files')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+
+def dataset_params(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        'episodes': args.episodes,
+        'frames': args.frames,
+        'points': args.points,
+        'cameras': args.cameras,
+        'fps': args.fps,
+        'row_group_size': args.row_group_size,
+        'flat': args.flat,
+        'video': not args.no_video,
+        'seed': args.seed,
+    }
+
+
+def camera_names(cameras: int) -> List[str]:
+    names = list(POINTCLOUD_COLUMNS)[:cameras]
+    return names + [f'cam_extra_{i}' for i in range(cameras - len(names))]
+
+
+def _frame_points(rng: np.random.Generator, frame: int, count: int, centers: np.ndarray) -> np.ndarray:
+    """一帧点云：平面 + 沿圆周移动的高斯团"""
+    phase = frame / 50.0
+    moved = centers + np.stack([np.cos(phase + centers[:, 0]), np.sin(phase + centers[:, 1]), np.zeros(len(centers))], axis=1) * 0.1
+    plane_count = count // 3
+    plane = np.column_stack([rng.uniform(-1, 1, plane_count), rng.uniform(-1, 1, plane_count), np.zeros(plane_count)])
+    blob = moved[rng.integers(0, len(moved), count - plane_count)] + rng.normal(scale=0.05, size=(count - plane_count, 3))
+    return np.concatenate([plane, blob]).astype(np.float32)
+
+
+def _pointcloud_array(frames: List[np.ndarray], flat: bool) -> pa.Array:
+    counts = np.fromiter((len(frame) for frame in frames), dtype=np.int32, count=len(frames))
+    values = pa.array(np.concatenate(frames).reshape(-1) if frames else np.empty(0, dtype=np.float32))
+    outer_offsets = np.zeros(len(frames) + 1, dtype=np.int32)
+    if flat:
+        np.cumsum(counts * 3, out=outer_offsets[1:])
+        return pa.ListArray.from_arrays(pa.array(outer_offsets), values)
+    np.cumsum(counts, out=outer_offsets[1:])
+    inner_offsets = np.arange(0, int(counts.sum()) * 3 + 1, 3, dtype=np.int32)
+    points = pa.ListArray.from_arrays(pa.array(inner_offsets), values)
+    return pa.ListArray.from_arrays(pa.array(outer_offsets), points)
+
+
+def write_episode(path: str, episode_index: int, params: Dict[str, Any]):
+    """按 row group 逐块写入一个 episode，内存只与 row_group_size 有关"""
+    rng = np.random.default_rng([params['seed'], episode_index])
+    frames, fps, points = params['frames'], params['fps'], params['points']
+    cameras = camera_names(params['cameras'])
+    centers = {cam: rng.uniform(-0.5, 0.5, size=(4, 3)) for cam in cameras}
+    action_phase = rng.uniform(0, 2 * np.pi, ACTION_DIM)
+
+    writer = None
+    try:
+        for start in range(0, frames, params['row_group_size']):
+            rows = np.arange(start, min(start + params['row_group_size'], frames))
+            action = np.sin(rows[:, None] / fps + action_phase) + rng.normal(scale=0.01, size=(len(rows), ACTION_DIM))
+            columns = {
+                'episode_index': pa.array(np.full(len(rows), episode_index, dtype=np.int64)),
+                'frame_index': pa.array(rows.astype(np.int64)),
+                'timestamp': pa.array(rows / fps),
+                'action': pa.ListArray.from_arrays(pa.array(np.arange(len(rows) + 1, dtype=np.int32) * ACTION_DIM),
+                                                   pa.array(action.reshape(-1))),
+            }
+            for cam in cameras:
+                counts = rng.integers(int(points * 0.8), points + 1, size=len(rows)) if points > 0 else np.zeros(len(rows), dtype=int)
+                cloud = [_frame_points(rng, int(row), int(count), centers[cam]) for row, count in zip(rows, counts)]
+                columns[f'observation.pointcloud.{cam}'] = _pointcloud_array(cloud, params['flat'])
+            table = pa.table(columns)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table, row_group_size=params['row_group_size'])
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_video(path: str, duration: float, fps: float) -> bool:
+    """生成一段纯色占位视频，没有 ffmpeg 时返回 False"""
+    if shutil.which('ffmpeg') is None:
+        return False
+    import ffmpeg
+    try:
+        (ffmpeg
+         .input(f'color=c=gray:s=64x48:r={fps}:d={duration}', f='lavfi')
+         .output(path, vcodec='mpeg4', loglevel='error')
+         .overwrite_output()
+         .run())
+    except ffmpeg.Error as e:
+        logging.warning(f"Failed to generate video {path}: {e}")
+        return False
+    return True
+
+
+def generate_dataset(output_dir: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """生成（或复用参数相同的）合成数据集，返回 synthetic.json 的内容"""
+    info_path = os.path.join(output_dir, 'synthetic.json')
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        if info.get('version') == SYNTH_VERSION and info.get('params') == params and all(
+                os.path.exists(path) for path, _ in info['files']):
+            return info
+    except (OSError, ValueError):
+        pass
+
+    data_dir = os.path.join(output_dir, 'data')
+    video_dir = os.path.join(output_dir, 'videos')
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(video_dir, exist_ok=True)
+
+    files = []
+    videos = 0
+    duration = params['frames'] / params['fps']
+    for episode_index in range(params['episodes']):
+        name = f"episode_{episode_index:06d}.parquet"
+        path = os.path.abspath(os.path.join(data_dir, name))
+        write_episode(path, episode_index, params)
+        files.append((path, name))
+        if params['video'] and write_video(os.path.join(video_dir, f"episode_{episode_index:06d}.mp4"), duration, params['fps']):
+            videos += 1
+    if params['video'] and videos == 0:
+        logging.warning("ffmpeg not found, no placeholder videos generated (video duration will be 0)")
+
+    info = {
+        'version': SYNTH_VERSION,
+        'params': params,
+        'folder': os.path.abspath(output_dir),
+        'video_dir': os.path.abspath(video_dir),
+        'videos': videos,
+        'files': files,
+    }
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic LeRobot dataset for benchmarking.')
+    parser.add_argument('output', help='Output directory')
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    info = generate_dataset(args.output, dataset_params(args))
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""视频元数据探测与持久缓存
+
+ffmpeg.probe 每次都会启动一个 ffprobe 子进程，数据集的每个 episode 有多个相机视频，逐个探测开销很大。
+这里把探测结果（时长、帧率、帧数、编码、分辨率）按 路径 + 文件大小 + 修改时间 持久化到 JSON 文件，
+文件未变化时直接复用；探测失败（损坏或无法读取的视频）同样缓存为 null，文件变化前不再重复探测。
+需要探测的文件用有界线程池并发执行。
+
+缓存文件位置: 环境变量 VIDEO_PROBE_CACHE，否则为 $CACHE_DIR/video_probe_cache.json（CACHE_DIR 默认 ./cache）。
+多个进程共用同一个缓存文件：写入时先合并磁盘上的内容，再原子替换。
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import ffmpeg
+
+PROBE_CACHE_VERSION = 2
+
+# 视频文件所在目录：与 Node 端的上传目录（config UPLOADS_PATH，启动常驻进程时传入）一致，默认为项目根目录下的 Uploads；
+# 可用环境变量 VIDEO_UPLOADS_DIR 覆盖（如基准测试的合成数据集）。以及 episode 对应的相机视频
+VIDEO_UPLOADS_DIR = (os.environ.get('VIDEO_UPLOADS_DIR') or os.environ.get('UPLOADS_PATH')
+                     or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Uploads'))
+VIDEO_EXTENSIONS = ['.mp4', '.mov']
+VIDEO_CAMERA_KEYS = ('cam_cam_top', 'cam_cam_right_wrist', 'cam_cam_right_gripper_left_tactile')
+
+# 并发 ffprobe 的数量上限
+DEFAULT_PROBE_WORKERS = 8
+
+
+def default_cache_path() -> str:
+    if os.environ.get('VIDEO_PROBE_CACHE'):
+        return os.environ['VIDEO_PROBE_CACHE']
+    return os.path.join(os.environ.get('CACHE_DIR', 'cache'), 'video_probe_cache.json')
+
+
+def resolve_episode_videos(base_folder: str, key: str, exists: Callable[[str], bool] = os.path.exists) -> Dict[str, Optional[str]]:
+    """查找 episode 各相机的视频文件，exists 用于判断候选路径是否存在（可传入基于目录列表的集合查询）"""
+    video_paths = {cam_key: None for cam_key in VIDEO_CAMERA_KEYS}
+    for cam_key in video_paths.keys():
+        for ext in VIDEO_EXTENSIONS:
+            video_file = f"{base_folder}/{cam_key}/{key}{ext}"
+            abs_video_path = f"{VIDEO_UPLOADS_DIR}/{os.path.basename(video_file)}"
+            if exists(abs_video_path):
+                video_paths[cam_key] = abs_video_path
+                logging.debug(f"Found video for {cam_key}: {abs_video_path}")
+        if video_paths[cam_key] is None:
+            logging.warning(f"Video file not found for {cam_key}: {VIDEO_UPLOADS_DIR}/{key}{{{','.join(VIDEO_EXTENSIONS)}}}")
+    return video_paths
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """解析 ffprobe 的 "30000/1001" 形式帧率"""
+    if not rate:
+        return 0.0
+    numerator, _, denominator = rate.partition('/')
+    try:
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_video(file_path: str) -> Optional[Dict[str, Any]]:
+    """调用 ffprobe 获取视频元数据，视频无法解析时返回 None；ffprobe 无法运行时抛出 OSError（不应缓存为失败）"""
+    try:
+        probe = ffmpeg.probe(file_path)
+    except ffmpeg.Error as e:
+        logging.error(f"Error probing video {file_path}: {e.stderr.decode() if e.stderr else e}")
+        return None
+
+    video_stream = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), {})
+    duration = float(probe.get('format', {}).get('duration') or video_stream.get('duration') or 0.0)
+    fps = _parse_rate(video_stream.get('avg_frame_rate')) or _parse_rate(video_stream.get('r_frame_rate'))
+    frame_count = int(video_stream['nb_frames']) if str(video_stream.get('nb_frames', '')).isdigit() else int(round(duration * fps))
+    return {
+        'duration': duration,
+        'fps': fps,
+        'frame_count': frame_count,
+        'codec': video_stream.get('codec_name'),
+        'width': int(video_stream.get('width') or 0),
+        'height': int(video_stream.get('height') or 0),
+    }
+
+
+def _probe_or_error(file_path: str) -> Tuple[Optional[Dict[str, Any]], Optional[OSError]]:
+    """probe_video，另外返回 ffprobe 无法运行（未安装、文件在探测时被删除等）的错误"""
+    try:
+        return probe_video(file_path), None
+    except OSError as e:
+        logging.error(f"Cannot run ffprobe for {file_path}: {e}")
+        return None, e
+
+
+def _file_signature(file_path: str) -> Optional[Dict[str, int]]:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class VideoProbeCache:
+    """按 路径 + 大小 + 修改时间 缓存视频元数据"""
+
+    def __init__(self, path: str = None):
+        self.path = path or default_cache_path()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _read_file(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != PROBE_CACHE_VERSION:
+            return {}
+        return data.get('entries', {})
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._entries = self._read_file()
+            self._loaded = True
+
+    def lookup(self, file_path: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """返回 (是否命中, 元数据)；命中时元数据为 None 表示之前探测失败。文件不存在或已变化时不命中"""
+        signature = _file_signature(file_path)
+        if signature is None:
+            return False, None
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(os.path.abspath(file_path))
+        if entry and entry['size'] == signature['size'] and entry['mtime_ns'] == signature['mtime_ns']:
+            return True, entry['info']
+        return False, None
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """返回缓存的元数据；未命中或之前探测失败时返回 None"""
+        return self.lookup(file_path)[1]
+
+    def probe_many(self, file_paths: Iterable[str], max_workers: int = DEFAULT_PROBE_WORKERS) -> Dict[str, Optional[Dict[str, Any]]]:
+        """获取一批视频的元数据，未命中缓存的并发探测，返回 file_path -> 元数据（失败为 None）"""
+        results = {}
+        missing = []
+        for file_path in dict.fromkeys(file_paths):
+            hit, info = self.lookup(file_path)
+            if hit:
+                results[file_path] = info
+            elif _file_signature(file_path) is None:
+                logging.error(f"Video file not found: {file_path}")
+                results[file_path] = None
+            else:
+                missing.append(file_path)
+
+        if not missing:
+            return results
+
+        logging.info(f"Probing {len(missing)} videos ({len(results)} cached) with {min(max_workers, len(missing))} threads")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            probed = dict(zip(missing, pool.map(_probe_or_error, missing)))
+
+        updates = {}
+        for file_path, (info, error) in probed.items():
+            results[file_path] = info
+            signature = _file_signature(file_path)
+            if error is None and signature is not None:
+                # 失败的探测也写入（info 为 None），同一文件不会在每次解析时重新启动 ffprobe
+                updates[os.path.abspath(file_path)] = {**signature, 'info': info}
+        if updates:
+            self._save(updates)
+        return results
+
+    def _save(self, updates: Dict[str, Dict[str, Any]]):
+        """合并磁盘上的最新内容后原子写入，其他进程写入的条目不会丢失"""
+        with self._lock:
+            self._ensure_loaded()
+            entries = self._read_file()
+            entries.update(updates)
+            self._entries.update(entries)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': PROBE_CACHE_VERSION, 'entries': self._entries}, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.warning(f"Failed to write video probe cache {self.path}: {e}")
+
+
+_shared_cache: Optional[VideoProbeCache] = None
+
+
+def get_probe_cache() -> VideoProbeCache:
+    """进程内共享的缓存实例"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = VideoProbeCache()
+    return _shared_cache
+
+
+def probe_videos(file_paths: Iterable[str], max_workers: int = DEFAULT_PROBE_WORKERS) -> Dict[str, Optional[Dict[str, Any]]]:
+    return get_probe_cache().probe_many(file_paths, max_workers)
+
+
+def get_video_info(file_path: str) -> Optional[Dict[str, Any]]:
+    return probe_videos([file_path])[file_path]
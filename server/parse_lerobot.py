@@ -1,13 +1,32 @@
 import os
+import sys
 import json
+import math
+import signal
 import argparse
-import pandas as pd
+import threading
+import itertools
 import numpy as np
-import ffmpeg
-from typing import List, Tuple, Dict, Any
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import List, Tuple, Dict, Any, Iterator, Optional
 import logging
-from joblib import Parallel, delayed
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from lerobot_envelope import envelope_overview, motor_envelope
+from lerobot_codec import COMPACT_BBOX_MODES, EPISODE_META_FIELDS, encode_episode_compact
+from lerobot_manifest import build_manifest
+from lerobot_preview import PREVIEW_MODES, generate_previews, preview_params
+from lerobot_profile import NULL_PROFILER, StageProfiler, merge_profiles, write_profile_record
+from lerobot_reader import (
+    FRAME_COLUMNS, POINTCLOUD_COLUMNS, batch_to_matrix, column_bounds, iter_decimated_batches, iter_row_range_batches,
+    list_column_to_ragged, plan_frame_step, read_episode_index, read_motor_series, rows_for_value_range
+)
+from lerobot_sampling import REDUCTION_MODES, sample_pointcloud_frames, split_frames, stable_seed
+from lerobot_store import entry_key, get_store
+from lerobot_sync import episode_video_sync, slice_video_sync
+from lerobot_video import get_video_info, resolve_episode_videos
 
 
 # 设置日志
@@ -17,23 +36,18 @@ logging.basicConfig(
 )
 
 def get_video_duration(file_path: str) -> float:
-    """获取视频文件的时长（秒）"""
-    try:
-        probe = ffmpeg.probe(file_path)
-        duration = float(probe['format']['duration'])
-        logging.info(f"Video {file_path} duration: {duration}s")
-        return duration
-    except ffmpeg.Error as e:
-        logging.error(f"Error probing video {file_path}: {e.stderr.decode()}")
-        return 0.0
-    except FileNotFoundError:
-        logging.error(f"Video file not found: {file_path}")
+    """获取视频文件的时长（秒），结果来自持久化的探测缓存"""
+    info = get_video_info(file_path)
+    if info is None:
         return 0.0
+    logging.debug(f"Video {file_path} duration: {info['duration']}s")
+    return info['duration']
+
 
 def format_pointcloud_data(pointcloud_data: np.ndarray, max_points: int = 500) -> List[List[float]]:
     """格式化点云数据，随机选择最多 max_points 个点"""
     try:
-        logging.info(f"Formatting pointcloud data with shape: {pointcloud_data.shape}")
+        logging.debug(f"Formatting pointcloud data with shape: {pointcloud_data.shape}")
         # 验证输入数据
         if pointcloud_data is None or not isinstance(pointcloud_data, np.ndarray):
             logging.error("Pointcloud data is None or not a NumPy array")
@@ -58,196 +72,585 @@ def format_pointcloud_data(pointcloud_data: np.ndarray, max_points: int = 500) -
             logging.error("No valid points in pointcloud data after filtering")
             return []
 
-        # 随机降采样
-        if len(valid_points) <= max_points:
-            formatted_points = valid_points.tolist()
-        else:
-            indices = np.random.choice(len(valid_points), size=max_points, replace=False)
-            formatted_points = valid_points[indices].tolist()
+        # 随机降采样（与批量采样共用同一套可复现的采样逻辑）
+        formatted_points = safe_format_pointcloud_data(valid_points, max_points).tolist()
 
-        # 计算点云统计信息
-        mean = np.mean(valid_points, axis=0).tolist() if len(valid_points) > 0 else [0, 0, 0]
-        std = np.std(valid_points, axis=0).tolist() if len(valid_points) > 0 else [0, 0, 0]
-        logging.info(f"Formatted {len(formatted_points)} points from pointcloud, mean={mean}, std={std}, sample={formatted_points[:3] if formatted_points else []}")
+        # 点云统计信息只在调试日志开启时计算
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            mean = np.mean(valid_points, axis=0).tolist()
+            std = np.std(valid_points, axis=0).tolist()
+            logging.debug(f"Formatted {len(formatted_points)} points from pointcloud, mean={mean}, std={std}, sample={formatted_points[:3]}")
         return formatted_points
     except Exception as e:
         logging.error(f"Error formatting pointcloud data: {e}")
         return []
 
-def parse_lerobot_data(files: List[Tuple[str, str]], folder_path: str, max_frames: int = None, max_points: int = None, quality: str = 'medium') -> List[Dict[str, Any]]:
-    episodes = []
-    base_folder = folder_path.replace('\\', '/')
-    logging.info(f"Starting parsing {len(files)} files, folderPath: {base_folder}")
+class EpisodeParseError(ValueError):
+    """单个 episode 无法解析（缺少必要列等），不影响其他 episode"""
 
-    for file_path, original_name in files:
-        logging.info(f"Processing file: {file_path} (originalName: {original_name})")
-        try:
-            # 验证 Parquet 文件
-            df = pd.read_parquet(file_path, engine='pyarrow')
-            logging.info(f"Successfully read Parquet file: {file_path}, rows: {len(df)}, columns: {list(df.columns)}")
-
-            # 检查列名（处理可能的拼写错误，如 fra_index 或 fre_index）
-            if 'fra_index' in df.columns:
-                logging.info("Found 'fra_index' in columns, assuming typo for 'frame_index'")
-                df = df.rename(columns={'fra_index': 'frame_index'})
-            elif 'fre_index' in df.columns:
-                logging.info("Found 'fre_index' in columns, assuming typo for 'frame_index'")
-                df = df.rename(columns={'fre_index': 'frame_index'})
-
-            # 提取 episode 索引
-            if 'episode_index' not in df.columns:
-                logging.error(f"'episode_index' column not found in {file_path}")
-                continue
-            episode_index = df['episode_index'].iloc[0]
-            key = f"episode_{int(episode_index):06d}"
-
-            # 获取视频路径
-            video_extensions = ['.mp4', '.mov']
-            video_paths = {
-                'cam_cam_top': None,
-                'cam_cam_right_wrist': None,
-                'cam_cam_right_gripper_left_tactile': None
-            }
-            for cam_key in video_paths.keys():
-                for ext in video_extensions:
-                    video_file = f"{base_folder}/{cam_key}/{key}{ext}"
-                    abs_video_path = f"/home/sen/gitee/datemanager/Uploads/{os.path.basename(video_file)}"
-                    if os.path.exists(abs_video_path):
-                        video_paths[cam_key] = abs_video_path
-                        logging.info(f"Found video for {cam_key}: {abs_video_path}")
-                    else:
-                        logging.warning(f"Video file not found: {abs_video_path}")
-
-            # 获取视频时长
-            video_duration = 0.0
-            for video_path in video_paths.values():
-                if video_path:
-                    duration = get_video_duration(video_path)
-                    video_duration = max(video_duration, duration)
-            logging.info(f"Max video duration for {key}: {video_duration}s")
-
-            # 动态限制帧数
-            original_frame_count = len(df)
-            if max_frames is None:
-                # 根据数据量自动调整
-                if original_frame_count <= 2000:
-                    max_frames = original_frame_count  # 小数据集不降采样
-                elif original_frame_count <= 5000:
-                    max_frames = 2000  # 中等数据集适度降采样
-                else:
-                    max_frames = 3000  # 大数据集保留更多数据
-
-            if max_frames >= original_frame_count:
-                # 不需要降采样
-                frame_step = 1
-                logging.info(f"No frame downsampling needed, using all {original_frame_count} frames")
-            else:
-                frame_step = max(1, original_frame_count // max_frames)
-                df = df.iloc[::frame_step][:max_frames]
-                logging.info(f"Downsampling from {original_frame_count} to {max_frames} frames with step {frame_step}, actual rows: {len(df)}")
-
-            # 提取时间戳并归一化
-            if 'timestamp' not in df.columns:
-                logging.warning(f"No 'timestamp' column in {file_path}, using linear timestamps")
-                timestamps = np.arange(len(df)) * (video_duration / max_frames if video_duration > 0 else 1.0)
-            else:
-                timestamps = df['timestamp'].to_numpy()
-                logging.info(f"Raw timestamps: min={np.min(timestamps):.2f}, max={np.max(timestamps):.2f}")
 
-            if len(timestamps) == 0:
-                logging.warning(f"No timestamps found in {file_path}")
-                continue
+# LOD 模式下每帧保留的点数（各质量级别都是它的前缀）
+LOD_MAX_POINTS = 2000
 
-            min_time, max_time = np.min(timestamps), np.max(timestamps)
-            if max_time > min_time:
-                normalized_timestamps = [(t - min_time) / (max_time - min_time) * video_duration for t in timestamps]
-            else:
-                logging.warning(f"Timestamps are identical or invalid (min={min_time}, max={max_time}), using linear timestamps")
-                normalized_timestamps = [i * (video_duration / max_frames) for i in range(len(df))]
-            logging.info(f"Normalized timestamps: min={min(normalized_timestamps):.2f}, max={max(normalized_timestamps):.2f}")
 
-            # 提取 action 数据
-            if 'action' not in df.columns:
-                logging.error(f"'action' column not found in {file_path}")
-                continue
-            action_data = [list(map(float, np.array(a))) for a in df['action']]
-            logging.info(f"Extracted action column: length={len(action_data)}, sample={action_data[:2]}")
-
-            # 提取点云数据
-            if 'observation.pointcloud.cam_top' not in df.columns or 'observation.pointcloud.cam_right_wrist' not in df.columns:
-                logging.error(f"Pointcloud columns missing in {file_path}")
-                cam_top_points = [[]] * len(df)
-                cam_right_wrist_points = [[]] * len(df)
-            else:
-                start_time = time.time()
-
-                raw_top = df['observation.pointcloud.cam_top'].tolist()
-                raw_wrist = df['observation.pointcloud.cam_right_wrist'].tolist()
-
-                # 动态调整点云采样数量
-                if max_points is None:
-                    # 根据帧数自动调整点云密度
-                    if len(df) <= 1000:
-                        points_per_frame = 2000  # 小数据集保留更多点云
-                    elif len(df) <= 2000:
-                        points_per_frame = 1500  # 中等数据集适度采样
-                    else:
-                        points_per_frame = 1000  # 大数据集保持原有采样
-                else:
-                    points_per_frame = max_points
-                
-                # 特殊处理：如果是完整模式且没有指定max_points，强制使用2000个点
-                if max_points is None and quality == 'full':
-                    points_per_frame = 2000
-                    logging.info(f"Full quality mode: forcing 2000 points per frame")
-
-                logging.info(f"Using {points_per_frame} points per frame for pointcloud data")
-
-                cam_top_points = Parallel(n_jobs=4)(
-                    delayed(safe_format_pointcloud_data)(pc, points_per_frame) for pc in raw_top
-                )
-                cam_right_wrist_points = Parallel(n_jobs=4)(
-                    delayed(safe_format_pointcloud_data)(pc, points_per_frame) for pc in raw_wrist
+def find_episode_videos(base_folder: str, key: str) -> Tuple[Dict[str, Optional[str]], float]:
+    """查找 episode 各相机的视频文件，返回 (video_paths, 最长视频时长)"""
+    video_paths = resolve_episode_videos(base_folder, key)
+
+    # 获取视频时长
+    video_duration = 0.0
+    for video_path in video_paths.values():
+        if video_path:
+            duration = get_video_duration(video_path)
+            video_duration = max(video_duration, duration)
+    logging.info(f"Max video duration for {key}: {video_duration}s")
+    return video_paths, video_duration
+
+
+def frame_statistics(frames: List[np.ndarray]) -> Dict[str, Any]:
+    """一个相机逐帧点云的统计：每帧点数分布，以及各帧中心在帧间的变化（全为 0 说明各帧点云相同）
+
+    需要遍历所有帧，只在 profiler.frame_stats 为 True（--frame-stats）时计算。
+    """
+    counts = np.fromiter((len(frame) for frame in frames), dtype=np.int64, count=len(frames))
+    nonempty = [frame for frame in frames if len(frame) > 0]
+    stats = {
+        'frames': len(frames),
+        'empty_frames': len(frames) - len(nonempty),
+        'points': {
+            'min': int(counts.min()) if len(counts) else 0,
+            'max': int(counts.max()) if len(counts) else 0,
+            'mean': float(counts.mean()) if len(counts) else 0.0,
+        },
+    }
+    if nonempty:
+        centroids = np.array([frame.mean(axis=0) for frame in nonempty])
+        spreads = np.array([frame.std(axis=0) for frame in nonempty])
+        stats['centroid_mean'] = centroids.mean(axis=0).tolist()
+        stats['centroid_std'] = centroids.std(axis=0).tolist()
+        stats['spread_mean'] = spreads.mean(axis=0).tolist()
+    return stats
+
+
+def _read_episode_frames(batches, key: str, column_names: List[str], pointcloud_columns: Dict[str, str],
+                         points_per_frame: int, progressive: bool = False, sampling: Dict[str, Any] = None,
+                         profiler=NULL_PROFILER):
+    """消费 (row_indices, batch) 流，返回 (row_indices, timestamp 分块, action 矩阵, 每个相机的逐帧点云)
+
+    sampling 为点云降采样参数 {"reduction": "random" | "voxel" | "fps", "voxel_size": ...}，见 lerobot_sampling。
+    列转换计入 profiler 的 read 阶段（读取与抽帧由 batches 的迭代器统计），点云采样计入 sample 阶段（见 lerobot_profile）。
+    """
+    row_chunks = []
+    timestamp_chunks = []
+    action_chunks = []
+    sampled_points = {cam: [] for cam in pointcloud_columns}
+    for row_indices, batch in batches:
+        row_chunks.append(row_indices)
+        with profiler.stage('read'):
+            if 'timestamp' in column_names:
+                timestamp_chunks.append(batch.column('timestamp').to_numpy(zero_copy_only=False))
+            action_chunks.append(batch_to_matrix(batch, 'action'))
+            ragged = {cam: list_column_to_ragged(batch.column(column)) for cam, column in pointcloud_columns.items()}
+        with profiler.stage('sample'):
+            for cam, (flat, offsets) in ragged.items():
+                # 整块帧一起向量化采样；seed 由 episode 和相机决定，重复请求得到相同的点
+                points, point_offsets = sample_pointcloud_frames(
+                    flat, offsets, points_per_frame, seed=stable_seed(key, cam), frame_ids=row_indices,
+                    progressive=progressive, **(sampling or {})
                 )
+                sampled_points[cam].extend(split_frames(points, point_offsets))
+                profiler.count('points_in', (int(offsets[-1]) - int(offsets[0])) // 3)
+                profiler.count('points_out', len(points) // 3)
+        del ragged
 
-                logging.info(f"Pointcloud sampling complete - top: {len(cam_top_points)} frames, wrist: {len(cam_right_wrist_points)} frames, took {time.time() - start_time:.2f}s")
-
-                # 验证帧间点云差异
-                for i in [0, 100, 200]:
-                    if i < len(cam_top_points) and cam_top_points[i]:
-                        mean = np.mean(cam_top_points[i], axis=0).tolist() if cam_top_points[i] else [0, 0, 0]
-                        std = np.std(cam_top_points[i], axis=0).tolist() if cam_top_points[i] else [0, 0, 0]
-                        logging.info(f"cam_top frame {i}: length={len(cam_top_points[i])}, mean={mean}, std={std}, sample={cam_top_points[i][:3]}")
-                    if i < len(cam_right_wrist_points) and cam_right_wrist_points[i]:
-                        mean = np.mean(cam_right_wrist_points[i], axis=0).tolist() if cam_right_wrist_points[i] else [0, 0, 0]
-                        std = np.std(cam_right_wrist_points[i], axis=0).tolist() if cam_right_wrist_points[i] else [0, 0, 0]
-                        logging.info(f"cam_right_wrist frame {i}: length={len(cam_right_wrist_points[i])}, mean={mean}, std={std}, sample={cam_right_wrist_points[i][:3]}")
-
-            episode = {
-                'key': key,
-                'index': int(episode_index),
-                'folderPath': base_folder,
-                'frame_count': len(df),
-                'original_frame_count': original_frame_count,  # 添加原始帧数
-                'video_paths': video_paths,
-                'motor_data': {
-                    'time': normalized_timestamps,
-                    'motors': action_data
-                },
-                'pointcloud_data': {
-                    'cam_top': cam_top_points,
-                    'cam_right_wrist': cam_right_wrist_points
-                }
-            }
-            episodes.append(episode)
-            logging.info(f"Successfully generated episode: {key}")
+    row_indices = np.concatenate(row_chunks) if row_chunks else np.empty(0, dtype=np.int64)
+    action_data = np.concatenate(action_chunks) if action_chunks else np.empty((0, 0))
+    return row_indices, timestamp_chunks, action_data, sampled_points
+
+
+def parse_episode_file(file_path: str, base_folder: str, max_frames: int = None, max_points: int = None,
+                       quality: str = 'medium', lod: bool = False,
+                       manifest_entry: Dict[str, Any] = None, sampling: Dict[str, Any] = None,
+                       profiler=NULL_PROFILER) -> Dict[str, Any]:
+    """解析单个 episode parquet 文件，失败时抛出异常
+
+    lod=True 时按最高精度解析一次，每帧的点按渐进顺序排列，并在 episode['lod'] 中记录各质量级别的切片参数，
+    之后任意质量级别都可以通过 slice_lod_episode 得到，无需重新读取 parquet；
+    同时在 episode['motor_envelope'] 中给出由所有原始行计算的多级电机包络（见 lerobot_envelope）。
+    episode['video_sync'] 为每个数据帧在各相机视频中的帧号与显示时间（见 lerobot_sync）。
+    传入 manifest_entry（见 lerobot_manifest）时直接使用其中的 episode_index 与视频信息。
+    sampling 选择点云降采样方式（见 _read_episode_frames），默认均匀随机；lod=True 只支持随机方式。
+    传入 lerobot_profile.StageProfiler 时记录 video_probe / read / decimate / sample / normalize 各阶段的耗时与峰值内存，
+    以及行数与点数；profiler.frame_stats 为 True 时另外统计逐帧点云（见 frame_statistics）。
+    """
+    # 只读取 Parquet footer，列数据在后面按需流式读取
+    parquet_file = pq.ParquetFile(file_path)
+    column_names = parquet_file.schema_arrow.names
+    original_frame_count = parquet_file.metadata.num_rows
+    logging.info(f"Opened Parquet file: {file_path}, rows: {original_frame_count}, row groups: {parquet_file.num_row_groups}, columns: {column_names}")
+
+    # 提取 episode 索引
+    if 'episode_index' not in column_names:
+        raise EpisodeParseError(f"'episode_index' column not found in {file_path}")
+    if manifest_entry is not None and manifest_entry.get('episode_index') is not None:
+        episode_index = manifest_entry['episode_index']
+    else:
+        episode_index = read_episode_index(parquet_file)
+    if episode_index is None:
+        raise EpisodeParseError(f"No rows found in {file_path}")
+    key = f"episode_{int(episode_index):06d}"
+
+    # 使用清单时视频已在建立清单时探测，这里只是查表
+    with profiler.stage('video_probe'):
+        if manifest_entry is not None and manifest_entry.get('video_paths') is not None:
+            video_paths, video_duration = manifest_entry['video_paths'], manifest_entry['video_duration']
+        else:
+            video_paths, video_duration = find_episode_videos(base_folder, key)
+
+    # 动态限制帧数：先按数据量得到基础帧序列（与 full / LOD 相同），
+    # max_frames 更小时再按 2 的幂步长在整个 episode 上抽帧，与 LOD 切片的帧完全相同（见 build_lod_levels）
+    # 根据数据量自动调整
+    if original_frame_count <= 2000:
+        episode_max_frames = original_frame_count  # 小数据集不降采样
+    elif original_frame_count <= 5000:
+        episode_max_frames = 2000  # 中等数据集适度降采样
+    else:
+        episode_max_frames = 3000  # 大数据集保留更多数据
+    if max_frames is not None and max_frames > episode_max_frames:
+        episode_max_frames = max_frames
+
+    frame_step, frame_count = plan_frame_step(original_frame_count, episode_max_frames)
+    frame_stride = lod_frame_stride(frame_count, max_frames)
+    frame_step, frame_count = frame_step * frame_stride, math.ceil(frame_count / frame_stride)
+    if frame_step == 1:
+        logging.info(f"No frame downsampling needed, using {frame_count} of {original_frame_count} frames")
+    else:
+        logging.info(f"Downsampling from {original_frame_count} to {frame_count} frames with step {frame_step}")
+
+    if 'action' not in column_names:
+        raise EpisodeParseError(f"'action' column not found in {file_path}")
+
+    pointcloud_columns = {cam: column for cam, column in POINTCLOUD_COLUMNS.items() if column in column_names}
+    if len(pointcloud_columns) < len(POINTCLOUD_COLUMNS):
+        logging.error(f"Pointcloud columns missing in {file_path}")
+        pointcloud_columns = {}
+
+    # 动态调整点云采样数量
+    if max_points is None:
+        # 根据帧数自动调整点云密度
+        if frame_count <= 1000:
+            points_per_frame = 2000  # 小数据集保留更多点云
+        elif frame_count <= 2000:
+            points_per_frame = 1500  # 中等数据集适度采样
+        else:
+            points_per_frame = 1000  # 大数据集保持原有采样
+    else:
+        points_per_frame = max_points
+
+    # 特殊处理：如果是完整模式且没有指定max_points，强制使用2000个点
+    if max_points is None and quality == 'full':
+        points_per_frame = 2000
+        logging.info(f"Full quality mode: forcing 2000 points per frame")
+
+    if lod:
+        points_per_frame = max(LOD_MAX_POINTS, max_points or 0)
+        logging.info(f"LOD mode: sampling {points_per_frame} points per frame in progressive order")
+
+    if pointcloud_columns:
+        logging.info(f"Using {points_per_frame} points per frame for pointcloud data")
+
+    # 只读取需要的列，边读边抽帧、边采样点云，内存只随输出规模增长
+    start_time = time.time()
+    columns = [column for column in FRAME_COLUMNS if column in column_names] + list(pointcloud_columns.values())
+    _, timestamp_chunks, action_data, sampled_points = _read_episode_frames(
+        iter_decimated_batches(parquet_file, columns, frame_step, frame_count, profiler=profiler), key, column_names,
+        pointcloud_columns, points_per_frame, progressive=lod, sampling=sampling, profiler=profiler
+    )
+    profiler.count('rows', original_frame_count)
+    profiler.count('frames', frame_count)
+    logging.info(f"Extracted action column: shape={action_data.shape}")
+
+    with profiler.stage('normalize'):
+        # 提取时间戳并归一化
+        if 'timestamp' not in column_names:
+            logging.warning(f"No 'timestamp' column in {file_path}, using linear timestamps")
+            timestamps = np.arange(frame_count) * frame_stride * (video_duration / episode_max_frames if video_duration > 0 else 1.0)
+        else:
+            timestamps = np.concatenate(timestamp_chunks) if timestamp_chunks else np.empty(0)
+            if len(timestamps) > 0:
+                logging.info(f"Raw timestamps: min={np.min(timestamps):.2f}, max={np.max(timestamps):.2f}")
+
+        if len(timestamps) == 0:
+            raise EpisodeParseError(f"No timestamps found in {file_path}")
+
+        min_time, max_time = np.min(timestamps), np.max(timestamps)
+        if max_time > min_time:
+            normalized_timestamps = (timestamps - min_time) / (max_time - min_time) * video_duration
+        else:
+            logging.warning(f"Timestamps are identical or invalid (min={min_time}, max={max_time}), using linear timestamps")
+            normalized_timestamps = np.arange(frame_count) * frame_stride * (video_duration / episode_max_frames)
+        time_scale = video_duration / (max_time - min_time) if max_time > min_time else None
+        logging.info(f"Normalized timestamps: min={np.min(normalized_timestamps):.2f}, max={np.max(normalized_timestamps):.2f}")
+
+        if pointcloud_columns:
+            cam_top_points = sampled_points['cam_top']
+            cam_right_wrist_points = sampled_points['cam_right_wrist']
+            logging.info(f"Pointcloud sampling complete - top: {len(cam_top_points)} frames, wrist: {len(cam_right_wrist_points)} frames, took {time.time() - start_time:.2f}s")
+
+        else:
+            cam_top_points = [np.empty((0, 3))] * frame_count
+            cam_right_wrist_points = [np.empty((0, 3))] * frame_count
+
+        episode = {
+            'key': key,
+            'index': int(episode_index),
+            'folderPath': base_folder,
+            'frame_count': frame_count,
+            'original_frame_count': original_frame_count,  # 添加原始帧数
+            'video_paths': video_paths,
+            'motor_data': {
+                'time': normalized_timestamps,
+                'motors': action_data
+            },
+            'pointcloud_data': {
+                'cam_top': cam_top_points,
+                'cam_right_wrist': cam_right_wrist_points
+            },
+            'video_sync': episode_video_sync(video_paths, normalized_timestamps, video_duration)
+        }
+    if profiler.frame_stats:
+        # 验证帧间点云差异（只在明确要求时计算）
+        with profiler.stage('frame_stats'):
+            profiler.frame_summary = {cam: frame_statistics(frames) for cam, frames in episode['pointcloud_data'].items()}
+        logging.info(f"Frame statistics for {key}: {profiler.frame_summary}")
+    if lod:
+        episode['lod'] = {'points_per_frame': points_per_frame, 'levels': build_lod_levels(frame_count, points_per_frame)}
+        with profiler.stage('envelope'):
+            episode['motor_envelope'] = _episode_motor_envelope(
+                parquet_file, 'timestamp' in column_names, frame_step, frame_count, action_data, normalized_timestamps,
+                min_time, time_scale
+            )
+    return episode
+
+
+def _episode_motor_envelope(parquet_file: pq.ParquetFile, has_timestamp: bool, frame_step: int, frame_count: int,
+                            action_data: np.ndarray, normalized_timestamps: np.ndarray, min_time: float,
+                            time_scale: Optional[float]) -> Dict[str, Any]:
+    """由所有原始行计算电机包络，时间与 motor_data.time 使用同样的归一化；没有抽帧时直接使用已读取的数据"""
+    if frame_step == 1 and frame_count == parquet_file.metadata.num_rows:
+        return motor_envelope(normalized_timestamps, action_data)
+    timestamps, actions = read_motor_series(parquet_file, has_timestamp)
+    if timestamps is not None and time_scale is not None:
+        times = (timestamps - min_time) * time_scale
+    else:
+        # 线性时间戳：第 i 行位于抽帧后第 i / frame_step 帧处，按已归一化的时间插值
+        times = np.interp(np.arange(len(actions)) / frame_step, np.arange(len(normalized_timestamps)), normalized_timestamps)
+    return motor_envelope(times, actions)
+
+def load_or_parse_episode(file_path: str, base_folder: str, max_frames: int = None, max_points: int = None,
+                          quality: str = 'medium', lod: bool = False,
+                          manifest_entry: Dict[str, Any] = None, sampling: Dict[str, Any] = None,
+                          profiler=NULL_PROFILER) -> Dict[str, Any]:
+    """parse_episode_file 加上派生数组存储（见 lerobot_store，设置 LEROBOT_STORE_MAX_MB 时启用）
+
+    条目键包含源文件签名、解析参数和清单中的视频信息；命中时直接映射存储中的数组，不再读取 parquet。
+    没有清单条目时无法在解析前确定视频信息，直接解析。
+    """
+    store = get_store()
+    if store is None or manifest_entry is None or manifest_entry.get('video_paths') is None:
+        return parse_episode_file(file_path, base_folder, max_frames, max_points, quality, lod, manifest_entry,
+                                  sampling, profiler)
+
+    # LOD 输出与质量级别无关，各质量级别共用同一个条目
+    key = entry_key(file_path, {
+        'folderPath': base_folder, 'max_frames': max_frames, 'max_points': max_points,
+        'quality': None if lod else quality, 'lod': lod,
+        'sampling': sampling or {}, 'video_paths': manifest_entry['video_paths'],
+        'video_duration': manifest_entry['video_duration'],
+    })
+    with profiler.stage('store'):
+        episode = store.get(key)
+    if episode is not None:
+        profiler.count('store_hits')
+        profiler.count('frames', episode['frame_count'])
+        logging.info(f"Loaded {episode['key']} from store entry {key}")
+        return episode
+
+    episode = parse_episode_file(file_path, base_folder, max_frames, max_points, quality, lod, manifest_entry,
+                                 sampling, profiler)
+    with profiler.stage('store'):
+        store.put(key, episode)
+    return episode
+
+
+def parse_episode_window(file_path: str, base_folder: str, start_frame: int = None, end_frame: int = None,
+                         start_time: float = None, end_time: float = None, max_frames: int = None,
+                         max_points: int = None, sampling: Dict[str, Any] = None,
+                         profiler=NULL_PROFILER) -> Dict[str, Any]:
+    """只解析 episode 中的一段帧，用于按时间窗口查看高精度数据
+
+    帧区间为文件内行号 [start_frame, end_frame)；也可以用原始 timestamp 区间 [start_time, end_time] 指定，
+    两者同时给出时取交集。只读取与区间重叠的 row group（timestamp 区间先用 row group 统计信息过滤）。
+    默认不抽帧、每帧保留 LOD_MAX_POINTS 个点；max_frames 限制窗口内的帧数。
+    返回的 motor_data.time 与完整 episode 使用同样的归一化方式，frame_indices 为每帧在文件中的行号。
+    profiler 的阶段与计数同 parse_episode_file。
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    column_names = parquet_file.schema_arrow.names
+    original_frame_count = parquet_file.metadata.num_rows
+
+    if 'episode_index' not in column_names:
+        raise EpisodeParseError(f"'episode_index' column not found in {file_path}")
+    if 'action' not in column_names:
+        raise EpisodeParseError(f"'action' column not found in {file_path}")
+    episode_index = read_episode_index(parquet_file)
+    if episode_index is None:
+        raise EpisodeParseError(f"No rows found in {file_path}")
+    key = f"episode_{int(episode_index):06d}"
+    has_timestamp = 'timestamp' in column_names
+
+    start = max(0, start_frame or 0)
+    end = original_frame_count if end_frame is None else min(end_frame, original_frame_count)
+    if start_time is not None or end_time is not None:
+        if not has_timestamp:
+            raise EpisodeParseError(f"No 'timestamp' column in {file_path}, cannot select by time")
+        time_start, time_end = rows_for_value_range(parquet_file, 'timestamp', start_time, end_time)
+        start, end = max(start, time_start), min(end, time_end)
+    end = max(start, end)
+
+    frame_step, frame_count = plan_frame_step(end - start, max_frames or (end - start))
+    points_per_frame = max_points or LOD_MAX_POINTS
+    logging.info(f"Parsing window [{start}, {end}) of {file_path} with step {frame_step}, {frame_count} frames, {points_per_frame} points per frame")
+
+    with profiler.stage('video_probe'):
+        video_paths, video_duration = find_episode_videos(base_folder, key)
+
+    pointcloud_columns = {cam: column for cam, column in POINTCLOUD_COLUMNS.items() if column in column_names}
+    if len(pointcloud_columns) < len(POINTCLOUD_COLUMNS):
+        logging.error(f"Pointcloud columns missing in {file_path}")
+        pointcloud_columns = {}
+
+    columns = [column for column in FRAME_COLUMNS if column in column_names] + list(pointcloud_columns.values())
+    row_indices, timestamp_chunks, action_data, sampled_points = _read_episode_frames(
+        iter_row_range_batches(parquet_file, columns, start, end, frame_step, frame_count, profiler=profiler), key,
+        column_names, pointcloud_columns, points_per_frame, sampling=sampling, profiler=profiler
+    )
+    profiler.count('rows', end - start)
+    profiler.count('frames', len(row_indices))
+
+    with profiler.stage('normalize'):
+        # 用整个文件的 timestamp 范围归一化，窗口内的时间与完整 episode 对齐
+        bounds = column_bounds(parquet_file, 'timestamp') if has_timestamp else None
+        if bounds is not None and bounds[1] > bounds[0]:
+            timestamps = np.concatenate(timestamp_chunks) if timestamp_chunks else np.empty(0)
+            normalized_timestamps = (timestamps - bounds[0]) / (bounds[1] - bounds[0]) * video_duration
+        else:
+            normalized_timestamps = row_indices * (video_duration / max(original_frame_count, 1))
+        video_sync = episode_video_sync(video_paths, normalized_timestamps, video_duration)
+
+    if not pointcloud_columns:
+        sampled_points = {cam: [np.empty((0, 3))] * len(row_indices) for cam in POINTCLOUD_COLUMNS}
+
+    return {
+        'key': key,
+        'index': int(episode_index),
+        'folderPath': base_folder,
+        'frame_count': len(row_indices),
+        'original_frame_count': original_frame_count,
+        'video_paths': video_paths,
+        'window': {'start_frame': start, 'end_frame': end, 'frame_step': frame_step},
+        'frame_indices': row_indices,
+        'motor_data': {
+            'time': normalized_timestamps,
+            'motors': action_data
+        },
+        'pointcloud_data': {cam: sampled_points[cam] for cam in POINTCLOUD_COLUMNS},
+        'video_sync': video_sync
+    }
+
+
+def parse_window_request(files: List[str], folder_path: str, window: Dict[str, Any], max_frames: int = None,
+                         max_points: int = None, executor: ProcessPoolExecutor = None,
+                         sampling: Dict[str, Any] = None, compact: Dict[str, Any] = None,
+                         profile: Dict[str, Any] = None, **_) -> str:
+    """处理一次帧区间请求（只取第一个文件），返回单个 episode 的 JSON 字符串
+
+    compact 为紧凑编码参数（如 {"bbox": "frame"}，见 lerobot_codec.encode_episode_compact），None 时输出浮点数。
+    profile 不为 None 时向 stderr 写出该 episode 的统计记录（见 _profiled_parse）。
+    """
+    file_path = files[0].split(':')[0]
+    args = (file_path, folder_path.replace('\\', '/'), window.get('start_frame'), window.get('end_frame'),
+            window.get('start_time'), window.get('end_time'), max_frames, max_points)
+    if executor is not None:
+        episode = executor.submit(_profiled_parse, parse_episode_window, profile, *args, sampling).result()
+    else:
+        episode = _profiled_parse(parse_episode_window, profile, *args, sampling)
+    profile_record = episode.pop('profile', None)
+    profiler = StageProfiler() if profile_record is not None else NULL_PROFILER
+    with profiler.stage('serialize'):
+        if compact is not None:
+            episode = encode_episode_compact(episode, **compact)
+        payload = json.dumps(convert_to_serializable(episode))
+    profiler.count('bytes', len(payload))
+    _finish_profile(profile_record, profiler, quality='window')
+    return payload
+
+
+def resolve_episode_workers(workers: int, memory_budget_mb: int = None, num_files: int = None) -> int:
+    """计算 episode 级进程池的实际 worker 数：不超过 CPU 数、文件数，以及可用内存能容纳的 worker 数"""
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    if num_files is not None:
+        workers = max(1, min(workers, num_files))
+    if memory_budget_mb:
+        available_mb = _available_memory_mb()
+        if available_mb is not None:
+            workers = max(1, min(workers, int(available_mb // memory_budget_mb)))
+    return workers
+
+
+def _available_memory_mb() -> Optional[float]:
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _parse_episode_safe(file_path: str, original_name: str, base_folder: str, max_frames: int, max_points: int,
+                        quality: str, lod: bool,
+                        manifest_entry: Dict[str, Any] = None, sampling: Dict[str, Any] = None,
+                        profile: Dict[str, Any] = None) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    logging.info(f"Processing file: {file_path} (originalName: {original_name})")
+    try:
+        episode = _profiled_parse(load_or_parse_episode, profile, file_path, base_folder, max_frames, max_points, quality,
+                                  lod, manifest_entry, sampling)
+    except Exception as e:
+        logging.error(f"Error processing {file_path}: {e}")
+        return file_path, None, str(e)
+    logging.info(f"Successfully generated episode: {episode['key']}")
+    return file_path, episode, None
+
+
+def _profiled_parse(parse, profile: Optional[Dict[str, Any]], file_path: str, *args) -> Dict[str, Any]:
+    """调用 parse（load_or_parse_episode / parse_episode_window），返回 episode
+
+    profile 为性能统计参数 {"frame_stats": bool}，不为 None 时用 StageProfiler 统计各阶段，
+    统计记录放在 episode['profile'] 中随结果带回主进程（由主进程补充序列化阶段后写出，见 _finish_profile）。
+    """
+    if profile is None:
+        return parse(file_path, *args)
+    profiler = StageProfiler(frame_stats=bool(profile.get('frame_stats')))
+    episode = parse(file_path, *args, profiler=profiler)
+    episode['profile'] = {'scope': 'episode', 'file': file_path, 'key': episode['key'], 'pid': os.getpid(), **profiler.to_dict()}
+    return episode
+
+
+def _finish_profile(profile_record: Optional[Dict[str, Any]], serialize_profiler, **fields):
+    """把主进程中统计的序列化阶段合并进 worker 带回的统计记录，写到 stderr；profile_record 为 None 时什么也不做"""
+    if profile_record is None:
+        return
+    write_profile_record({**merge_profiles(profile_record, serialize_profiler.to_dict()), **fields})
+
+
+def _parse_episode_task(*args) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """进程池中解析一个 episode，完成后把 Arrow 内存池的空闲内存还给系统，常驻 worker 的内存不会持续增长"""
+    try:
+        return _parse_episode_safe(*args)
+    finally:
+        pa.default_memory_pool().release_unused()
+
+
+def _init_episode_worker():
+    """episode worker 初始化：忽略 SIGINT，由主进程负责退出"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def iter_ordered_episodes(executor: ProcessPoolExecutor, files: List[Tuple[str, str]], base_folder: str, max_frames: int = None,
+                          max_points: int = None, quality: str = 'medium', lod: bool = False,
+                          window: int = 2, manifest: Dict[str, Dict[str, Any]] = None,
+                          sampling: Dict[str, Any] = None, profile: Dict[str, Any] = None) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """把 episode 分发到进程池并按输入顺序产出结果
+
+    同时最多提交 window 个 episode，已完成但尚未轮到输出的结果也计入其中，主进程内存不随文件数增长。
+    """
+    pending = deque()
+    remaining = iter(files)
+
+    def submit_next():
+        for file_path, original_name in itertools.islice(remaining, 1):
+            manifest_entry = (manifest or {}).get(os.path.abspath(file_path))
+            args = (file_path, original_name, base_folder, max_frames, max_points, quality, lod, manifest_entry, sampling, profile)
+            pending.append((file_path, executor.submit(_parse_episode_task, *args)))
+
+    for _ in range(max(1, window)):
+        submit_next()
+    while pending:
+        file_path, future = pending.popleft()
+        submit_next()
+        try:
+            yield future.result()
         except Exception as e:
+            # worker 进程异常退出等进程池故障，只影响对应的 episode
             logging.error(f"Error processing {file_path}: {e}")
-            continue
+            yield file_path, None, str(e)
+
+
+def iter_lerobot_episodes(files: List[Tuple[str, str]], folder_path: str, max_frames: int = None, max_points: int = None,
+                          quality: str = 'medium', lod: bool = False, workers: int = 1,
+                          memory_budget_mb: int = None, executor: ProcessPoolExecutor = None,
+                          sampling: Dict[str, Any] = None,
+                          profile: Dict[str, Any] = None) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """解析文件列表，按输入顺序产出 (file_path, episode, error)，失败时 episode 为 None
+
+    workers > 1 时按 episode 分发到进程池并行解析（传入 executor 时复用该进程池，workers 为其 worker 数）；
+    memory_budget_mb 为每个 worker 的内存预算，可用内存不足时相应减少 worker 数。
+    sampling 为点云降采样参数（见 _read_episode_frames）。
+    profile 不为 None 时每个 episode 带回统计记录 episode['profile']（见 _profiled_parse），
+    建立清单（包括视频探测）的耗时作为一条 scope 为 request 的记录直接写到 stderr。
+    """
+    base_folder = folder_path.replace('\\', '/')
+    logging.info(f"Starting parsing {len(files)} files, folderPath: {base_folder}")
+    # 清单提供 episode_index 和视频信息（未变化的文件不再打开），视频时长在建立清单时并发探测
+    manifest_profiler = StageProfiler() if profile is not None else NULL_PROFILER
+    with manifest_profiler.stage('manifest'):
+        manifest = build_manifest(base_folder, files)
+    if profile is not None:
+        write_profile_record({'scope': 'request', 'folder': base_folder, 'files': len(files), **manifest_profiler.to_dict()})
+
+    if executor is not None:
+        yield from iter_ordered_episodes(executor, files, base_folder, max_frames, max_points, quality, lod,
+                                         window=workers * 2, manifest=manifest, sampling=sampling, profile=profile)
+        return
+
+    workers = resolve_episode_workers(workers, memory_budget_mb, len(files))
+    if workers <= 1:
+        for file_path, original_name in files:
+            yield _parse_episode_safe(file_path, original_name, base_folder, max_frames, max_points, quality, lod,
+                                      manifest.get(os.path.abspath(file_path)), sampling, profile)
+        return
 
+    logging.info(f"Parsing episodes with {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_episode_worker) as pool:
+        yield from iter_ordered_episodes(pool, files, base_folder, max_frames, max_points, quality, lod,
+                                         window=workers * 2, manifest=manifest, sampling=sampling, profile=profile)
+
+
+def parse_lerobot_data(files: List[Tuple[str, str]], folder_path: str, max_frames: int = None, max_points: int = None, quality: str = 'medium',
+                       lod: bool = False, sampling: Dict[str, Any] = None, profile: Dict[str, Any] = None,
+                       **pool_options) -> List[Dict[str, Any]]:
+    episodes = [episode for _, episode, _ in iter_lerobot_episodes(files, folder_path, max_frames, max_points, quality, lod,
+                                                                   sampling=sampling, profile=profile, **pool_options)
+                if episode is not None]
     logging.info(f"Parsing completed, generated {len(episodes)} episodes")
     return episodes
 
+
 def convert_to_serializable(obj):
     """递归地将 NumPy 类型转换为原生 Python 类型，确保 JSON 可序列化"""
     if isinstance(obj, dict):
@@ -263,127 +666,552 @@ def convert_to_serializable(obj):
     else:
         return obj
 
-def main():
-    parser = argparse.ArgumentParser(description='Parse LeRobot dataset files.')
-    parser.add_argument('--files', nargs='+', required=True, help='List of files to parse with original names (format: path:original_name)')
-    parser.add_argument('--folderPath', type=str, required=True, help='Base folder path for video files')
-    parser.add_argument('--max-frames', type=int, default=None, help='Maximum number of frames to process per episode (default: auto)')
-    parser.add_argument('--max-points', type=int, default=None, help='Maximum number of points per frame in pointcloud (default: auto)')
-    parser.add_argument('--quality', type=str, choices=['low', 'medium', 'high', 'full'], default='medium',
-                        help='Data quality preset: low(fast), medium(balanced), high(detailed), full(no sampling)')
-    args = parser.parse_args()
+# 质量预设: quality -> (max_frames, max_points)，None 表示不限制
+# max_frames 是在整个 episode 上按 2 的幂步长抽帧后的帧数上限（见 lod_frame_stride），不截断 episode 的后半部分
+QUALITY_PRESETS = {
+    'low': (300, 300),
+    'medium': (800, 600),
+    'high': (1500, 1000),
+    'full': (None, None),
+}
+
+
+def resolve_quality_params(quality: str, max_frames: int = None, max_points: int = None) -> Tuple[int, int]:
+    """根据质量预设计算 max_frames / max_points，显式传入的参数优先"""
+    preset_frames, preset_points = QUALITY_PRESETS.get(quality, (None, None))
+    return max_frames or preset_frames, max_points or preset_points
+
+
+def lod_frame_stride(frame_count: int, max_frames: int = None) -> int:
+    """在 frame_count 帧上抽帧到不超过 max_frames 帧的步长（2 的幂，max_frames 为 None 时为 1）"""
+    frame_stride = 1
+    if max_frames is not None:
+        while math.ceil(frame_count / frame_stride) > max_frames:
+            frame_stride *= 2
+    return frame_stride
 
-    # 根据质量预设调整参数
-    if args.quality == 'low':
-        max_frames = args.max_frames or 300
-        max_points = args.max_points or 300
-    elif args.quality == 'medium':
-        max_frames = args.max_frames or 800
-        max_points = args.max_points or 600
-    elif args.quality == 'high':
-        max_frames = args.max_frames or 1500
-        max_points = args.max_points or 1000
-    elif args.quality == 'full':
-        max_frames = args.max_frames  # None = 无限制，使用原始数据
-        max_points = args.max_points  # None = 无限制，使用原始点云
-    else:
-        max_frames = args.max_frames
-        max_points = args.max_points
 
-    logging.info(f"Using quality preset: {args.quality}, max_frames: {max_frames}, max_points: {max_points}")
+def build_lod_levels(frame_count: int, points_per_frame: int) -> Dict[str, Dict[str, int]]:
+    """计算每个质量级别在 LOD 数据上的切片参数
 
-    files = [tuple(f.split(':')) for f in args.files]
-    episodes = parse_lerobot_data(files, args.folderPath, max_frames, max_points, args.quality)
+    帧步长取 2 的幂，保证低质量级别的帧总是高质量级别的子集；点数为每帧保留的前缀长度。
+    按质量预设单独解析时使用同样的步长（见 parse_episode_file），同一质量级别无论来自 LOD 切片还是单独解析，
+    都是覆盖整个 episode 的同一组帧。
+    """
+    levels = {}
+    for quality, (preset_frames, preset_points) in QUALITY_PRESETS.items():
+        levels[quality] = {
+            'frame_stride': lod_frame_stride(frame_count, preset_frames),
+            'points': min(preset_points or points_per_frame, points_per_frame),
+        }
+    return levels
 
-    # ✅ 优化数据输出，减少传输量
+
+def slice_lod_episode(episode: Dict[str, Any], quality: str) -> Dict[str, Any]:
+    """从 LOD episode 中切出指定质量级别的数据（只做切片，不复制点）"""
+    level = episode['lod']['levels'][quality]
+    frame_stride, points = level['frame_stride'], level['points']
+    sliced = {field: value for field, value in episode.items() if field != 'lod'}
+    if 'motor_envelope' in episode:
+        sliced['motor_envelope'] = envelope_overview(episode['motor_envelope'])
+    sliced['frame_count'] = math.ceil(episode['frame_count'] / frame_stride)
+    sliced['motor_data'] = {name: values[::frame_stride] for name, values in episode['motor_data'].items()}
+    sliced['pointcloud_data'] = {
+        cam: [frame[:points] for frame in frames[::frame_stride]]
+        for cam, frames in episode['pointcloud_data'].items()
+    }
+    if 'video_sync' in episode:
+        sliced['video_sync'] = slice_video_sync(episode['video_sync'], slice(None, None, frame_stride))
+    return sliced
+
+
+def _dump_json_list(items: List[Any], profilers: List) -> str:
+    """逐项序列化后拼接，结果与 json.dumps(items) 相同；每项的耗时与字节数计入对应 profiler"""
+    parts = []
+    for item, profiler in zip(items, profilers):
+        with profiler.stage('serialize'):
+            parts.append(json.dumps(item))
+        profiler.count('bytes', len(parts[-1]))
+    return '[' + ', '.join(parts) + ']'
+
+
+def serialize_episodes(episodes: List[Dict[str, Any]], profilers: List = None) -> str:
+    """将解析结果序列化为 JSON 字符串
+
+    不做有损的抽帧压缩：结果超过 Node.js 字符串上限时返回错误，调用方应改用紧凑编码（--encoding compact）
+    或更低的质量级别。
+    profilers 与 episodes 一一对应时，每个 episode 的转换与序列化计入对应 profiler 的 serialize 阶段。
+    """
+    profilers = profilers or [NULL_PROFILER] * len(episodes)
     try:
-        serializable_episodes = convert_to_serializable(episodes)
-
-        # 智能数据大小管理
-        # 先估算数据大小，避免生成过大的JSON
-        estimated_size = 0
-        for episode in serializable_episodes:
-            # 估算每个episode的大小
-            frame_count = episode.get('frame_count', 0)
-            pointcloud_frames = len(episode.get('pointcloud_data', {}).get('cam_top', []))
-            avg_points_per_frame = len(episode.get('pointcloud_data', {}).get('cam_top', [{}])[0]) if pointcloud_frames > 0 else 0
-
-            # 估算大小：每个点约12字节（3个float），加上其他数据
-            estimated_episode_size = (pointcloud_frames * avg_points_per_frame * 12 * 2) + (frame_count * 100)  # 2个相机，额外数据
-            estimated_size += estimated_episode_size
-
-        estimated_mb = estimated_size / 1024 / 1024
-        logging.info(f"Estimated data size: {estimated_mb:.2f} MB")
-
-        # 如果估算大小超过400MB，进行智能压缩
-        if estimated_mb > 400:
-            logging.warning(f"Data size too large ({estimated_mb:.2f} MB), applying smart compression...")
-
-            # 根据质量级别进行不同程度的压缩
-            if args.quality == 'full':
-                # 完整质量：只压缩到合理大小，保持高质量
-                compression_factor = max(1, int(estimated_mb / 300))  # 目标300MB
-                logging.info(f"Full quality compression factor: {compression_factor}")
-            else:
-                # 其他质量：更激进的压缩
-                compression_factor = max(2, int(estimated_mb / 200))  # 目标200MB
-                logging.info(f"Standard compression factor: {compression_factor}")
-
-            compressed_episodes = []
-            for episode in serializable_episodes:
-                compressed_episode = {
-                    'key': episode['key'],
-                    'index': episode['index'],
-                    'folderPath': episode['folderPath'],
-                    'frame_count': episode['frame_count'],
-                    'video_paths': episode['video_paths'],
-                    'motor_data': {
-                        'time': episode['motor_data']['time'][::compression_factor],
-                        'motors': episode['motor_data']['motors'][::compression_factor]
-                    },
-                    'pointcloud_data': {
-                        'cam_top': [frame[::compression_factor] for frame in episode['pointcloud_data']['cam_top'][::compression_factor]],
-                        'cam_right_wrist': [frame[::compression_factor] for frame in episode['pointcloud_data']['cam_right_wrist'][::compression_factor]]
-                    }
-                }
-                compressed_episodes.append(compressed_episode)
-
-            serializable_episodes = compressed_episodes
-            logging.info(f"Applied compression factor {compression_factor}")
-
-        # 生成最终JSON
-        json_str = json.dumps(serializable_episodes)
+        serializable_episodes = []
+        for episode, profiler in zip(episodes, profilers):
+            with profiler.stage('serialize'):
+                serializable_episodes.append(convert_to_serializable(episode))
+
+        json_str = _dump_json_list(serializable_episodes, profilers)
         final_size_mb = len(json_str) / 1024 / 1024
         logging.info(f"Final JSON size: {final_size_mb:.2f} MB")
 
-        # 如果还是太大，进行最后的安全检查
         if final_size_mb > 450:  # Node.js字符串限制约512MB
-            logging.error(f"Data still too large ({final_size_mb:.2f} MB), cannot process safely")
-            print(json.dumps({"error": f"Data too large ({final_size_mb:.2f} MB), please use lower quality setting", "episodes": []}))
-        else:
-            print(json_str)
+            logging.error(f"Data too large ({final_size_mb:.2f} MB), cannot process safely")
+            return json.dumps({"error": f"Data too large ({final_size_mb:.2f} MB), please use compact encoding or a lower quality setting", "episodes": []})
+        return json_str
     except Exception as e:
         logging.error(f"Error serializing episodes to JSON: {e}")
         # 输出错误信息而不是崩溃
-        print(json.dumps({"error": str(e), "episodes": []}))
+        return json.dumps({"error": str(e), "episodes": []})
+
+
+def parse_files(files: List[str], folder_path: str, quality: str = 'medium',
+                max_frames: int = None, max_points: int = None, lod: bool = False,
+                sampling: Dict[str, Any] = None, profile: Dict[str, Any] = None, **pool_options) -> List[Dict[str, Any]]:
+    """按质量预设解析 `path:original_name` 格式的文件列表
+
+    lod=True 时忽略质量预设（只使用显式传入的参数），输出可切出所有质量级别的 LOD episode。
+    sampling（点云降采样方式）、profile（性能统计）与 pool_options（workers / memory_budget_mb / executor）见 iter_lerobot_episodes。
+    """
+    if lod:
+        logging.info(f"Using LOD mode, max_frames: {max_frames}, max_points: {max_points}")
+    else:
+        max_frames, max_points = resolve_quality_params(quality, max_frames, max_points)
+        logging.info(f"Using quality preset: {quality}, max_frames: {max_frames}, max_points: {max_points}")
+
+    file_pairs = [tuple(f.split(':')) for f in files]
+    return parse_lerobot_data(file_pairs, folder_path, max_frames, max_points, quality, lod, sampling, profile, **pool_options)
+
+
+def parse_request(files: List[str], folder_path: str, quality: str = 'medium',
+                  max_frames: int = None, max_points: int = None, lod: bool = False,
+                  sampling: Dict[str, Any] = None, compact: Dict[str, Any] = None, profile: Dict[str, Any] = None,
+                  **pool_options) -> str:
+    """处理一次解析请求（CLI 与 --serve 共用），返回 JSON 字符串
+
+    compact 不为 None 时输出紧凑编码的 episode（见 lerobot_codec）；两种编码都不做有损压缩（见 serialize_episodes）。
+    profile 不为 None 时每个 episode 序列化后向 stderr 写出一条统计记录（见 lerobot_profile）。
+    """
+    episodes = parse_files(files, folder_path, quality, max_frames, max_points, lod, sampling, profile, **pool_options)
+    profile_records = [episode.pop('profile', None) for episode in episodes]
+    profilers = [StageProfiler() if record is not None else NULL_PROFILER for record in profile_records]
+    if compact is not None:
+        encoded = []
+        for episode, profiler in zip(episodes, profilers):
+            with profiler.stage('serialize'):
+                encoded.append(convert_to_serializable(encode_episode_compact(episode, **compact)))
+        payload = _dump_json_list(encoded, profilers)
+    else:
+        payload = serialize_episodes(episodes, profilers)
+    for record, profiler in zip(profile_records, profilers):
+        _finish_profile(record, profiler, quality='lod' if lod else quality)
+    return payload
+
+
+def manifest_request(files: List[str], folder_path: str, **_) -> str:
+    """返回文件列表对应的清单条目（按输入顺序，只读取 parquet footer），见 lerobot_manifest"""
+    file_pairs = [tuple(f.split(':')) for f in files]
+    entries = build_manifest(folder_path, file_pairs)
+    abs_paths = [os.path.abspath(file_path) for file_path, _ in file_pairs]
+    return json.dumps([entries[path] for path in abs_paths if path in entries])
+
+
+def preview_request(files: List[str], folder_path: str, previews: Dict[str, Any] = None, **_) -> str:
+    """为文件列表对应 episode 的每个相机视频生成预览 sprite sheet（见 lerobot_preview），按输入顺序返回
+
+    结果为 [{"key", "file", "previews": {cam_key: preview.json 内容或 null}}]，没有视频的相机不出现。
+    """
+    params = preview_params(**(previews or {}))
+    file_pairs = [tuple(f.split(':')) for f in files]
+    entries = build_manifest(folder_path, file_pairs)
+    abs_paths = [os.path.abspath(file_path) for file_path, _ in file_pairs]
+    episodes = [entries[path] for path in abs_paths if path in entries]
+    results = generate_previews(
+        (path for entry in episodes for path in (entry.get('video_paths') or {}).values() if path), params
+    )
+    return json.dumps([{
+        'key': entry['key'],
+        'file': entry['original_name'],
+        'previews': {cam_key: results.get(path) for cam_key, path in (entry.get('video_paths') or {}).items() if path},
+    } for entry in episodes])
+
+
+def _episode_chunk_records(episode: Dict[str, Any], chunk_frames: int) -> Iterator[Dict[str, Any]]:
+    """把一个 episode 拆成 episode_start / frames / episode_end 记录，每条 frames 最多 chunk_frames 帧"""
+    key = episode['key']
+    start_data = {field: episode.get(field) for field in EPISODE_META_FIELDS}
+    if 'motor_envelope' in episode:
+        start_data['motor_envelope'] = episode['motor_envelope']
+    # 同步索引很小，整个放在 episode_start 中，按 frames 记录的 start / end 下标查找
+    if 'video_sync' in episode:
+        start_data['video_sync'] = episode['video_sync']
+    yield {'type': 'episode_start', 'data': start_data}
+    for start in range(0, episode['frame_count'], chunk_frames):
+        end = min(start + chunk_frames, episode['frame_count'])
+        yield {
+            'type': 'frames',
+            'key': key,
+            'start': start,
+            'end': end,
+            'motor_data': {
+                'time': episode['motor_data']['time'][start:end],
+                'motors': episode['motor_data']['motors'][start:end]
+            },
+            'pointcloud_data': {cam: frames[start:end] for cam, frames in episode['pointcloud_data'].items()}
+        }
+    yield {'type': 'episode_end', 'key': key}
+
+
+def iter_ndjson_records(files: List[str], folder_path: str, quality: str = 'medium', max_frames: int = None,
+                        max_points: int = None, chunk_frames: int = None, lod: bool = False,
+                        sampling: Dict[str, Any] = None, compact: Dict[str, Any] = None, profile: Dict[str, Any] = None,
+                        **pool_options) -> Iterator[str]:
+    """流式输出：每个 episode 解析完成后立即产出一行 JSON 记录
+
+    compact 不为 None 时 episode 与 frames 记录的数组使用紧凑编码（每条 frames 记录单独编码，可独立解码）。
+    profile 不为 None 时每个 episode 的记录全部产出后向 stderr 写出一条统计记录（不在输出流中）。
+
+    记录类型:
+        episode       {"type": "episode", "data": <episode>}（未指定 chunk_frames 时）
+        episode_start / frames / episode_end  按 chunk_frames 分块输出的 episode
+        error         {"type": "error", "file": ..., "error": ...}
+        progress      {"type": "progress", "completed": ..., "total": ..., "failed": ...}
+        done          {"type": "done", "episodes": ..., "failed": ...}
+    """
+    if not lod:
+        max_frames, max_points = resolve_quality_params(quality, max_frames, max_points)
+    logging.info(f"Using quality preset: {quality}, max_frames: {max_frames}, max_points: {max_points}, lod: {lod}, streaming output")
+
+    file_pairs = [tuple(f.split(':')) for f in files]
+    failed = 0
+    episodes = iter_lerobot_episodes(file_pairs, folder_path, max_frames, max_points, quality, lod,
+                                     sampling=sampling, profile=profile, **pool_options)
+    for completed, (file_path, episode, error) in enumerate(episodes, start=1):
+        if episode is None:
+            failed += 1
+            yield json.dumps({'type': 'error', 'file': file_path, 'error': error})
+        else:
+            profile_record = episode.pop('profile', None)
+            profiler = StageProfiler() if profile_record is not None else NULL_PROFILER
+            records = _episode_chunk_records(episode, chunk_frames) if chunk_frames else [{'type': 'episode', 'data': episode}]
+            for record in records:
+                with profiler.stage('serialize'):
+                    if compact is not None and record['type'] == 'frames':
+                        record = encode_episode_compact(record, **compact)
+                    elif compact is not None and record['type'] == 'episode':
+                        record = {'type': 'episode', 'data': encode_episode_compact(record['data'], **compact)}
+                    line = json.dumps(convert_to_serializable(record))
+                profiler.count('bytes', len(line))
+                yield line
+            _finish_profile(profile_record, profiler, quality='lod' if lod else quality)
+        yield json.dumps({'type': 'progress', 'completed': completed, 'total': len(file_pairs), 'failed': failed})
+
+    yield json.dumps({'type': 'done', 'episodes': len(file_pairs) - failed, 'failed': failed})
+
+
+def _warmup():
+    return os.getpid()
+
+
+# serve 请求中帧区间字段的类型（帧号为整数，时间为秒）
+WINDOW_FIELD_TYPES = {'start_frame': int, 'end_frame': int, 'start_time': float, 'end_time': float}
+
+
+def _is_number(value: Any, integer: bool = False) -> bool:
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) if integer else isinstance(value, (int, float))
+
+
+def _request_files(files: Any) -> List[str]:
+    """校验 serve 请求的文件列表：`path:name` 字符串的列表，且文件都存在"""
+    if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+        raise TypeError("files must be a list of 'path:name' strings")
+    missing = [f for f in files if not os.path.isfile(f.split(':')[0])]
+    if missing:
+        raise ValueError(f"files not found: {', '.join(missing)}")
+    return files
+
+
+def _request_limit(request: Dict[str, Any], name: str) -> Optional[int]:
+    value = request.get(name)
+    if value is not None and not (_is_number(value, integer=True) and value > 0):
+        raise ValueError(f"{name} must be a positive integer, got {value!r}")
+    return value
 
-def safe_format_pointcloud_data(raw_pc, max_points=1000):
+
+def _request_window(window: Any) -> Dict[str, Any]:
+    """校验 serve 请求的帧区间，只接受 WINDOW_FIELD_TYPES 中的字段，值为数字或 null"""
+    if not isinstance(window, dict):
+        raise TypeError('window must be a JSON object')
+    unknown = set(window) - set(WINDOW_FIELD_TYPES)
+    if unknown:
+        raise ValueError(f"unknown window fields: {', '.join(sorted(unknown))}")
+    for name, value in window.items():
+        if value is not None and not _is_number(value, integer=WINDOW_FIELD_TYPES[name] is int):
+            raise ValueError(f"window.{name} must be {'an integer' if WINDOW_FIELD_TYPES[name] is int else 'a number'}, got {value!r}")
+    return dict(window)
+
+
+def serve(workers: int = 2, memory_budget_mb: int = None):
+    """常驻模式：从 stdin 逐行读取 JSON 请求，向 stdout 逐行写出 JSON 响应
+
+    请求: {"id": ..., "files": ["path:name", ...], "folderPath": ..., "quality": ..., "max_frames": ..., "max_points": ...}
+    响应: {"id": ..., "ok": true, "result": <与 CLI 输出相同的 JSON>} 或 {"id": ..., "ok": false, "error": "..."}
+
+    请求字段的类型、质量级别、帧区间的数值和文件是否存在在分发前检查，不合法时返回 "Invalid request: ..." 错误（带请求 id）。
+
+    所有请求共用一个 episode 级进程池：每个请求的 episode 分发到各个 worker 并行解析，结果按输入顺序汇总；
+    等待结果、序列化和写出响应在主进程的请求线程中完成。
+
+    参数完全相同（LOD 请求不区分质量级别）且仍在执行中的请求会合并为一次解析，结果分别返回给每个请求 id。
+
+    请求中带 "lod": true 时输出 LOD episode（见 parse_episode_file），各质量级别由调用方切片得到。
+
+    请求中带 "reduction"（random / voxel / fps，可选 "voxel_size"）时使用对应的点云降采样方式，voxel / fps 不能与 lod 同时使用。
+
+    请求中带 "encoding": "compact"（可选 "bbox": "frame" | "episode"）时输出紧凑编码的数组（见 lerobot_codec）。
+
+    请求中带 "profile": true（可选 "frame_stats": true）时每个 episode 向 stderr 写一行统计记录（见 lerobot_profile）。
+
+    请求中带 "window": {"start_frame", "end_frame", "start_time", "end_time"} 时只解析第一个文件的该区间（见 parse_episode_window），
+    result 为单个 episode。
+
+    请求中带 "manifest": true 时只返回各文件的清单条目（见 lerobot_manifest），不解析数据。
+
+    请求中带 "previews": {"mode": "interval" | "keyframe", "interval": ...} 时为各 episode 的相机视频生成预览
+    sprite sheet（见 preview_request），不解析数据。
+
+    请求中带 "stream": true（可选 "chunk_frames"）时按 NDJSON 记录流式返回:
+    每条记录为 {"id": ..., "record": <记录>}，结束时为 {"id": ..., "ok": true, "done": true}。流式请求不合并。
+    """
+    workers = resolve_episode_workers(workers, memory_budget_mb)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_episode_worker)
+    # 提前拉起全部 worker，避免第一个请求承担导入和进程启动的开销
+    for future in [executor.submit(_warmup) for _ in range(workers)]:
+        future.result()
+    request_pool = ThreadPoolExecutor(max_workers=workers)
+    pool_options = {'workers': workers, 'executor': executor}
+    logging.info(f"parse_lerobot serve mode ready with {workers} workers")
+
+    lock = threading.Lock()
+    in_flight: Dict[str, Tuple[Any, List[Any]]] = {}
+
+    def write_line(line: str):
+        with lock:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+    def run_stream(request_id: Any, params: Dict[str, Any], chunk_frames: int = None):
+        try:
+            for line in iter_ndjson_records(chunk_frames=chunk_frames, **params, **pool_options):
+                write_line(f'{{"id": {json.dumps(request_id)}, "record": {line}}}')
+            write_line(json.dumps({'id': request_id, 'ok': True, 'done': True}))
+        except Exception as e:
+            logging.error(f"Stream request {request_id} failed: {e}")
+            write_line(json.dumps({'id': request_id, 'ok': False, 'error': str(e)}))
+
+    def on_done(request_key: str, future):
+        with lock:
+            _, request_ids = in_flight.pop(request_key)
+        try:
+            payload = future.result()
+        except Exception as e:
+            logging.error(f"Serve request failed: {e}")
+            for request_id in request_ids:
+                write_line(json.dumps({'id': request_id, 'ok': False, 'error': str(e)}))
+            return
+        for request_id in request_ids:
+            # payload 已经是 JSON 字符串，直接拼接避免重复序列化
+            write_line(f'{{"id": {json.dumps(request_id)}, "ok": true, "result": {payload}}}')
+
+    for raw_line in sys.stdin:
+        raw_line = raw_line.strip()
+        if not raw_line:
+            continue
+        # 只要请求行是 JSON 对象，出错时也带回请求 id，调用方才能结束对应的请求
+        request_id = None
+        try:
+            request = json.loads(raw_line)
+            if not isinstance(request, dict):
+                raise TypeError('request must be a JSON object')
+            request_id = request.get('id')
+            if not isinstance(request['folderPath'], str):
+                raise TypeError('folderPath must be a string')
+            if request.get('quality', 'medium') not in QUALITY_PRESETS:
+                raise ValueError(f"unknown quality {request.get('quality')!r}")
+            params = {
+                'files': _request_files(request['files']),
+                'folder_path': request['folderPath'],
+                'quality': request.get('quality', 'medium'),
+                'max_frames': _request_limit(request, 'max_frames'),
+                'max_points': _request_limit(request, 'max_points'),
+                'lod': bool(request.get('lod')),
+            }
+            if request.get('reduction', 'random') != 'random' or request.get('voxel_size'):
+                if request.get('reduction') not in REDUCTION_MODES:
+                    raise ValueError(f"unknown reduction {request.get('reduction')!r}")
+                if request.get('voxel_size') is not None and not (_is_number(request['voxel_size']) and request['voxel_size'] > 0):
+                    raise ValueError(f"voxel_size must be a positive number, got {request['voxel_size']!r}")
+                params['sampling'] = {'reduction': request['reduction'], 'voxel_size': request.get('voxel_size')}
+                if params['lod'] and request['reduction'] != 'random':
+                    raise ValueError(f"lod only supports random reduction, parse {request['reduction']!r} per quality instead")
+            if request.get('encoding') == 'compact':
+                if request.get('bbox', 'frame') not in COMPACT_BBOX_MODES:
+                    raise ValueError(f"unknown bbox {request.get('bbox')!r}")
+                params['compact'] = {'bbox': request.get('bbox', 'frame')}
+            if request.get('profile') or request.get('frame_stats'):
+                params['profile'] = {'frame_stats': bool(request.get('frame_stats'))}
+            if request.get('window'):
+                params['window'] = _request_window(request['window'])
+            if request.get('manifest'):
+                params['manifest'] = True
+            if request.get('previews'):
+                params['previews'] = preview_params(**request['previews'])
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f"Invalid serve request: {e}")
+            write_line(json.dumps({'id': request_id, 'ok': False, 'error': f"Invalid request: {e}"}))
+            continue
+
+        if request.get('stream'):
+            request_pool.submit(run_stream, request_id, params, request.get('chunk_frames'))
+            continue
+
+        # LOD 输出与质量级别无关，不同质量级别的 LOD 请求同样合并
+        request_key = json.dumps({**params, 'quality': None} if params['lod'] else params, sort_keys=True)
+        with lock:
+            if request_key in in_flight:
+                in_flight[request_key][1].append(request_id)
+                logging.info(f"Merged request {request_id} into in-flight parse")
+                continue
+            if params.get('manifest'):
+                handler = manifest_request
+            elif params.get('previews'):
+                handler = preview_request
+            else:
+                handler = parse_window_request if 'window' in params else parse_request
+            future = request_pool.submit(handler, **params, **pool_options)
+            in_flight[request_key] = (future, [request_id])
+        future.add_done_callback(lambda f, k=request_key: on_done(k, f))
+
+    request_pool.shutdown(wait=True)
+    executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse LeRobot dataset files.')
+    parser.add_argument('--files', nargs='+', help='List of files to parse with original names (format: path:original_name)')
+    parser.add_argument('--folderPath', type=str, help='Base folder path for video files')
+    parser.add_argument('--max-frames', type=int, default=None, help='Maximum number of frames to process per episode (default: auto)')
+    parser.add_argument('--max-points', type=int, default=None, help='Maximum number of points per frame in pointcloud (default: auto)')
+    parser.add_argument('--quality', type=str, choices=['low', 'medium', 'high', 'full'], default='medium',
+                        help='Data quality preset: low(fast), medium(balanced), high(detailed), full(no sampling)')
+    parser.add_argument('--output-format', type=str, choices=['json', 'ndjson'], default='json',
+                        help='Output format: json (default) or ndjson (one record per episode as soon as it is parsed)')
+    parser.add_argument('--chunk-frames', type=int, default=None,
+                        help='In ndjson mode, split each episode into records of at most this many frames')
+    parser.add_argument('--lod', action='store_true',
+                        help='Parse once at full detail with progressive point order and emit per-quality slice levels '
+                             '(random reduction only)')
+    parser.add_argument('--reduction', type=str, choices=REDUCTION_MODES, default='random',
+                        help='Pointcloud reduction: random (uniform), voxel (voxel-grid centroids) or fps (approximate farthest-point)')
+    parser.add_argument('--voxel-size', type=float, default=None,
+                        help='Voxel edge length for --reduction voxel (default: chosen per frame from --max-points)')
+    parser.add_argument('--encoding', type=str, choices=['float', 'compact'], default='float',
+                        help='Array encoding in json/ndjson output: float (default) or compact '
+                             '(int16 point clouds against a bounding box, delta-encoded motor series)')
+    parser.add_argument('--bbox', type=str, choices=COMPACT_BBOX_MODES, default='frame',
+                        help='Bounding box used to quantize point clouds with --encoding compact')
+    parser.add_argument('--profile', action='store_true',
+                        help='Write one JSON record per episode to stderr with per-stage timings, row/point counts, '
+                             'bytes written and peak memory')
+    parser.add_argument('--frame-stats', action='store_true',
+                        help='Also collect per-frame point-cloud statistics in the profile records (implies --profile)')
+    parser.add_argument('--start-frame', type=int, default=None, help='Only parse rows from this frame (row index, inclusive)')
+    parser.add_argument('--end-frame', type=int, default=None, help='Only parse rows before this frame (row index, exclusive)')
+    parser.add_argument('--start-time', type=float, default=None, help='Only parse rows with timestamp >= this value')
+    parser.add_argument('--end-time', type=float, default=None, help='Only parse rows with timestamp <= this value')
+    parser.add_argument('--manifest', action='store_true',
+                        help='Only print the manifest entries (footer metadata and videos) of the given files')
+    parser.add_argument('--previews', type=str, choices=PREVIEW_MODES, default=None,
+                        help='Only generate cached preview sprite sheets for the camera videos of the given files, '
+                             'one tile per --preview-interval seconds (interval) or per keyframe (keyframe)')
+    parser.add_argument('--preview-interval', type=float, default=None,
+                        help='Seconds between preview tiles with --previews interval (default: 1.0)')
+    parser.add_argument('--store-max-mb', type=float, default=None,
+                        help='Keep parsed arrays in the memory-mapped derived-array store under this disk budget '
+                             '(default: $LEROBOT_STORE_MAX_MB, store disabled when unset)')
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived worker reading JSON-lines requests from stdin')
+    parser.add_argument('--workers', type=int, default=2, help='Number of warm worker processes in --serve mode')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of worker processes that parse episodes in parallel (output keeps input order)')
+    parser.add_argument('--worker-memory-mb', type=int, default=None,
+                        help='Memory budget per worker process; fewer workers are started if available memory is short')
+    args = parser.parse_args()
+
+    if args.store_max_mb is not None:
+        # episode worker 进程从环境变量读取，需要在创建进程池之前设置
+        os.environ['LEROBOT_STORE_MAX_MB'] = str(args.store_max_mb)
+
+    if args.serve:
+        serve(args.workers, args.worker_memory_mb)
+        return
+
+    if not args.files or not args.folderPath:
+        parser.error('--files and --folderPath are required unless --serve is given')
+    if args.lod and args.reduction != 'random':
+        # voxel / fps 的前缀不是各质量级别点数下的同类结果（见 lerobot_sampling），需要按质量级别分别解析
+        parser.error(f"--lod only supports --reduction random, parse --reduction {args.reduction} per --quality instead")
+
+    window = {'start_frame': args.start_frame, 'end_frame': args.end_frame,
+              'start_time': args.start_time, 'end_time': args.end_time}
+    windowed = any(value is not None for value in window.values())
+    # 清单、预览和帧区间只输出单个 JSON 文档，也不使用 episode 级进程池
+    single_modes = [name for name, enabled in (('--manifest', args.manifest), ('--previews', args.previews),
+                                               ('frame window options', windowed)) if enabled]
+    if len(single_modes) > 1:
+        parser.error(f"{' and '.join(single_modes)} cannot be combined")
+    if single_modes and args.output_format != 'json':
+        parser.error(f"--output-format {args.output_format} is not supported with {single_modes[0]}")
+    if single_modes and args.jobs != 1:
+        parser.error(f"--jobs is not supported with {single_modes[0]}")
+
+    if args.manifest:
+        print(manifest_request(args.files, args.folderPath))
+        return
+
+    if args.previews:
+        print(preview_request(args.files, args.folderPath, {'mode': args.previews, 'interval': args.preview_interval}))
+        return
+
+    pool_options = {'workers': args.jobs, 'memory_budget_mb': args.worker_memory_mb}
+    sampling = {'reduction': args.reduction, 'voxel_size': args.voxel_size}
+    compact = {'bbox': args.bbox} if args.encoding == 'compact' else None
+    profile = {'frame_stats': args.frame_stats} if args.profile or args.frame_stats else None
+
+    if windowed:
+        print(parse_window_request(args.files, args.folderPath, window, args.max_frames, args.max_points,
+                                   sampling=sampling, compact=compact, profile=profile))
+        return
+
+    if args.output_format == 'ndjson':
+        for line in iter_ndjson_records(args.files, args.folderPath, args.quality, args.max_frames, args.max_points,
+                                        chunk_frames=args.chunk_frames, lod=args.lod, sampling=sampling, compact=compact,
+                                        profile=profile, **pool_options):
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+        return
+
+    print(parse_request(args.files, args.folderPath, args.quality, args.max_frames, args.max_points, lod=args.lod,
+                        sampling=sampling, compact=compact, profile=profile, **pool_options))
+
+def safe_format_pointcloud_data(raw_pc, max_points=1000, seed=0) -> np.ndarray:
+    """随机选择最多 max_points 个有效点，返回 (N, 3) 数组（序列化时再转换）"""
     try:
-        pc_array = np.array(raw_pc)
-        if pc_array.ndim == 1 and pc_array.size % 3 == 0:
-            pc_array = pc_array.reshape(-1, 3)
-        if pc_array.shape[1] != 3:
-            return []
-        valid = pc_array[np.all(np.isfinite(pc_array), axis=1)]
-        if valid.shape[0] == 0:
-            return []
-        if valid.shape[0] > max_points:
-            indices = np.random.choice(len(valid), size=max_points, replace=False)
-            return valid[indices].tolist()
-        return valid.tolist()
+        pc_array = np.asarray(raw_pc, dtype=np.float64).reshape(-1)
+        points, _ = sample_pointcloud_frames(pc_array, np.array([0, pc_array.size]), max_points, seed=seed)
+        return points
     except Exception as e:
         logging.warning(f"Safe pointcloud format failed: {e}")
-        return []
+        return np.empty((0, 3))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
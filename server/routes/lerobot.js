@@ -1,49 +1,55 @@
 const express = require('express');
 const fs = require('fs');
 const path = require('path');
-const { spawn } = require('child_process');
+const config = require('../config/environment');
 const File = require('../models/file');
 const { authenticateToken, checkPermission } = require('../middleware/auth');
 const {
-  getEpisodeCache,
   setEpisodeCache,
-  hasEpisodeCache
+  getEpisodeForQuality,
+  getLodEpisodeCache,
+  hasEpisodeForQuality,
+  syncEpisodeSources,
+  syncEpisodeSource
 } = require('../services/cacheService');
+const { parseLerobot, parseLerobotStream, getParseMetrics } = require('../services/lerobotParser');
+const { LOD_QUALITY, REDUCTION_MODES, reductionUsesLod, episodeCacheQuality, isLodEpisode, sliceLodEpisode } = require('../utils/lerobotLod');
+const { decodeCompactEpisode } = require('../utils/lerobotCompact');
+const { envelopeWindow } = require('../utils/lerobotEnvelope');
 
 const router = express.Router();
 
-// 解析单个episode的Python脚本
-async function parseEpisodeWithPython(filePath, originalName, folderPath) {
-  return new Promise((resolve, reject) => {
-    const pythonScript = path.join(__dirname, '../parse_lerobot.py');
-    const args = ['--files', `${filePath}:${originalName}`, '--folderPath', folderPath];
-
-    const pythonProcess = spawn('python3', [pythonScript, ...args]);
-    let stdoutData = '';
-    let stderrData = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      stdoutData += data.toString();
-    });
+// 解析单个episode（通过 parse_lerobot 常驻进程）：random 降采样解析 LOD 数据，各质量级别由 sliceEpisodeForQuality 切出；
+// voxel / fps 只按请求的质量级别解析（见 utils/lerobotLod.js reductionUsesLod）
+// 结果使用紧凑编码，直接写入缓存可以减小缓存文件
+async function parseEpisodeWithPython(filePath, originalName, folderPath, quality = 'medium', reduction = 'random') {
+  const result = await parseLerobot({
+    files: [`${filePath}:${originalName}`],
+    folderPath,
+    quality,
+    lod: reductionUsesLod(reduction),
+    reduction,
+    encoding: 'compact'
+  });
 
-    pythonProcess.stderr.on('data', (data) => {
-      stderrData += data.toString();
-    });
+  if (result && result.error) {
+    throw new Error(result.error);
+  }
+  const episodes = Array.isArray(result) ? result : (result?.episodes || []);
+  return episodes[0] || null;
+}
 
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        reject(new Error(`Python脚本执行失败: ${stderrData}`));
-        return;
-      }
+// 点云降采样方式（random/voxel/fps），未指定时为 random，未知方式返回 null
+function parseReduction(value) {
+  const reduction = value || 'random';
+  return REDUCTION_MODES.includes(reduction) ? reduction : null;
+}
 
-      try {
-        const episodes = JSON.parse(stdoutData || '[]');
-        resolve(episodes[0] || null);
-      } catch (parseError) {
-        reject(new Error(`JSON解析失败: ${parseError.message}`));
-      }
-    });
-  });
+// 从 LOD episode（可以是紧凑编码）切出指定质量级别，未知的质量级别按 full 处理（与 parse_lerobot.py 的预设一致）
+function sliceEpisodeForQuality(episode, quality) {
+  episode = decodeCompactEpisode(episode);
+  if (!isLodEpisode(episode)) return episode;
+  return sliceLodEpisode(episode, quality) || sliceLodEpisode(episode, 'full');
 }
 
 // 获取视频路径映射
@@ -64,196 +70,366 @@ function getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles) {
   return videoMap;
 }
 
+// 查找数据集目录下的 episode parquet 文件（排除 images 目录）
+function findParquetFiles(files, folderPath) {
+  const filteredFiles = files.filter(file => {
+    // 排除以 images 开头的文件夹中的文件
+    const pathParts = file.folderPath.split('/');
+    const hasImagesFolder = pathParts.some(part => part.toLowerCase().startsWith('images'));
+    return file.folderPath.startsWith(folderPath) && !hasImagesFolder;
+  });
+  return filteredFiles.filter(file =>
+    /^episode_\d{6}\.parquet$/.test(file.originalName) &&
+    fs.existsSync(file.path)
+  );
+}
+
+// 查找单个 episode 的 parquet 文件，不存在时返回 undefined
+function findEpisodeParquet(files, folderPath, episodeKey) {
+  const episodeIdx = episodeKey.replace('episode_', '');
+  return files.find(file =>
+    file.folderPath.startsWith(folderPath) &&
+    file.originalName === `episode_${episodeIdx}.parquet` &&
+    fs.existsSync(file.path)
+  );
+}
+
+// 构建 episode 序号 -> 相机视频路径的映射
+function buildVideoMap(parquetFiles, videoFiles) {
+  const videoMap = {};
+  parquetFiles.forEach(parquet => {
+    const episodeIdx = parquet.originalName.split('_')[1].split('.')[0];
+    const baseFolder = parquet.folderPath.split('/')[0];
+    const videoPaths = getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles);
+    if (Object.keys(videoPaths).length > 0) {
+      videoMap[episodeIdx] = videoPaths;
+    }
+  });
+  return videoMap;
+}
+
 // LeRobot 解析路由 - 兼容原有API，返回完整数据
 router.post('/parse', authenticateToken, checkPermission('data'), async (req, res) => {
   try {
     let { folderPath, quality = 'medium' } = req.body;
-    console.log('收到 /api/lerobot/parse 请求:', { folderPath, quality });
+    const reduction = parseReduction(req.body.reduction);
+    console.log('收到 /api/lerobot/parse 请求:', { folderPath, quality, reduction });
 
     if (!folderPath) {
       return res.status(400).json({ success: false, message: 'folderPath 是必需的' });
     }
+    if (!reduction) {
+      return res.status(400).json({ success: false, message: `reduction 必须是 ${REDUCTION_MODES.join('/')}` });
+    }
+    const cacheQuality = episodeCacheQuality(quality, reduction);
 
     // 检查是否所有episodes都已缓存
     const files = await File.findAll();
-    const filteredFiles = files.filter(file => {
-      // 排除以 images 开头的文件夹中的文件
-      const pathParts = file.folderPath.split('/');
-      const hasImagesFolder = pathParts.some(part => part.toLowerCase().startsWith('images'));
-      return file.folderPath.startsWith(folderPath) && !hasImagesFolder;
-    });
-    const parquetFiles = filteredFiles.filter(file =>
-      /^episode_\d{6}\.parquet$/.test(file.originalName) &&
-      fs.existsSync(file.path)
-    );
+    const parquetFiles = findParquetFiles(files, folderPath);
 
     if (parquetFiles.length === 0) {
       console.log('未找到 Parquet 文件:', folderPath);
       return res.status(404).json({ success: false, message: `未找到 ${folderPath} 的有效 Parquet 文件` });
     }
 
-    // 检查缓存状态（基于质量级别）
-    const allCached = parquetFiles.every(parquet => {
-      const episodeIdx = parquet.originalName.split('_')[1].split('.')[0];
-      const episodeKey = `episode_${episodeIdx}`;
-      return hasEpisodeCache(folderPath, episodeKey, quality);
-    });
-
-    if (allCached) {
-      console.log(`所有episodes已缓存 (${quality})，从缓存读取`);
-      const episodes = [];
-      for (const parquet of parquetFiles) {
-        const episodeIdx = parquet.originalName.split('_')[1].split('.')[0];
-        const episodeKey = `episode_${episodeIdx}`;
-        const cachedEpisode = await getEpisodeCache(folderPath, episodeKey, quality);
-        if (cachedEpisode) {
-          console.log(`从缓存读取episode: ${episodeKey}, 点云数据:`, {
-            cam_top_length: cachedEpisode.pointcloud_data?.cam_top?.length || 0,
-            cam_right_wrist_length: cachedEpisode.pointcloud_data?.cam_right_wrist?.length || 0
-          });
-          episodes.push(cachedEpisode);
-        }
-      }
-
-      if (episodes.length > 0) {
-        console.log(`从缓存返回 ${episodes.length} 个episodes`);
-        return res.json({ success: true, data: episodes });
+    // 增量解析：源文件变化或已删除的episode先清除缓存，未变化的episode继续使用缓存
+    await syncEpisodeSources(folderPath, parquetFiles);
+
+    // 已缓存的episode直接读取（该质量级别的缓存，或从 LOD 缓存切片），其余的一次解析
+    const cachedEpisodes = {};
+    const uncachedFiles = [];
+    for (const parquet of parquetFiles) {
+      const episodeKey = parquet.originalName.replace('.parquet', '');
+      const cachedEpisode = hasEpisodeForQuality(folderPath, episodeKey, quality, cacheQuality)
+        ? await getEpisodeForQuality(folderPath, episodeKey, quality, cacheQuality)
+        : null;
+      if (cachedEpisode) {
+        console.log(`从缓存读取episode: ${episodeKey}, 点云数据:`, {
+          cam_top_length: cachedEpisode.pointcloud_data?.cam_top?.length || 0,
+          cam_right_wrist_length: cachedEpisode.pointcloud_data?.cam_right_wrist?.length || 0
+        });
+        cachedEpisodes[episodeKey] = cachedEpisode;
       } else {
-        console.log('缓存中没有找到有效的episode数据，重新解析');
+        uncachedFiles.push(parquet);
       }
     }
 
-    // 如果没有完全缓存，则解析所有数据
-    console.log('开始解析所有episodes...');
+    if (uncachedFiles.length === 0) {
+      console.log(`所有episodes已缓存 (${quality})，从缓存返回 ${parquetFiles.length} 个episodes`);
+      return res.json({ success: true, data: parquetFiles.map(parquet => cachedEpisodes[parquet.originalName.replace('.parquet', '')]) });
+    }
+
+    // 解析未缓存的episodes：random 一次解析得到 LOD 数据，切换质量时只需从缓存切片；voxel / fps 按请求的质量级别解析
+    console.log(`开始解析 ${uncachedFiles.length} 个未缓存的episodes...`);
     const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
-    const episodes = [];
 
-    // 使用原来的批量解析方式以保证数据完整性
-    const filePaths = parquetFiles.map(file => `${file.path}:${file.originalName}`);
+    const filePaths = uncachedFiles.map(file => `${file.path}:${file.originalName}`);
     console.log('找到的 Parquet 文件:', filePaths);
 
-    const pythonScript = path.join(__dirname, '../parse_lerobot.py');
-    const args = ['--files', ...filePaths, '--folderPath', folderPath, '--quality', quality];
-    console.log('执行命令: python3', [pythonScript, ...args].join(' '));
+    console.log('提交解析请求到 parse_lerobot 常驻进程, quality:', quality, 'cache:', cacheQuality);
+
+    let parsedEpisodes = [];
+    try {
+      const jsonData = await parseLerobot({ files: filePaths, folderPath, quality, lod: reductionUsesLod(reduction), reduction, encoding: 'compact' });
+
+      // 检查是否是错误响应
+      if (jsonData && jsonData.error) {
+        console.error('Python脚本返回错误:', jsonData.error);
+        return res.status(500).json({
+          success: false,
+          message: '数据处理失败',
+          error: jsonData.error
+        });
+      }
+
+      // 直接解析数据，不处理分块
+      parsedEpisodes = Array.isArray(jsonData) ? jsonData : jsonData?.episodes || [];
+
+      console.log('解析后的 episodes 数据:');
+      parsedEpisodes.forEach((episode, idx) => {
+        console.log(`Episode ${idx} - Key: ${episode.key}, Frame count: ${episode.frame_count}, Pointcloud data:`, {
+          cam_top_length: episode.pointcloud_data?.cam_top?.length || 0,
+          cam_right_wrist_length: episode.pointcloud_data?.cam_right_wrist?.length || 0,
+          cam_top_sample: episode.pointcloud_data?.cam_top?.[0]?.slice(0, 3) || [],
+          cam_right_wrist_sample: episode.pointcloud_data?.cam_right_wrist?.[0]?.slice(0, 3) || []
+        });
+      });
+    } catch (parseError) {
+      console.error('Python 解析失败:', parseError);
+      return res.status(500).json({ success: false, message: '解析数据集失败', error: parseError.message });
+    }
+
+    // 添加视频路径映射
+    const videoMap = buildVideoMap(uncachedFiles, videoFiles);
+
+    // 缓存解析结果，LOD 数据再切出请求的质量级别
+    console.log(`开始缓存解析的episodes (${cacheQuality})...`);
+    for (const episode of parsedEpisodes) {
+      const episodeIdx = episode.key.replace('episode_', '');
+      episode.video_paths = videoMap[episodeIdx] || {};
+      try {
+        await setEpisodeCache(folderPath, episode, cacheQuality);
+        console.log(`缓存完成 (${cacheQuality}):`, episode.key);
+      } catch (error) {
+        console.warn('缓存失败:', episode.key, error.message);
+      }
+      cachedEpisodes[episode.key] = sliceEpisodeForQuality(episode, quality);
+    }
 
-    const pythonProcess = spawn('python3', [pythonScript, ...args], {
-      stdio: ['pipe', 'pipe', 'pipe'],
-      maxBuffer: 1024 * 1024 * 1024 // 1GB buffer
+    const finalEpisodes = parquetFiles
+      .map(parquet => cachedEpisodes[parquet.originalName.replace('.parquet', '')])
+      .filter(Boolean);
+
+    console.log('最终返回的 episodes 数据:', {
+      episodeCount: finalEpisodes.length,
+      sample: finalEpisodes[0] ? {
+        key: finalEpisodes[0].key,
+        frame_count: finalEpisodes[0].frame_count,
+        pointcloud_data: {
+          cam_top_length: finalEpisodes[0].pointcloud_data?.cam_top?.length || 0,
+          cam_right_wrist_length: finalEpisodes[0].pointcloud_data?.cam_right_wrist?.length || 0
+        }
+      } : {}
     });
 
-    const stdoutChunks = [];
-    const stderrChunks = [];
-    let totalSize = 0;
+    // 直接返回数据
+    res.json({ success: true, data: finalEpisodes });
+  } catch (error) {
+    console.error('LeRobot 解析错误:', error);
+    res.status(500).json({ success: false, message: '解析数据集失败', error: error.message });
+  }
+});
+
+// LeRobot episode 列表 - 只读取 parquet footer 建立的清单（未变化的文件直接复用），不解析数据
+router.post('/manifest', authenticateToken, checkPermission('data'), async (req, res) => {
+  try {
+    const { folderPath } = req.body;
+    console.log('收到 /api/lerobot/manifest 请求:', { folderPath });
 
-    pythonProcess.stdout.on('data', (data) => {
-      stdoutChunks.push(data);
-      totalSize += data.length;
-      console.log(`接收数据块: ${data.length} bytes, 总计: ${(totalSize / 1024 / 1024).toFixed(2)} MB`);
+    if (!folderPath) {
+      return res.status(400).json({ success: false, message: 'folderPath 是必需的' });
+    }
+
+    const files = await File.findAll();
+    const parquetFiles = findParquetFiles(files, folderPath);
+    if (parquetFiles.length === 0) {
+      return res.status(404).json({ success: false, message: `未找到 ${folderPath} 的有效 Parquet 文件` });
+    }
+
+    const entries = await parseLerobot({
+      files: parquetFiles.map(file => `${file.path}:${file.originalName}`),
+      folderPath,
+      manifest: true
     });
 
-    pythonProcess.stderr.on('data', (data) => {
-      stderrChunks.push(data);
-      console.log('Python 脚本 stderr:', data.toString());
+    const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
+    const videoMap = buildVideoMap(parquetFiles, videoFiles);
+    const episodes = entries.map(entry => ({
+      key: entry.key,
+      index: entry.episode_index,
+      frame_count: entry.num_rows,
+      columns: entry.columns,
+      timestamp_range: [entry.timestamp_min, entry.timestamp_max],
+      video_duration: entry.video_duration,
+      video_paths: videoMap[entry.original_name.split('_')[1]?.split('.')[0]] || {},
+      has_pointcloud: entry.has_pointcloud
+    }));
+
+    console.log(`清单返回 ${episodes.length} 个episodes`);
+    res.json({ success: true, data: episodes });
+  } catch (error) {
+    console.error('LeRobot 清单错误:', error);
+    res.status(500).json({ success: false, message: '获取episode列表失败', error: error.message });
+  }
+});
+
+// 相机视频预览 - 为每个 episode 的每个相机生成低分辨率 sprite sheet 与时间戳映射（格式见 server/lerobot_preview.py）
+// 结果按视频内容哈希缓存，已生成的预览直接返回；sheet 图片通过 GET /preview/:key/:sheet 获取
+router.post('/previews', authenticateToken, checkPermission('data'), async (req, res) => {
+  try {
+    const { folderPath, mode = 'interval', interval = null } = req.body;
+    console.log('收到 /api/lerobot/previews 请求:', { folderPath, mode, interval });
+
+    if (!folderPath) {
+      return res.status(400).json({ success: false, message: 'folderPath 是必需的' });
+    }
+    if (!['interval', 'keyframe'].includes(mode) || (interval !== null && !(Number(interval) > 0))) {
+      return res.status(400).json({ success: false, message: 'mode 必须是 interval/keyframe，interval 必须是正数' });
+    }
+
+    const files = await File.findAll();
+    const parquetFiles = findParquetFiles(files, folderPath);
+    if (parquetFiles.length === 0) {
+      return res.status(404).json({ success: false, message: `未找到 ${folderPath} 的有效 Parquet 文件` });
+    }
+
+    const results = await parseLerobot({
+      files: parquetFiles.map(file => `${file.path}:${file.originalName}`),
+      folderPath,
+      previews: { mode, interval: interval === null ? null : Number(interval) }
     });
 
-    pythonProcess.on('close', async (code) => {
-      if (code !== 0) {
-        const stderrData = Buffer.concat(stderrChunks).toString();
-        console.error('Python 脚本退出，代码:', code, 'stderr:', stderrData);
-        return res.status(500).json({ success: false, message: '解析数据集失败', error: stderrData });
+    const episodes = results.map(result => {
+      const previews = {};
+      for (const [camera, preview] of Object.entries(result.previews)) {
+        previews[camera] = preview && {
+          ...preview,
+          sheets: preview.sheets.map(sheet => `/api/lerobot/preview/${preview.key}/${sheet}`)
+        };
       }
+      return { key: result.key, previews };
+    });
 
-      let parsedEpisodes = [];
-      try {
-        const stdoutData = Buffer.concat(stdoutChunks).toString();
-        console.log(`合并数据完成，总大小: ${(stdoutData.length / 1024 / 1024).toFixed(2)} MB`);
-        const jsonData = JSON.parse(stdoutData || '[]');
-
-        // 检查是否是错误响应
-        if (jsonData.error) {
-          console.error('Python脚本返回错误:', jsonData.error);
-          return res.status(500).json({
-            success: false,
-            message: '数据处理失败',
-            error: jsonData.error
-          });
-        }
+    console.log(`预览返回 ${episodes.length} 个episodes`);
+    res.json({ success: true, data: episodes });
+  } catch (error) {
+    console.error('LeRobot 预览错误:', error);
+    res.status(500).json({ success: false, message: '生成视频预览失败', error: error.message });
+  }
+});
 
-        // 直接解析数据，不处理分块
-        parsedEpisodes = Array.isArray(jsonData) ? jsonData : jsonData.episodes || [];
+// 预览 sheet 图片，路径按内容寻址，内容不会变化
+router.get('/preview/:key/:sheet', authenticateToken, checkPermission('data'), (req, res) => {
+  const { key, sheet } = req.params;
+  if (!/^[0-9a-f]{40}$/.test(key) || !/^sheet_\d{3,}\.jpg$/.test(sheet)) {
+    return res.status(400).json({ success: false, message: '无效的预览路径' });
+  }
+  const file = path.resolve(config.LEROBOT_PREVIEW_DIR, key.slice(0, 2), key, sheet);
+  if (!fs.existsSync(file)) {
+    return res.status(404).json({ success: false, message: '预览不存在' });
+  }
+  res.set('Cache-Control', 'private, max-age=31536000, immutable');
+  res.sendFile(file);
+});
 
-        console.log('解析后的 episodes 数据:');
-        parsedEpisodes.forEach((episode, idx) => {
-          console.log(`Episode ${idx} - Key: ${episode.key}, Frame count: ${episode.frame_count}, Pointcloud data:`, {
-            cam_top_length: episode.pointcloud_data?.cam_top?.length || 0,
-            cam_right_wrist_length: episode.pointcloud_data?.cam_right_wrist?.length || 0,
-            cam_top_sample: episode.pointcloud_data?.cam_top?.[0]?.slice(0, 3) || [],
-            cam_right_wrist_sample: episode.pointcloud_data?.cam_right_wrist?.[0]?.slice(0, 3) || []
-          });
-        });
-      } catch (parseError) {
-        console.error('JSON 解析错误:', parseError);
-        return res.status(500).json({ success: false, message: 'JSON 解析失败', error: parseError.message });
-      }
+// 解析性能指标（需要设置 LEROBOT_PROFILE=true），各阶段耗时来自 parse_lerobot.py 的 profile 记录
+router.get('/metrics', authenticateToken, checkPermission('data'), (req, res) => {
+  res.json({ success: true, data: getParseMetrics() });
+});
 
-      // 添加视频路径映射
-      const videoMap = {};
-      parquetFiles.forEach(parquet => {
-        const episodeIdx = parquet.originalName.split('_')[1].split('.')[0];
-        const baseFolder = parquet.folderPath.split('/')[0];
-
-        const matchingVideos = videoFiles.filter(file =>
-          file.originalName === `episode_${episodeIdx}.mp4` &&
-          file.folderPath.startsWith(baseFolder)
-        );
-
-        if (matchingVideos.length > 0) {
-          videoMap[episodeIdx] = {};
-          matchingVideos.forEach(file => {
-            const cameraPath = file.folderPath.split('/').pop();
-            const cameraName = cameraPath.replace('observation.images.', 'cam_');
-            videoMap[episodeIdx][cameraName] = `/Uploads/${file.fileName}`;
-          });
-        }
-      });
+// LeRobot 流式解析路由 - 以 NDJSON 逐条返回 episode，已缓存的 episode 立即返回，其余解析完成一个返回一个
+router.post('/parse/stream', authenticateToken, checkPermission('data'), async (req, res) => {
+  try {
+    const { folderPath, quality = 'medium', chunkFrames = null } = req.body;
+    const reduction = parseReduction(req.body.reduction);
+    console.log('收到 /api/lerobot/parse/stream 请求:', { folderPath, quality, chunkFrames, reduction });
 
-      const finalEpisodes = parsedEpisodes.map(episode => {
-        const episodeIdx = episode.key.replace('episode_', '');
-        return {
-          ...episode,
-          video_paths: videoMap[episodeIdx] || {}
-        };
-      });
+    if (!folderPath) {
+      return res.status(400).json({ success: false, message: 'folderPath 是必需的' });
+    }
+    if (!reduction) {
+      return res.status(400).json({ success: false, message: `reduction 必须是 ${REDUCTION_MODES.join('/')}` });
+    }
+    const cacheQuality = episodeCacheQuality(quality, reduction);
 
-      // 缓存所有episodes（按质量级别）
-      console.log(`开始缓存所有episodes (${quality})...`);
-      for (const episode of finalEpisodes) {
-        try {
-          await setEpisodeCache(folderPath, episode, quality);
-          console.log(`缓存完成 (${quality}):`, episode.key);
-        } catch (error) {
-          console.warn('缓存失败:', episode.key, error.message);
-        }
+    const files = await File.findAll();
+    const parquetFiles = findParquetFiles(files, folderPath);
+    if (parquetFiles.length === 0) {
+      return res.status(404).json({ success: false, message: `未找到 ${folderPath} 的有效 Parquet 文件` });
+    }
+
+    await syncEpisodeSources(folderPath, parquetFiles);
+
+    const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
+    const videoMap = buildVideoMap(parquetFiles, videoFiles);
+
+    res.setHeader('Content-Type', 'application/x-ndjson; charset=utf-8');
+    res.setHeader('Cache-Control', 'no-cache');
+    const writeRecord = (record) => res.write(JSON.stringify(record) + '\n');
+
+    // 先返回已缓存的 episodes
+    const uncachedFiles = [];
+    for (const parquet of parquetFiles) {
+      const episodeKey = parquet.originalName.replace('.parquet', '');
+      const cachedEpisode = hasEpisodeForQuality(folderPath, episodeKey, quality, cacheQuality)
+        ? await getEpisodeForQuality(folderPath, episodeKey, quality, cacheQuality)
+        : null;
+      if (cachedEpisode) {
+        writeRecord({ type: 'episode', data: cachedEpisode, source: 'cache' });
+      } else {
+        uncachedFiles.push(parquet);
       }
+    }
+    console.log(`流式解析: ${parquetFiles.length - uncachedFiles.length} 个来自缓存, ${uncachedFiles.length} 个需要解析`);
 
-      console.log('最终返回的 episodes 数据:', {
-        episodeCount: finalEpisodes.length,
-        sample: finalEpisodes[0] ? {
-          key: finalEpisodes[0].key,
-          frame_count: finalEpisodes[0].frame_count,
-          pointcloud_data: {
-            cam_top_length: finalEpisodes[0].pointcloud_data?.cam_top?.length || 0,
-            cam_right_wrist_length: finalEpisodes[0].pointcloud_data?.cam_right_wrist?.length || 0
-          }
-        } : {}
-      });
+    if (uncachedFiles.length === 0) {
+      writeRecord({ type: 'done', episodes: parquetFiles.length, failed: 0 });
+      return res.end();
+    }
 
-      // 直接返回数据
-      res.json({ success: true, data: finalEpisodes });
+    await parseLerobotStream({
+      files: uncachedFiles.map(file => `${file.path}:${file.originalName}`),
+      folderPath,
+      quality,
+      chunkFrames,
+      // 整个 episode 输出时解析并缓存（random 为 LOD 数据，返回前切出请求的质量级别）
+      lod: !chunkFrames && reductionUsesLod(reduction),
+      reduction,
+      encoding: chunkFrames ? null : 'compact',
+      onRecord: (record) => {
+        const episodeKey = record.type === 'episode' || record.type === 'episode_start' ? record.data.key : null;
+        if (episodeKey) {
+          record.data.video_paths = videoMap[episodeKey.replace('episode_', '')] || {};
+        }
+        // 只缓存完整 episode 记录，分块输出时不缓存
+        if (record.type === 'episode') {
+          setEpisodeCache(folderPath, record.data, cacheQuality).catch(error => {
+            console.warn('缓存失败:', record.data.key, error.message);
+          });
+          record = { ...record, data: sliceEpisodeForQuality(record.data, quality) };
+        }
+        writeRecord(record);
+      }
     });
+    res.end();
   } catch (error) {
-    console.error('LeRobot 解析错误:', error);
-    res.status(500).json({ success: false, message: '解析数据集失败', error: error.message });
+    console.error('LeRobot 流式解析错误:', error);
+    if (res.headersSent) {
+      res.write(JSON.stringify({ type: 'error', error: error.message }) + '\n');
+      res.end();
+    } else {
+      res.status(500).json({ success: false, message: '解析数据集失败', error: error.message });
+    }
   }
 });
 
@@ -291,10 +467,23 @@ router.get('/episode/:folderPath/:episodeKey', authenticateToken, checkPermissio
   try {
     const { folderPath, episodeKey } = req.params;
     const { quality = 'medium' } = req.query;
-    console.log('收到获取episode请求:', { folderPath, episodeKey, quality });
+    const reduction = parseReduction(req.query.reduction);
+    console.log('收到获取episode请求:', { folderPath, episodeKey, quality, reduction });
+    if (!reduction) {
+      return res.status(400).json({ success: false, message: `reduction 必须是 ${REDUCTION_MODES.join('/')}` });
+    }
+    const cacheQuality = episodeCacheQuality(quality, reduction);
+
+    const files = await File.findAll();
+    const episodeIdx = episodeKey.replace('episode_', '');
+    const parquetFile = findEpisodeParquet(files, folderPath, episodeKey);
+    if (!parquetFile) {
+      return res.status(404).json({ success: false, message: `未找到episode文件: ${episodeKey}` });
+    }
 
-    // 先尝试从缓存获取（使用正确的质量参数）
-    const cachedEpisode = await getEpisodeCache(folderPath, episodeKey, quality);
+    // 源文件变化时先清除该 episode 的缓存，再尝试从缓存获取（该质量级别的缓存，或从 LOD 缓存切片）
+    await syncEpisodeSource(folderPath, parquetFile);
+    const cachedEpisode = await getEpisodeForQuality(folderPath, episodeKey, quality, cacheQuality);
     if (cachedEpisode) {
       console.log(`从episode缓存读取 (${quality}):`, episodeKey, {
         cam_top_length: cachedEpisode.pointcloud_data?.cam_top?.length || 0,
@@ -304,33 +493,22 @@ router.get('/episode/:folderPath/:episodeKey', authenticateToken, checkPermissio
     }
 
     // 缓存中没有，需要解析
-    const files = await File.findAll();
-    const filteredFiles = files.filter(file => file.folderPath.startsWith(folderPath));
-    const episodeIdx = episodeKey.replace('episode_', '');
-    const parquetFile = filteredFiles.find(file =>
-      file.originalName === `episode_${episodeIdx}.parquet` &&
-      fs.existsSync(file.path)
-    );
-
-    if (!parquetFile) {
-      return res.status(404).json({ success: false, message: `未找到episode文件: ${episodeKey}` });
-    }
-
     console.log('开始解析episode:', episodeKey);
 
     try {
-      const episode = await parseEpisodeWithPython(parquetFile.path, parquetFile.originalName, folderPath);
-      if (!episode) {
+      const lodEpisode = await parseEpisodeWithPython(parquetFile.path, parquetFile.originalName, folderPath, quality, reduction);
+      if (!lodEpisode) {
         return res.status(500).json({ success: false, message: '解析episode失败' });
       }
 
       // 添加视频路径
       const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
       const baseFolder = parquetFile.folderPath.split('/')[0];
-      episode.video_paths = getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles);
+      lodEpisode.video_paths = getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles);
 
-      // 缓存解析结果（使用正确的质量参数）
-      await setEpisodeCache(folderPath, episode, quality);
+      // 缓存解析结果，LOD 数据之后切换质量级别只需切片
+      await setEpisodeCache(folderPath, lodEpisode, cacheQuality);
+      const episode = sliceEpisodeForQuality(lodEpisode, quality);
 
       console.log('episode解析完成:', {
         key: episode.key,
@@ -357,10 +535,23 @@ router.get('/pointcloud/:folderPath/:episodeKey', authenticateToken, checkPermis
   try {
     const { folderPath, episodeKey } = req.params;
     const { quality = 'medium' } = req.query;
-    console.log('收到获取点云数据请求:', { folderPath, episodeKey, quality });
+    const reduction = parseReduction(req.query.reduction);
+    console.log('收到获取点云数据请求:', { folderPath, episodeKey, quality, reduction });
+    if (!reduction) {
+      return res.status(400).json({ success: false, message: `reduction 必须是 ${REDUCTION_MODES.join('/')}` });
+    }
+    const cacheQuality = episodeCacheQuality(quality, reduction);
+
+    const files = await File.findAll();
+    const episodeIdx = episodeKey.replace('episode_', '');
+    const parquetFile = findEpisodeParquet(files, folderPath, episodeKey);
+    if (!parquetFile) {
+      return res.status(404).json({ success: false, message: `未找到episode文件: ${episodeKey}` });
+    }
 
-    // 先尝试从缓存获取完整episode数据
-    const cachedEpisode = await getEpisodeCache(folderPath, episodeKey, quality);
+    // 源文件变化时先清除该 episode 的缓存，再尝试从缓存获取完整episode数据（该质量级别的缓存，或从 LOD 缓存切片）
+    await syncEpisodeSource(folderPath, parquetFile);
+    const cachedEpisode = await getEpisodeForQuality(folderPath, episodeKey, quality, cacheQuality);
     if (cachedEpisode && cachedEpisode.pointcloud_data) {
       console.log(`从缓存读取点云数据 (${quality}):`, episodeKey, {
         cam_top_length: cachedEpisode.pointcloud_data?.cam_top?.length || 0,
@@ -378,88 +569,168 @@ router.get('/pointcloud/:folderPath/:episodeKey', authenticateToken, checkPermis
     }
 
     // 缓存中没有，需要解析
-    const files = await File.findAll();
-    const filteredFiles = files.filter(file => file.folderPath.startsWith(folderPath));
-    const episodeIdx = episodeKey.replace('episode_', '');
-    const parquetFile = filteredFiles.find(file =>
-      file.originalName === `episode_${episodeIdx}.parquet` &&
-      fs.existsSync(file.path)
-    );
-
-    if (!parquetFile) {
-      return res.status(404).json({ success: false, message: `未找到episode文件: ${episodeKey}` });
-    }
-
     console.log('开始解析点云数据:', episodeKey, 'quality:', quality);
 
-    // 使用Python脚本解析点云数据
-    const pythonScript = path.join(__dirname, '../parse_lerobot.py');
-    const args = [
-      '--files', `${parquetFile.path}:${parquetFile.originalName}`,
-      '--folderPath', folderPath,
-      '--quality', quality
-    ];
-
-    const pythonProcess = spawn('python3', [pythonScript, ...args]);
-    let stdoutData = '';
-    let stderrData = '';
+    try {
+      // 通过 parse_lerobot 常驻进程解析点云数据
+      const lodEpisode = await parseEpisodeWithPython(parquetFile.path, parquetFile.originalName, folderPath, quality, reduction);
 
-    pythonProcess.stdout.on('data', (data) => {
-      stdoutData += data.toString();
-    });
+      if (!lodEpisode || !lodEpisode.pointcloud_data) {
+        return res.status(500).json({ success: false, message: '未找到点云数据' });
+      }
 
-    pythonProcess.stderr.on('data', (data) => {
-      stderrData += data.toString();
-    });
+      // 添加视频路径等基础信息
+      const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
+      const baseFolder = parquetFile.folderPath.split('/')[0];
+      lodEpisode.video_paths = getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles);
 
-    pythonProcess.on('close', async (code) => {
-      if (code !== 0) {
-        console.error('Python脚本执行失败:', stderrData);
-        return res.status(500).json({ success: false, message: '解析点云数据失败', error: stderrData });
-      }
+      // 缓存解析结果，LOD 数据之后切换质量级别只需切片
+      await setEpisodeCache(folderPath, lodEpisode, cacheQuality);
+      const episode = sliceEpisodeForQuality(lodEpisode, quality);
 
-      try {
-        const episodes = JSON.parse(stdoutData || '[]');
-        const episode = episodes[0];
+      console.log('点云数据解析完成:', {
+        key: episode.key,
+        quality,
+        pointcloud_data: {
+          cam_top_length: episode.pointcloud_data?.cam_top?.length || 0,
+          cam_right_wrist_length: episode.pointcloud_data?.cam_right_wrist?.length || 0
+        }
+      });
 
-        if (!episode || !episode.pointcloud_data) {
-          return res.status(500).json({ success: false, message: '未找到点云数据' });
+      res.json({
+        success: true,
+        data: {
+          episodeKey,
+          quality,
+          pointcloud_data: episode.pointcloud_data,
+          source: 'parsed'
         }
+      });
+    } catch (error) {
+      console.error('解析点云数据失败:', error);
+      res.status(500).json({ success: false, message: '解析点云数据失败', error: error.message });
+    }
+  } catch (error) {
+    console.error('获取点云数据错误:', error);
+    res.status(500).json({ success: false, message: '获取点云数据失败', error: error.message });
+  }
+});
 
-        // 添加视频路径等基础信息
-        const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
-        const baseFolder = parquetFile.folderPath.split('/')[0];
-        episode.video_paths = getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles);
+// 电机曲线包络（见 server/lerobot_envelope.py）：按缩放级别 level（0 最粗）和时间窗口 [startTime, endTime] 返回每个桶的 min/max
+// 包络与点云降采样方式无关，保存在 random 降采样的 LOD 缓存中，缓存不存在（或是没有包络的旧缓存）时先解析 LOD 数据
+router.get('/motors/:folderPath/:episodeKey', authenticateToken, checkPermission('data'), async (req, res) => {
+  try {
+    const { folderPath, episodeKey } = req.params;
+    const toNumber = (value) => (value === undefined || value === '' ? null : Number(value));
+    const level = toNumber(req.query.level) ?? 0;
+    const startTime = toNumber(req.query.startTime);
+    const endTime = toNumber(req.query.endTime);
+    console.log('收到获取电机包络请求:', { folderPath, episodeKey, level, startTime, endTime });
+    if (!Number.isInteger(level) || level < 0 || [startTime, endTime].some(value => Number.isNaN(value))) {
+      return res.status(400).json({ success: false, message: 'level 必须是非负整数，startTime/endTime 必须是数字' });
+    }
 
-        // 缓存完整的episode数据
-        await setEpisodeCache(folderPath, episode, quality);
+    const files = await File.findAll();
+    const episodeIdx = episodeKey.replace('episode_', '');
+    const parquetFile = findEpisodeParquet(files, folderPath, episodeKey);
+    if (!parquetFile) {
+      return res.status(404).json({ success: false, message: `未找到episode文件: ${episodeKey}` });
+    }
 
-        console.log('点云数据解析完成:', {
-          key: episode.key,
-          quality,
-          pointcloud_data: {
-            cam_top_length: episode.pointcloud_data?.cam_top?.length || 0,
-            cam_right_wrist_length: episode.pointcloud_data?.cam_right_wrist?.length || 0
-          }
-        });
+    // 源文件变化时先清除该 episode 的缓存
+    await syncEpisodeSource(folderPath, parquetFile);
+    let episode = await getLodEpisodeCache(folderPath, episodeKey);
+    let source = 'cache';
+    if (!episode?.motor_envelope) {
+      const lodEpisode = await parseEpisodeWithPython(parquetFile.path, parquetFile.originalName, folderPath, 'full');
+      if (!lodEpisode) {
+        return res.status(500).json({ success: false, message: '解析episode失败' });
+      }
+      const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
+      lodEpisode.video_paths = getVideoPathsForEpisode(episodeIdx, parquetFile.folderPath.split('/')[0], videoFiles);
+      await setEpisodeCache(folderPath, lodEpisode, LOD_QUALITY);
+      episode = decodeCompactEpisode(lodEpisode);
+      source = 'parsed';
+    }
 
-        res.json({
-          success: true,
-          data: {
-            episodeKey,
-            quality,
-            pointcloud_data: episode.pointcloud_data,
-            source: 'parsed'
-          }
-        });
-      } catch (parseError) {
-        console.error('JSON解析错误:', parseError);
-        res.status(500).json({ success: false, message: 'JSON解析失败', error: parseError.message });
+    const envelope = episode.motor_envelope;
+    if (!envelope || level >= envelope.levels.length) {
+      return res.status(400).json({ success: false, message: `level 超出范围（共 ${envelope?.levels.length || 0} 级）` });
+    }
+    res.json({
+      success: true,
+      data: {
+        episodeKey,
+        source_frames: envelope.source_frames,
+        ...envelopeWindow(envelope, level, startTime, endTime),
+        source
       }
     });
   } catch (error) {
-    console.error('获取点云数据错误:', error);
-    res.status(500).json({ success: false, message: '获取点云数据失败', error: error.message });
+    console.error('获取电机包络错误:', error);
+    res.status(500).json({ success: false, message: '获取电机包络失败', error: error.message });
+  }
+});
+
+// 按帧区间获取高精度数据（只读取区间所在的 row group，不抽帧或按 maxFrames 抽帧）
+router.get('/frames/:folderPath/:episodeKey', authenticateToken, checkPermission('data'), async (req, res) => {
+  try {
+    const { folderPath, episodeKey } = req.params;
+    const toNumber = (value) => (value === undefined || value === '' ? null : Number(value));
+    const window = {
+      start_frame: toNumber(req.query.startFrame),
+      end_frame: toNumber(req.query.endFrame),
+      start_time: toNumber(req.query.startTime),
+      end_time: toNumber(req.query.endTime)
+    };
+    const maxFrames = toNumber(req.query.maxFrames);
+    const maxPoints = toNumber(req.query.maxPoints);
+    const voxelSize = toNumber(req.query.voxelSize);
+    const reduction = parseReduction(req.query.reduction);
+    const { encoding = null, bbox = 'frame' } = req.query;
+    console.log('收到帧区间请求:', { folderPath, episodeKey, window, maxFrames, maxPoints, reduction, voxelSize, encoding });
+
+    if ([...Object.values(window), maxFrames, maxPoints, voxelSize].some(value => value !== null && Number.isNaN(value))) {
+      return res.status(400).json({ success: false, message: '帧区间参数必须是数字' });
+    }
+    if (!reduction) {
+      return res.status(400).json({ success: false, message: `reduction 必须是 ${REDUCTION_MODES.join('/')}` });
+    }
+    if (Object.values(window).every(value => value === null)) {
+      return res.status(400).json({ success: false, message: '需要 startFrame/endFrame 或 startTime/endTime' });
+    }
+    if ((encoding && encoding !== 'compact') || !['frame', 'episode'].includes(bbox)) {
+      return res.status(400).json({ success: false, message: 'encoding 只支持 compact，bbox 必须是 frame/episode' });
+    }
+
+    const files = await File.findAll();
+    const episodeIdx = episodeKey.replace('episode_', '');
+    const parquetFile = findEpisodeParquet(files, folderPath, episodeKey);
+    if (!parquetFile) {
+      return res.status(404).json({ success: false, message: `未找到episode文件: ${episodeKey}` });
+    }
+
+    const episode = await parseLerobot({
+      files: [`${parquetFile.path}:${parquetFile.originalName}`],
+      folderPath,
+      maxFrames,
+      maxPoints,
+      window,
+      reduction,
+      voxelSize,
+      encoding,
+      bbox
+    });
+
+    const videoFiles = files.filter(file => file.path.endsWith('.mp4'));
+    const baseFolder = parquetFile.folderPath.split('/')[0];
+    episode.video_paths = getVideoPathsForEpisode(episodeIdx, baseFolder, videoFiles);
+
+    console.log('帧区间解析完成:', { key: episode.key, window: episode.window, frame_count: episode.frame_count });
+    res.json({ success: true, data: episode });
+  } catch (error) {
+    console.error('获取帧区间数据错误:', error);
+    res.status(500).json({ success: false, message: '获取帧区间数据失败', error: error.message });
   }
 });
 
@@ -10,6 +10,8 @@ const gunzip = util.promisify(zlib.gunzip);
 
 // 动态获取缓存目录
 const config = require('../config/environment');
+const { LOD_QUALITY, EPISODE_CACHE_QUALITIES, isLodEpisode, sliceLodEpisode } = require('../utils/lerobotLod');
+const { decodeCompactEpisode } = require('../utils/lerobotCompact');
 
 function getCacheDir() {
   return config.CACHE_DIR;
@@ -17,6 +19,20 @@ function getCacheDir() {
 
 const CACHE_DIR = getCacheDir();
 
+// 最近使用的 LOD episode 保留在内存中，切换质量时无需重新读取和解压缓存文件
+// LOD 缓存文件可以是紧凑编码（见 utils/lerobotCompact.js），内存中保存解码后的数据
+const LOD_MEMORY_LIMIT = 4;
+const lodMemoryCache = new Map();
+
+function rememberLodEpisode(cacheFile, episode) {
+  episode = decodeCompactEpisode(episode);
+  lodMemoryCache.delete(cacheFile);
+  lodMemoryCache.set(cacheFile, episode);
+  while (lodMemoryCache.size > LOD_MEMORY_LIMIT) {
+    lodMemoryCache.delete(lodMemoryCache.keys().next().value);
+  }
+}
+
 // 确保缓存目录存在
 async function ensureCacheDir() {
   try {
@@ -47,6 +63,13 @@ function getEpisodeCacheFilePath(folderPath, episodeKey, quality = 'medium') {
   return path.join(CACHE_DIR, `lerobot_episode_${quality}_${hash}.json.gz`);
 }
 
+// 获取源文件记录路径（每个数据集目录一个）
+function getSourceRecordFilePath(folderPath) {
+  folderPath = normalizeFolderPath(folderPath);
+  const hash = crypto.createHash('md5').update(folderPath).digest('hex');
+  return path.join(CACHE_DIR, `lerobot_sources_${hash}.json`);
+}
+
 // 读取列表缓存（只包含基本信息）
 async function getListCache(folderPath) {
   try {
@@ -117,12 +140,172 @@ async function setEpisodeCache(folderPath, episode, quality = 'medium') {
     const data = Buffer.from(JSON.stringify(episode));
     const compressedData = await gzip(data);
     await fsp.writeFile(cacheFile, compressedData);
+    if (quality === LOD_QUALITY) {
+      rememberLodEpisode(cacheFile, episode);
+    }
     console.log(`✅ 已存储episode缓存 (${quality}):`, episode.key);
   } catch (err) {
     console.warn('❌ 写入episode缓存失败:', err.message);
   }
 }
 
+// 读取 LOD episode（优先使用内存中的副本）
+async function getLodEpisodeCache(folderPath, episodeKey, lodQuality = LOD_QUALITY) {
+  const cacheFile = getEpisodeCacheFilePath(normalizeFolderPath(folderPath), episodeKey, lodQuality);
+  if (lodMemoryCache.has(cacheFile)) {
+    const episode = lodMemoryCache.get(cacheFile);
+    rememberLodEpisode(cacheFile, episode);
+    return episode;
+  }
+  const stored = await getEpisodeCache(folderPath, episodeKey, lodQuality);
+  if (isLodEpisode(stored)) {
+    const episode = decodeCompactEpisode(stored);
+    rememberLodEpisode(cacheFile, episode);
+    return episode;
+  }
+  return null;
+}
+
+// 按质量级别读取episode：优先使用该质量的缓存，否则从 LOD 缓存切片
+// cacheQuality 见 utils/lerobotLod.js episodeCacheQuality：voxel / fps 的数据按质量级别单独缓存，直接读取
+// 缓存文件可以是紧凑编码，返回解码后的数据，与重新解析的结果格式相同
+async function getEpisodeForQuality(folderPath, episodeKey, quality = 'medium', cacheQuality = LOD_QUALITY) {
+  if (cacheQuality !== LOD_QUALITY) {
+    return decodeCompactEpisode(await getEpisodeCache(folderPath, episodeKey, cacheQuality));
+  }
+  if (hasEpisodeCache(folderPath, episodeKey, quality)) {
+    const episode = await getEpisodeCache(folderPath, episodeKey, quality);
+    if (episode) return episode;
+  }
+  const lodEpisode = await getLodEpisodeCache(folderPath, episodeKey);
+  return lodEpisode ? sliceLodEpisode(lodEpisode, quality) : null;
+}
+
+// 检查某个质量级别是否可以直接从缓存得到
+function hasEpisodeForQuality(folderPath, episodeKey, quality = 'medium', cacheQuality = LOD_QUALITY) {
+  if (cacheQuality !== LOD_QUALITY) {
+    return hasEpisodeCache(folderPath, episodeKey, cacheQuality);
+  }
+  return hasEpisodeCache(folderPath, episodeKey, quality) || hasEpisodeCache(folderPath, episodeKey, LOD_QUALITY);
+}
+
+// 源文件记录：episode -> 生成其缓存的 parquet（路径、大小、修改时间），结构为
+// { version, folderPath, episodes: { episode_000001: { path, size, mtimeMs } } }
+const SOURCE_RECORD_VERSION = 1;
+
+async function readSourceRecord(folderPath) {
+  try {
+    const record = JSON.parse(await fsp.readFile(getSourceRecordFilePath(folderPath), 'utf-8'));
+    if (record.version === SOURCE_RECORD_VERSION) return record;
+  } catch (err) {
+    if (err.code !== 'ENOENT') console.warn('❌ 读取源文件记录失败:', err.message);
+  }
+  return { version: SOURCE_RECORD_VERSION, folderPath, episodes: {} };
+}
+
+async function writeSourceRecord(record) {
+  const recordFile = getSourceRecordFilePath(record.folderPath);
+  const tmpFile = `${recordFile}.${process.pid}.tmp`;
+  try {
+    await ensureCacheDir();
+    await fsp.writeFile(tmpFile, JSON.stringify(record));
+    await fsp.rename(tmpFile, recordFile);
+  } catch (err) {
+    console.warn('❌ 写入源文件记录失败:', err.message);
+  }
+}
+
+// 删除早于源文件修改时间的 episode 缓存（没有源文件记录时用来验证已有缓存），返回删除的文件数
+async function deleteStaleEpisodeCache(folderPath, episodeKey, sourceMtimeMs) {
+  let deletedCount = 0;
+  for (const quality of EPISODE_CACHE_QUALITIES) {
+    const cacheFile = getEpisodeCacheFilePath(folderPath, episodeKey, quality);
+    try {
+      if ((await fsp.stat(cacheFile)).mtimeMs >= sourceMtimeMs) continue;
+      await fsp.unlink(cacheFile);
+      lodMemoryCache.delete(cacheFile);
+      deletedCount++;
+      console.log(`✅ 已删除早于源文件的episode缓存 (${quality}):`, path.basename(cacheFile));
+    } catch (err) {
+      if (err.code !== 'ENOENT') console.warn('❌ 检查episode缓存失败:', err.message);
+    }
+  }
+  return deletedCount;
+}
+
+// 对比一个 parquet 文件与记录中的源文件信息，必要时清除该 episode 的缓存，返回 { episodeKey, source, status }
+// status: 'unchanged' | 'added'（记录中没有，已有缓存不早于源文件）| 'changed'（缓存已清除）；文件不存在时返回 null
+async function checkEpisodeSource(folderPath, record, parquet) {
+  const episodeKey = parquet.originalName.replace('.parquet', '');
+  let stat;
+  try {
+    stat = await fsp.stat(parquet.path);
+  } catch (err) {
+    return null;
+  }
+  const source = { path: parquet.path, size: stat.size, mtimeMs: stat.mtimeMs };
+  const previous = record.episodes[episodeKey];
+  if (!previous) {
+    // 记录建立前就存在的缓存：只保留不早于源文件修改时间的缓存
+    const deleted = await deleteStaleEpisodeCache(folderPath, episodeKey, stat.mtimeMs);
+    return { episodeKey, source, status: deleted > 0 ? 'changed' : 'added' };
+  }
+  if (previous.path !== source.path || previous.size !== source.size || previous.mtimeMs !== source.mtimeMs) {
+    await deleteEpisodeCache(folderPath, episodeKey);
+    return { episodeKey, source, status: 'changed' };
+  }
+  return { episodeKey, source, status: 'unchanged' };
+}
+
+// 对比数据集目录当前的 parquet 文件与源文件记录，解析前调用：
+// 源文件变化（路径、大小或修改时间不同）的 episode 清除全部质量级别的缓存，记录中已不存在的 episode 同样清除，
+// 其余缓存保持不变，之后只需解析没有缓存的 episode。没有记录的 episode（新文件或记录建立前的缓存）
+// 只保留修改时间不早于源文件的缓存。
+// 返回 { added, changed, removed }（episode 键名列表）
+async function syncEpisodeSources(folderPath, parquetFiles) {
+  folderPath = normalizeFolderPath(folderPath);
+  const record = await readSourceRecord(folderPath);
+  const episodes = {};
+  const added = [];
+  const changed = [];
+
+  for (const parquet of parquetFiles) {
+    const result = await checkEpisodeSource(folderPath, record, parquet);
+    if (!result) continue;
+    if (result.status === 'added') added.push(result.episodeKey);
+    if (result.status === 'changed') changed.push(result.episodeKey);
+    episodes[result.episodeKey] = result.source;
+  }
+
+  const removed = Object.keys(record.episodes).filter(episodeKey => !episodes[episodeKey]);
+  for (const episodeKey of removed) {
+    await deleteEpisodeCache(folderPath, episodeKey);
+  }
+
+  if (added.length || changed.length || removed.length) {
+    await writeSourceRecord({ version: SOURCE_RECORD_VERSION, folderPath, episodes });
+    console.log(`🔄 源文件变化 ${folderPath}: 新增 ${added.length}, 修改 ${changed.length}, 删除 ${removed.length}`);
+  }
+  return { added, changed, removed };
+}
+
+// 单个 episode 的源文件检查，读取单个 episode 缓存的接口在读缓存前调用（只更新该 episode 的记录）
+// 返回 'unchanged' | 'added' | 'changed'，文件不存在时返回 null
+async function syncEpisodeSource(folderPath, parquet) {
+  folderPath = normalizeFolderPath(folderPath);
+  const record = await readSourceRecord(folderPath);
+  const result = await checkEpisodeSource(folderPath, record, parquet);
+  if (!result) return null;
+  if (result.status !== 'unchanged') {
+    // 写入前重新读取，缩小与其他请求同时更新记录的窗口
+    const latest = await readSourceRecord(folderPath);
+    latest.episodes[result.episodeKey] = result.source;
+    await writeSourceRecord(latest);
+    console.log(`🔄 源文件${result.status === 'changed' ? '已修改' : '已记录'} ${folderPath}: ${result.episodeKey}`);
+  }
+  return result.status;
+}
+
 // 批量写入episode缓存
 async function setEpisodeCacheBatch(folderPath, episodes, quality = 'medium') {
   const promises = episodes.map(episode => setEpisodeCache(folderPath, episode, quality));
@@ -134,6 +317,7 @@ async function deleteCache(folderPath, quality = null) {
   try {
     folderPath = normalizeFolderPath(folderPath);
     console.log(`🧹 开始清理缓存: folderPath="${folderPath}", quality="${quality || 'all'}"`);
+    lodMemoryCache.clear();
     
     // 删除列表缓存
     const listCacheFile = getListCacheFilePath(folderPath);
@@ -141,6 +325,13 @@ async function deleteCache(folderPath, quality = null) {
       await fsp.unlink(listCacheFile);
       console.log('✅ 已删除列表缓存:', path.basename(listCacheFile));
     }
+
+    // 删除源文件记录
+    const sourceRecordFile = getSourceRecordFilePath(folderPath);
+    if (fs.existsSync(sourceRecordFile)) {
+      await fsp.unlink(sourceRecordFile);
+      console.log('✅ 已删除源文件记录:', path.basename(sourceRecordFile));
+    }
     
     // 删除episode缓存
     const files = await fsp.readdir(CACHE_DIR);
@@ -260,16 +451,17 @@ async function deleteEpisodeCache(folderPath, episodeKey, quality = null) {
       const cacheFile = getEpisodeCacheFilePath(folderPath, episodeKey, quality);
       if (fs.existsSync(cacheFile)) {
         await fsp.unlink(cacheFile);
+        lodMemoryCache.delete(cacheFile);
         deletedCount++;
         console.log(`✅ 已删除episode缓存 (${quality}):`, path.basename(cacheFile));
       }
     } else {
       // 删除所有质量级别的缓存
-      const qualities = ['low', 'medium', 'high', 'full'];
-      for (const q of qualities) {
+      for (const q of EPISODE_CACHE_QUALITIES) {
         const cacheFile = getEpisodeCacheFilePath(folderPath, episodeKey, q);
         if (fs.existsSync(cacheFile)) {
           await fsp.unlink(cacheFile);
+          lodMemoryCache.delete(cacheFile);
           deletedCount++;
           console.log(`✅ 已删除episode缓存 (${q}):`, path.basename(cacheFile));
         }
@@ -303,8 +495,13 @@ module.exports = {
   getEpisodeCache,
   setEpisodeCache,
   setEpisodeCacheBatch,
+  getEpisodeForQuality,
+  getLodEpisodeCache,
+  hasEpisodeForQuality,
   deleteCache,
   deleteEpisodeCache,
   hasEpisodeCache,
+  syncEpisodeSources,
+  syncEpisodeSource,
   cleanupOldCache
 };
\ No newline at end of file
@@ -0,0 +1,300 @@
+const path = require('path');
+const readline = require('readline');
+const { spawn } = require('child_process');
+const config = require('../config/environment');
+
+// parse_lerobot.py 常驻进程（--serve 模式），避免每个请求重复启动 Python 并导入 pandas/pyarrow
+const PYTHON_SCRIPT = path.join(__dirname, '../parse_lerobot.py');
+
+let worker = null;
+let nextRequestId = 1;
+const pendingRequests = new Map();
+
+// 开启 LEROBOT_PROFILE 时，常驻进程为每个 episode 向 stderr 写一行统计记录（格式见 lerobot_profile.py），
+// 这里按阶段汇总为指标，并保留最近的若干条原始记录
+const PROFILE_LINE_PREFIX = '{"type": "profile"';
+const PROFILE_HISTORY = 50;
+const parseMetrics = {
+  since: new Date().toISOString(),
+  episodes: 0,
+  stages: {},
+  counters: {},
+  recent: []
+};
+
+function recordProfile(record) {
+  if (record.scope === 'episode') {
+    parseMetrics.episodes++;
+  }
+  for (const [name, stage] of Object.entries(record.stages || {})) {
+    const metric = parseMetrics.stages[name] || (parseMetrics.stages[name] = {
+      count: 0,
+      total_seconds: 0,
+      max_seconds: 0,
+      max_peak_rss_mb: 0
+    });
+    metric.count++;
+    metric.total_seconds += stage.seconds;
+    metric.max_seconds = Math.max(metric.max_seconds, stage.seconds);
+    metric.max_peak_rss_mb = Math.max(metric.max_peak_rss_mb, stage.peak_rss_mb || 0);
+  }
+  for (const [name, value] of Object.entries(record.counters || {})) {
+    parseMetrics.counters[name] = (parseMetrics.counters[name] || 0) + value;
+  }
+  parseMetrics.recent.push(record);
+  if (parseMetrics.recent.length > PROFILE_HISTORY) {
+    parseMetrics.recent.shift();
+  }
+}
+
+function handleStderrLine(line) {
+  if (line.startsWith(PROFILE_LINE_PREFIX)) {
+    try {
+      recordProfile(JSON.parse(line));
+      return;
+    } catch (err) {
+      console.error('❌ 解析 profile 记录失败:', err.message);
+    }
+  }
+  console.log('Python 脚本 stderr:', line);
+}
+
+/**
+ * 解析性能指标：各阶段的次数、总耗时、平均/最大耗时与峰值内存，以及行数、点数、输出字节数等计数
+ * 只有 LEROBOT_PROFILE=true 时才会收集
+ */
+function getParseMetrics() {
+  const stages = {};
+  for (const [name, metric] of Object.entries(parseMetrics.stages)) {
+    stages[name] = { ...metric, mean_seconds: metric.count ? metric.total_seconds / metric.count : 0 };
+  }
+  return {
+    enabled: config.LEROBOT_PROFILE,
+    since: parseMetrics.since,
+    episodes: parseMetrics.episodes,
+    stages,
+    counters: { ...parseMetrics.counters },
+    recent: [...parseMetrics.recent]
+  };
+}
+
+// 启动常驻解析进程
+function startWorker() {
+  const args = [PYTHON_SCRIPT, '--serve', '--workers', String(config.LEROBOT_WORKERS)];
+  if (config.LEROBOT_WORKER_MEMORY_MB) {
+    args.push('--worker-memory-mb', String(config.LEROBOT_WORKER_MEMORY_MB));
+  }
+  console.log('🐍 启动 parse_lerobot 常驻进程: python3', args.join(' '));
+
+  // 视频探测缓存、派生数组存储、视频预览与 Node 端缓存放在同一目录（见 lerobot_video.py、lerobot_store.py、lerobot_preview.py），
+  // 视频从与 Node 端相同的上传目录查找
+  const env = {
+    ...process.env,
+    CACHE_DIR: path.resolve(config.CACHE_DIR),
+    UPLOADS_PATH: path.resolve(config.UPLOADS_PATH),
+    LEROBOT_STORE_MAX_MB: String(config.LEROBOT_STORE_MAX_MB),
+    LEROBOT_PREVIEW_DIR: path.resolve(config.LEROBOT_PREVIEW_DIR),
+    LEROBOT_PREVIEW_WORKERS: String(config.LEROBOT_PREVIEW_WORKERS)
+  };
+  const proc = spawn('python3', args, { stdio: ['pipe', 'pipe', 'pipe'], env });
+
+  const rl = readline.createInterface({ input: proc.stdout, crlfDelay: Infinity });
+  rl.on('line', (line) => {
+    if (!line) return;
+
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (err) {
+      console.error('❌ parse_lerobot 响应解析失败:', err.message);
+      return;
+    }
+
+    const pending = pendingRequests.get(message.id);
+    if (!pending) {
+      // 已超时的请求的迟到响应也会走到这里
+      console.warn('⚠️ 收到未知请求的响应:', message.id, message.error || '');
+      return;
+    }
+
+    // 流式请求的中间记录，每条记录都重新开始计时
+    if (message.record !== undefined) {
+      armTimeout(message.id, pending);
+      try {
+        pending.onRecord?.(message.record);
+      } catch (err) {
+        console.error('❌ 处理流式记录失败:', err.message);
+      }
+      return;
+    }
+    pendingRequests.delete(message.id);
+    clearTimeout(pending.timer);
+
+    if (message.ok) {
+      pending.resolve(message.done ? undefined : message.result);
+    } else {
+      pending.reject(new Error(message.error || '解析失败'));
+    }
+  });
+
+  // stderr 中既有日志也有 profile 记录，按行处理
+  readline.createInterface({ input: proc.stderr, crlfDelay: Infinity }).on('line', handleStderrLine);
+
+  proc.stdin.on('error', (err) => {
+    console.error('❌ 写入 parse_lerobot 请求失败:', err.message);
+  });
+
+  proc.on('error', (err) => {
+    console.error('❌ parse_lerobot 常驻进程启动失败:', err.message);
+  });
+
+  proc.on('exit', (code, signal) => {
+    console.warn(`⚠️ parse_lerobot 常驻进程退出, code=${code}, signal=${signal}`);
+    if (worker === proc) {
+      worker = null;
+    }
+    // 进程退出时，所有未完成的请求都失败，下一次调用会重新拉起进程
+    for (const [id, pending] of pendingRequests) {
+      clearTimeout(pending.timer);
+      pending.reject(new Error(`Python解析进程已退出 (code=${code}, signal=${signal})`));
+      pendingRequests.delete(id);
+    }
+  });
+
+  return proc;
+}
+
+function getWorker() {
+  if (!worker) {
+    worker = startWorker();
+  }
+  return worker;
+}
+
+// 单个请求等待响应的超时：普通请求从发出起计时，流式请求从最近一条记录起计时。
+// 超时后请求失败，常驻进程之后送达的响应按未知请求忽略，一个丢失的响应不会让路由一直挂起
+function armTimeout(id, pending) {
+  clearTimeout(pending.timer);
+  if (!config.LEROBOT_REQUEST_TIMEOUT_MS) return;
+  pending.timer = setTimeout(() => {
+    if (pendingRequests.get(id) !== pending) return;
+    pendingRequests.delete(id);
+    pending.reject(new Error(`Python解析请求超时 (${config.LEROBOT_REQUEST_TIMEOUT_MS}ms)`));
+  }, config.LEROBOT_REQUEST_TIMEOUT_MS);
+}
+
+// 登记请求并写入常驻进程的 stdin
+function sendRequest(request, pending) {
+  pendingRequests.set(request.id, pending);
+  armTimeout(request.id, pending);
+  try {
+    getWorker().stdin.write(JSON.stringify(request) + '\n');
+  } catch (err) {
+    clearTimeout(pending.timer);
+    pendingRequests.delete(request.id);
+    pending.reject(err);
+  }
+}
+
+// 默认的随机降采样不写入请求，与之前的请求保持相同的合并键
+function setReduction(request, reduction, voxelSize) {
+  if ((reduction && reduction !== 'random') || voxelSize) {
+    request.reduction = reduction;
+    request.voxel_size = voxelSize;
+  }
+}
+
+function setEncoding(request, encoding, bbox) {
+  if (encoding === 'compact') {
+    request.encoding = encoding;
+    request.bbox = bbox;
+  }
+}
+
+function setProfile(request) {
+  if (config.LEROBOT_PROFILE) {
+    request.profile = true;
+  }
+}
+
+/**
+ * 通过常驻进程解析 LeRobot parquet 文件
+ * @param {Object} options
+ * @param {string[]} options.files - `path:originalName` 格式的文件列表
+ * @param {string} options.folderPath - 数据集目录
+ * @param {string} [options.quality] - 质量级别 low/medium/high/full
+ * @param {number} [options.maxFrames] - 每个 episode 最大帧数
+ * @param {number} [options.maxPoints] - 每帧最大点数
+ * @param {boolean} [options.lod] - 输出 LOD episode（各质量级别用 utils/lerobotLod.js 切片得到）
+ * @param {Object} [options.window] - 只解析第一个文件的帧区间 {start_frame, end_frame, start_time, end_time}，结果为单个 episode
+ * @param {boolean} [options.manifest] - 只返回各文件的清单条目（parquet footer 元数据与视频信息），不解析数据
+ * @param {Object} [options.previews] - 只生成各 episode 相机视频的预览 sprite sheet {mode: 'interval'|'keyframe', interval}，不解析数据
+ * @param {string} [options.reduction] - 点云降采样方式 random/voxel/fps
+ * @param {number} [options.voxelSize] - voxel 方式的体素边长（默认按每帧点数自动选择）
+ * @param {string} [options.encoding] - 'compact' 时输出紧凑编码（用 utils/lerobotCompact.js 解码）
+ * @param {string} [options.bbox] - 紧凑编码的点云包围盒 frame/episode
+ * @returns {Promise<Array|Object>} 与命令行模式相同的输出（episodes 数组或 {error, episodes}）
+ */
+function parseLerobot({ files, folderPath, quality = 'medium', maxFrames = null, maxPoints = null, lod = false, window = null, manifest = false, previews = null, reduction = 'random', voxelSize = null, encoding = null, bbox = 'frame' }) {
+  return new Promise((resolve, reject) => {
+    const id = nextRequestId++;
+    const request = {
+      id,
+      files,
+      folderPath,
+      quality,
+      max_frames: maxFrames,
+      max_points: maxPoints,
+      lod
+    };
+    setReduction(request, reduction, voxelSize);
+    setEncoding(request, encoding, bbox);
+    setProfile(request);
+    if (window) {
+      request.window = window;
+    }
+    if (manifest) {
+      request.manifest = true;
+    }
+    if (previews) {
+      request.previews = previews;
+    }
+
+    sendRequest(request, { resolve, reject });
+  });
+}
+
+/**
+ * 流式解析：每个 episode 解析完成后立即通过 onRecord 回调返回（NDJSON 记录，格式见 parse_lerobot.py iter_ndjson_records）
+ * @param {Object} options - 同 parseLerobot，另外支持:
+ * @param {number} [options.chunkFrames] - 按帧数把单个 episode 拆成多条 frames 记录
+ * @param {Function} options.onRecord - 每条记录的回调
+ * @returns {Promise<void>} 所有记录输出完毕后 resolve
+ */
+function parseLerobotStream({ files, folderPath, quality = 'medium', maxFrames = null, maxPoints = null, chunkFrames = null, lod = false, reduction = 'random', voxelSize = null, encoding = null, bbox = 'frame', onRecord }) {
+  return new Promise((resolve, reject) => {
+    const id = nextRequestId++;
+    const request = {
+      id,
+      stream: true,
+      files,
+      folderPath,
+      quality,
+      max_frames: maxFrames,
+      max_points: maxPoints,
+      chunk_frames: chunkFrames,
+      lod
+    };
+    setReduction(request, reduction, voxelSize);
+    setEncoding(request, encoding, bbox);
+    setProfile(request);
+
+    sendRequest(request, { resolve, reject, onRecord });
+  });
+}
+
+module.exports = {
+  parseLerobot,
+  parseLerobotStream,
+  getParseMetrics
+};
@@ -0,0 +1,75 @@
+// parse_lerobot.py --encoding compact 输出的解码（格式与精度保证见 server/lerobot_codec.py）
+// 不依赖 Node 专有 API，浏览器端可直接复用
+
+/**
+ * 判断 episode（或 frames 记录）是否为紧凑编码
+ * @param {Object} episode
+ */
+function isCompactEpisode(episode) {
+  return !!episode?.encoding;
+}
+
+// 整数差分序列的前缀和乘以步长；step 为 null 时数据未编码，原样返回
+function decodeDeltas(deltas, step) {
+  if (step === null || step === undefined) return deltas;
+  let value = 0;
+  return deltas.map(delta => {
+    value += delta;
+    return value * step;
+  });
+}
+
+function decodeMotorDeltas(rows, step) {
+  if (step === null || step === undefined) return rows;
+  const values = rows.length > 0 ? new Array(rows[0].length).fill(0) : [];
+  return rows.map(row => row.map((delta, motor) => {
+    values[motor] += delta;
+    return values[motor] * step;
+  }));
+}
+
+/**
+ * 解码一个相机的点云，返回每帧的 [[x, y, z], ...]
+ * @param {Object} data - { offset, scale, points }
+ * @param {string} bbox - frame / episode
+ */
+function decodePointFrames(data, bbox) {
+  return data.points.map((flat, frameIndex) => {
+    const offset = bbox === 'episode' ? data.offset : data.offset[frameIndex];
+    const scale = bbox === 'episode' ? data.scale : data.scale[frameIndex];
+    const points = new Array(flat.length / 3);
+    for (let i = 0; i < points.length; i++) {
+      points[i] = [
+        (flat[i * 3] + 32768) * scale[0] + offset[0],
+        (flat[i * 3 + 1] + 32768) * scale[1] + offset[1],
+        (flat[i * 3 + 2] + 32768) * scale[2] + offset[2]
+      ];
+    }
+    return points;
+  });
+}
+
+/**
+ * 把紧凑编码的 episode（或 frames 记录）还原为普通格式，未编码的数据原样返回
+ * @param {Object} episode
+ * @returns {Object} 与未编码输出结构相同的 episode
+ */
+function decodeCompactEpisode(episode) {
+  if (!isCompactEpisode(episode)) return episode;
+  const { encoding, ...decoded } = episode;
+  const motorData = episode.motor_data || {};
+  decoded.motor_data = {
+    time: decodeDeltas(motorData.time || [], encoding.time_step),
+    motors: decodeMotorDeltas(motorData.motors || [], encoding.motor_step)
+  };
+  decoded.pointcloud_data = {};
+  for (const [cam, data] of Object.entries(episode.pointcloud_data || {})) {
+    decoded.pointcloud_data[cam] = decodePointFrames(data, encoding.bbox);
+  }
+  return decoded;
+}
+
+module.exports = {
+  isCompactEpisode,
+  decodeCompactEpisode
+};
@@ -0,0 +1,57 @@
+// 电机曲线的多级 min/max 包络（由 parse_lerobot.py 在 LOD 解析时生成，格式见 server/lerobot_envelope.py）
+// 不依赖 Node 专有 API，浏览器端可直接复用
+
+/**
+ * 只保留最粗的级别（episode 响应中使用），level_count 为完整包络的级别数
+ * @param {Object} envelope - motor_envelope
+ */
+function envelopeOverview(envelope) {
+  return {
+    source_frames: envelope.source_frames,
+    level_count: envelope.levels.length,
+    levels: envelope.levels.slice(0, 1)
+  };
+}
+
+// 有序数组中第一个大于 value 的位置
+function upperBound(values, value) {
+  let low = 0;
+  let high = values.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (values[mid] <= value) {
+      low = mid + 1;
+    } else {
+      high = mid;
+    }
+  }
+  return low;
+}
+
+/**
+ * 取某个级别中与 [startTime, endTime] 重叠的桶
+ * @param {Object} envelope - motor_envelope
+ * @param {number} level - 缩放级别，0 为最粗
+ * @param {number|null} [startTime]
+ * @param {number|null} [endTime]
+ * @returns {{level, level_count, bucket_frames, start_bucket, time, min, max}}
+ */
+function envelopeWindow(envelope, level, startTime = null, endTime = null) {
+  const entry = envelope.levels[level];
+  const start = startTime === null ? 0 : Math.max(0, upperBound(entry.time, startTime) - 1);
+  const end = endTime === null ? entry.time.length : upperBound(entry.time, endTime);
+  return {
+    level,
+    level_count: envelope.levels.length,
+    bucket_frames: entry.bucket_frames,
+    start_bucket: start,
+    time: entry.time.slice(start, end),
+    min: entry.min.slice(start, end),
+    max: entry.max.slice(start, end)
+  };
+}
+
+module.exports = {
+  envelopeOverview,
+  envelopeWindow
+};
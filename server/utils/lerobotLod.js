@@ -0,0 +1,92 @@
+// LOD episode 的质量切片（LOD 数据由 parse_lerobot.py --lod 生成，格式见 parse_episode_file）
+// 每帧的点按渐进顺序排列，前 N 个点即为均匀子样本；帧步长为 2 的幂，低质量级别的帧是高质量级别的子集
+// 切片只保留电机包络最粗的级别，更细的级别按时间窗口获取（见 utils/lerobotEnvelope.js）
+
+const { envelopeOverview } = require('./lerobotEnvelope');
+const { sliceVideoSync } = require('./lerobotSync');
+
+const LOD_QUALITY = 'lod';
+
+// 点云降采样方式（parse_lerobot.py --reduction）
+const REDUCTION_MODES = ['random', 'voxel', 'fps'];
+const QUALITY_LEVELS = ['low', 'medium', 'high', 'full'];
+
+/**
+ * 该降采样方式是否可以用 LOD 数据切片：只有 random 的前缀仍是该点数下的随机子样本，
+ * voxel / fps 的前缀不是该点数下的体素网格 / 最远点采样结果，需要按质量级别分别解析
+ * @param {string} [reduction]
+ */
+function reductionUsesLod(reduction = 'random') {
+  return !reduction || reduction === 'random';
+}
+
+/**
+ * episode 的缓存质量名：random 为 LOD 缓存 'lod'，voxel / fps 按质量级别单独缓存（如 'medium_fps'）
+ * @param {string} quality - low/medium/high/full，未知的质量级别按 full 处理（与 parse_lerobot.py 的预设一致）
+ * @param {string} [reduction]
+ */
+function episodeCacheQuality(quality, reduction = 'random') {
+  if (reductionUsesLod(reduction)) return LOD_QUALITY;
+  return `${QUALITY_LEVELS.includes(quality) ? quality : 'full'}_${reduction}`;
+}
+
+// 一个 episode 可能存在的所有缓存质量名（删除 episode 缓存时使用）
+const EPISODE_CACHE_QUALITIES = [
+  ...QUALITY_LEVELS,
+  LOD_QUALITY,
+  ...REDUCTION_MODES.filter(reduction => !reductionUsesLod(reduction)).flatMap(reduction =>
+    QUALITY_LEVELS.map(quality => episodeCacheQuality(quality, reduction))
+  )
+];
+
+/**
+ * 判断 episode 是否为可切片的 LOD episode
+ * @param {Object} episode
+ * @param {string} [quality] - 同时检查是否包含该质量级别
+ */
+function isLodEpisode(episode, quality = null) {
+  const levels = episode?.lod?.levels;
+  if (!levels) return false;
+  return quality ? !!levels[quality] : true;
+}
+
+/**
+ * 从 LOD episode 中切出指定质量级别的数据，结果与按该质量单独解析的格式相同
+ * @param {Object} episode - LOD episode
+ * @param {string} quality - low/medium/high/full
+ * @returns {Object|null} 不支持该质量级别时返回 null
+ */
+function sliceLodEpisode(episode, quality) {
+  if (!isLodEpisode(episode, quality)) return null;
+  const { frame_stride: frameStride, points } = episode.lod.levels[quality];
+  const keepFrame = (_, index) => index % frameStride === 0;
+
+  const { lod, ...sliced } = episode;
+  if (episode.motor_envelope) {
+    sliced.motor_envelope = envelopeOverview(episode.motor_envelope);
+  }
+  const motorData = episode.motor_data || {};
+  sliced.frame_count = Math.ceil(episode.frame_count / frameStride);
+  sliced.motor_data = {
+    time: (motorData.time || []).filter(keepFrame),
+    motors: (motorData.motors || []).filter(keepFrame)
+  };
+  sliced.pointcloud_data = {};
+  for (const [cam, frames] of Object.entries(episode.pointcloud_data || {})) {
+    sliced.pointcloud_data[cam] = frames.filter(keepFrame).map(frame => frame.slice(0, points));
+  }
+  if (episode.video_sync) {
+    sliced.video_sync = sliceVideoSync(episode.video_sync, frameStride);
+  }
+  return sliced;
+}
+
+module.exports = {
+  LOD_QUALITY,
+  REDUCTION_MODES,
+  EPISODE_CACHE_QUALITIES,
+  reductionUsesLod,
+  episodeCacheQuality,
+  isLodEpisode,
+  sliceLodEpisode
+};
@@ -0,0 +1,20 @@
+// 数据帧与相机视频帧的同步索引（由 parse_lerobot.py 生成，格式见 server/lerobot_sync.py）
+// 浏览器端按视频时间查找数据帧的函数见 src/utils/lerobotSync.js
+
+/**
+ * 按帧步长切片（与 LOD 质量切片的帧保持对应）
+ * @param {Object} videoSync - episode.video_sync
+ * @param {number} frameStride
+ */
+function sliceVideoSync(videoSync, frameStride) {
+  const keepFrame = (_, index) => index % frameStride === 0;
+  const sliced = {};
+  for (const [camKey, sync] of Object.entries(videoSync || {})) {
+    sliced[camKey] = { ...sync, frame: sync.frame.filter(keepFrame), pts: sync.pts.filter(keepFrame) };
+  }
+  return sliced;
+}
+
+module.exports = {
+  sliceVideoSync
+};
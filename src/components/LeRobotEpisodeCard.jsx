@@ -7,6 +7,7 @@ import * as THREE from 'three';
 import Plot from 'react-plotly.js';
 import { ErrorBoundary } from 'react-error-boundary';
 import axios from 'axios';
+import { rowForVideoTime } from '../utils/lerobotSync';
 import './LeRobotEpisodeCard.css';
 
 const ErrorFallback = ({ error }) => (
@@ -187,6 +188,8 @@ const CanvasContextHandler = ({ setWebGLContextLost }) => {
 const LeRobotEpisodeCard = ({ episode }) => {
     const { index, folderPath, key, video_paths, motor_data, frame_count, original_frame_count, pointcloud_data } = episode || {};
     const [currentTime, setCurrentTime] = useState(0);
+    // currentTime 来自哪个相机的视频（最近一次上报播放进度的播放器）
+    const [activeCamera, setActiveCamera] = useState(null);
     const [playing, setPlaying] = useState(false);
     const [hovered, setHovered] = useState(false);
     const [webGLContextLost, setWebGLContextLost] = useState(false);
@@ -204,6 +207,7 @@ const LeRobotEpisodeCard = ({ episode }) => {
         if (episode?.key) {
             console.log('🎭 Episode changed, showing skeleton:', episode.key);
             setPointcloudQuality('medium');
+            setActiveCamera(null);
             setPointcloudLoading(false);
             setDataLoading(true);
 
@@ -239,13 +243,23 @@ const LeRobotEpisodeCard = ({ episode }) => {
         });
     }, [playing]);
 
+    // 同步索引（见 server/lerobot_sync.py）：使用 currentTime 所在的相机视频的索引，各相机视频的时长和帧时间可能不同
+    const videoSync = activeCamera ? episode?.video_sync?.[activeCamera] || null : null;
+
+    // 有同步索引时二分查找当前数据帧，否则返回 null，由调用方按比例估算
+    const syncRow = useCallback((rowCount) => {
+        if (!videoSync || videoSync.pts.length !== rowCount) return null;
+        return rowForVideoTime(videoSync, currentTime);
+    }, [videoSync, currentTime]);
+
     const currentFrameData = useMemo(() => {
         if (!motor_data?.motors?.length || videoDuration <= 0) {
             return { time: 0, action: [] };
         }
-        const idx = Math.min(Math.floor((currentTime / videoDuration) * motor_data.motors.length), motor_data.motors.length - 1);
+        const idx = syncRow(motor_data.motors.length) ??
+            Math.min(Math.floor((currentTime / videoDuration) * motor_data.motors.length), motor_data.motors.length - 1);
         return { time: motor_data.time[idx] || 0, action: motor_data.motors[idx] || [] };
-    }, [motor_data, currentTime, videoDuration]);
+    }, [motor_data, currentTime, videoDuration, syncRow]);
 
     const currentDataSource = useMemo(() => {
         return Array.from({ length: 6 }, (_, idx) => ({
@@ -270,7 +284,7 @@ const LeRobotEpisodeCard = ({ episode }) => {
             return { cam_top: [], cam_right_wrist: [] };
         }
         const frameCount = pointcloud_data.cam_top.length;
-        const idx = Math.min(
+        const idx = syncRow(frameCount) ?? Math.min(
             Math.round((currentTime / videoDuration) * (frameCount - 1)),
             frameCount - 1
         );
@@ -284,7 +298,7 @@ const LeRobotEpisodeCard = ({ episode }) => {
             cam_top: camTopPoints,
             cam_right_wrist: camRightWristPoints,
         };
-    }, [isVideoLoaded, pointcloud_data, currentTime, videoDuration]);
+    }, [isVideoLoaded, pointcloud_data, currentTime, videoDuration, syncRow]);
 
     const plotData = useMemo(() => {
         if (!motor_data?.motors?.length || videoDuration <= 0) {
@@ -329,7 +343,8 @@ const LeRobotEpisodeCard = ({ episode }) => {
         };
     }, [currentTime, motor_data, videoDuration]);
 
-    const handleProgress = useCallback((state) => {
+    const handleProgress = useCallback((camera, state) => {
+        setActiveCamera(camera);
         setCurrentTime(state.playedSeconds);
     }, []);
 
@@ -452,7 +467,7 @@ const LeRobotEpisodeCard = ({ episode }) => {
                                                     width="100%"
                                                     height="100%"
                                                     playing={playing}
-                                                    onProgress={handleProgress}
+                                                    onProgress={(state) => handleProgress(camera, state)}
                                                     onDuration={handleDuration}
                                                     progressInterval={100}
                                                     onError={() => {
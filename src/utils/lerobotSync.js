@@ -0,0 +1,24 @@
+// 数据帧与相机视频帧的同步索引（episode.video_sync，由 parse_lerobot.py 生成，格式见 server/lerobot_sync.py）
+
+// 与 lerobot_sync.SYNC_TOLERANCE 相同，避免恰好落在帧边界上的时间被分到前一帧
+const SYNC_TOLERANCE = 1e-6;
+
+/**
+ * 视频时间对应的数据帧下标：显示时间不晚于该时间的最后一个数据帧（pts 单调不减，二分查找）
+ * @param {Object} sync - video_sync[camKey]
+ * @param {number} time - 视频时间（秒）
+ */
+export function rowForVideoTime(sync, time) {
+    const pts = sync.pts;
+    let low = 0;
+    let high = pts.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (pts[mid] <= time + SYNC_TOLERANCE) {
+            low = mid + 1;
+        } else {
+            high = mid;
+        }
+    }
+    return Math.max(0, Math.min(low - 1, pts.length - 1));
+}